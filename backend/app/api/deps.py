@@ -1,10 +1,14 @@
 from typing import Annotated
 
-from fastapi import Depends
-from sqlmodel import Session
+from fastapi import Depends, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import Settings, get_settings
 from app.core.database import get_session
+from app.core.redis import RedisRegistry
+from app.services.admission import AdmissionController
+from app.services.ingestion_jobs import IngestionJobs
+from app.services.task_queue import TaskQueue
 
 
 def get_app_settings(settings: Annotated[Settings, Depends(get_settings)]) -> Settings:
@@ -13,7 +17,37 @@ def get_app_settings(settings: Annotated[Settings, Depends(get_settings)]) -> Se
     return settings
 
 
-def get_db_session(session: Annotated[Session, Depends(get_session)]) -> Session:
-    """Provide a SQLModel session per request."""
+def get_db_session(session: Annotated[AsyncSession, Depends(get_session)]) -> AsyncSession:
+    """Provide an async SQLModel session per request, backed by the pooled engine."""
 
     return session
+
+
+def get_redis_registry(request: Request) -> RedisRegistry:
+    """Return the Redis pool and queue registry created in the application lifespan."""
+
+    return request.app.state.redis
+
+
+def get_task_queue(registry: Annotated[RedisRegistry, Depends(get_redis_registry)]) -> TaskQueue:
+    """Provide a task queue backed by the shared connection pool."""
+
+    return TaskQueue(queue=registry.queue(), async_connection=registry.async_connection)
+
+
+def get_admission_controller(
+    registry: Annotated[RedisRegistry, Depends(get_redis_registry)],
+) -> AdmissionController:
+    """Provide rate limiting and queue-wait checks for the chat queue."""
+
+    return AdmissionController(registry.connection, registry.queue())
+
+
+def get_ingestion_jobs(
+    registry: Annotated[RedisRegistry, Depends(get_redis_registry)],
+    settings: Annotated[Settings, Depends(get_settings)],
+) -> IngestionJobs:
+    """Provide ingestion job handling on the bulk queue, behind chat in priority."""
+
+    queue = TaskQueue(queue=registry.queue(settings.bulk_queue_name))
+    return IngestionJobs(queue, settings)
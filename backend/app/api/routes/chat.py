@@ -1,22 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from typing import AsyncIterator
 
-from app.api.deps import get_app_settings, get_db_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import (
+    get_admission_controller,
+    get_app_settings,
+    get_db_session,
+    get_task_queue,
+)
 from app.core.config import Settings
-from app.schemas.chat import ChatRequest, ChatResponse
+from app.schemas.chat import ChatJobAccepted, ChatJobStatus, ChatRequest, ChatResponse
+from app.services.admission import AdmissionController, AdmissionRejectedError
 from app.services.chat_service import ChatService
-from sqlmodel import Session
+from app.services.task_queue import TaskQueue
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 router = APIRouter(tags=["chat"], prefix="/chat")
 
 
+def _rejected(exc: AdmissionRejectedError) -> HTTPException:
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=exc.detail,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @router.post("/completions", response_model=ChatResponse, status_code=status.HTTP_200_OK)
-def create_completion(
+async def create_completion(
     payload: ChatRequest,
     _settings: Settings = Depends(get_app_settings),
-    session: Session = Depends(get_db_session),
+    session: AsyncSession = Depends(get_db_session),
+    queue: TaskQueue = Depends(get_task_queue),
+    admission: AdmissionController = Depends(get_admission_controller),
 ) -> ChatResponse:
-    service = ChatService(session=session)
+    service = ChatService(session=session, queue=queue, admission=admission)
     try:
-        return service.process(payload)
+        return await service.aprocess(payload)
+    except AdmissionRejectedError as exc:
+        raise _rejected(exc) from exc
+    except TimeoutError as exc:
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@router.post("/jobs", response_model=ChatJobAccepted, status_code=status.HTTP_202_ACCEPTED)
+async def submit_completion(
+    payload: ChatRequest,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_db_session),
+    queue: TaskQueue = Depends(get_task_queue),
+    admission: AdmissionController = Depends(get_admission_controller),
+) -> ChatJobAccepted:
+    """Queue a chat and return immediately; poll ``GET /chat/jobs/{job_id}`` for the answer."""
+
+    service = ChatService(session=session, queue=queue, admission=admission)
+    try:
+        accepted = await service.submit(payload)
+    except AdmissionRejectedError as exc:
+        raise _rejected(exc) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    response.headers["Location"] = request.url_for(
+        "get_completion_job", job_id=accepted.job_id
+    ).path
+    return accepted
+
+
+@router.get("/jobs/{job_id}", response_model=ChatJobStatus)
+async def get_completion_job(
+    job_id: str,
+    include_history: bool = Query(False, description="Return the whole conversation"),
+    session: AsyncSession = Depends(get_db_session),
+    queue: TaskQueue = Depends(get_task_queue),
+) -> ChatJobStatus:
+    service = ChatService(session=session, queue=queue)
+    try:
+        return await service.job_status(job_id, include_history=include_history)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
+@router.post("/completions/stream", response_class=StreamingResponse)
+async def stream_completion(
+    payload: ChatRequest,
+    session: AsyncSession = Depends(get_db_session),
+    queue: TaskQueue = Depends(get_task_queue),
+    admission: AdmissionController = Depends(get_admission_controller),
+) -> StreamingResponse:
+    """Stream the answer as server-sent events: ``meta``, ``context``, ``token``s, ``done``."""
+
+    service = ChatService(session=session, queue=queue, admission=admission)
+    try:
+        events = await service.stream(payload)
+    except AdmissionRejectedError as exc:
+        raise _rejected(exc) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+    async def _encode() -> AsyncIterator[str]:
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        _encode(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,8 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api.deps import get_db_session
 from app.schemas.conversation import (
@@ -16,47 +16,57 @@ router = APIRouter(tags=["conversations"], prefix="/conversations")
 
 
 @router.get("/", response_model=List[ConversationSummary])
-def list_conversations(
+async def list_conversations(
+    response: Response,
     nickname: str = Query(..., min_length=1, max_length=120),
-    session: Session = Depends(get_db_session),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Value of a previous X-Next-Cursor header"),
+    session: AsyncSession = Depends(get_db_session),
 ) -> List[ConversationSummary]:
-    service = ConversationService(session)
-    conversations = service.list_for_nickname(nickname)
+    """List conversations newest first; ``X-Next-Cursor`` is set when more remain."""
 
-    summaries: List[ConversationSummary] = []
-    for conversation in conversations:
-        last_message = service.get_last_message(conversation.id)
-        preview = last_message.content[:120] if last_message else None
-        summaries.append(
-            ConversationSummary(
-                id=conversation.id,
-                nickname=conversation.nickname,
-                title=conversation.title,
-                created_at=conversation.created_at,
-                updated_at=conversation.updated_at,
-                last_message_preview=preview,
-            )
-        )
+    service = ConversationService(session)
+    try:
+        conversations, next_cursor = await service.list_for_nickname(nickname, limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
-    return summaries
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [ConversationSummary.model_validate(conversation) for conversation in conversations]
 
 
 @router.get("/{conversation_id}", response_model=ConversationWithMessages)
-def get_conversation(
+async def get_conversation(
     conversation_id: UUID,
+    response: Response,
     nickname: str = Query(..., min_length=1, max_length=120),
-    session: Session = Depends(get_db_session),
+    limit: int = Query(50, ge=1, le=200),
+    since: Optional[UUID] = Query(None, description="Return messages after this message"),
+    before: Optional[UUID] = Query(None, description="Return messages before this message"),
+    session: AsyncSession = Depends(get_db_session),
 ) -> ConversationWithMessages:
+    """Conversation with one page of messages (the latest by default), oldest first.
+
+    ``X-Next-Cursor`` holds the message id to pass again as ``since`` or
+    ``before`` when more messages remain in that direction.
+    """
+
     service = ConversationService(session)
     try:
-        conversation = service.get(conversation_id)
+        conversation = await service.get(conversation_id)
     except ValueError as exc:  # noqa: BLE001
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found") from exc
 
     if conversation.nickname != nickname:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
 
-    messages = service.list_messages(conversation_id)
+    try:
+        messages, next_cursor = await service.page_messages(conversation_id, limit, since, before)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
 
     return ConversationWithMessages(
         id=conversation.id,
@@ -64,5 +74,6 @@ def get_conversation(
         title=conversation.title,
         created_at=conversation.created_at,
         updated_at=conversation.updated_at,
+        message_count=conversation.message_count,
         messages=[MessageResponse.model_validate(message) for message in messages],
     )
@@ -1,39 +1,147 @@
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 
-from fastapi import APIRouter, Depends, File, UploadFile, status
-
-from app.api.deps import get_app_settings
-from app.core.config import Settings
-from app.schemas.document import DocumentIngestionResult
-from app.services.document_ingestion import DocumentIngestionService
+from app.api.deps import get_ingestion_jobs
+from app.schemas.document import IngestionJobAccepted, IngestionJobStatus
+from app.services.ingestion_jobs import IngestionJobs
+from app.services.upload_receiver import UPLOAD_FIELD, UploadRejectedError
 
 router = APIRouter(tags=["documents"], prefix="/documents")
 
+# Indexing happens in the worker. Uploads are read from the raw request stream
+# (no ``File`` parameter), so FastAPI does not spool the body before the handler
+# can check its size; the other handlers are plain ``def`` and run in the thread pool.
+
+_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": [UPLOAD_FIELD],
+                    "properties": {UPLOAD_FIELD: {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
 
-def _service() -> DocumentIngestionService:
-    return DocumentIngestionService()
+def _accepted(
+    request: Request, response: Response, accepted: IngestionJobAccepted
+) -> IngestionJobAccepted:
+    response.headers["Location"] = request.url_for("get_ingestion_job", job_id=accepted.job_id).path
+    return accepted
 
 
 @router.post(
     "/upload",
-    response_model=DocumentIngestionResult,
-    status_code=status.HTTP_201_CREATED,
+    response_model=IngestionJobAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=_UPLOAD_BODY,
 )
 async def upload_document(
-    file: UploadFile = File(...),
-    _settings: Settings = Depends(get_app_settings),
-) -> DocumentIngestionResult:
-    service = _service()
-    return service.ingest_upload(file)
+    request: Request,
+    response: Response,
+    jobs: IngestionJobs = Depends(get_ingestion_jobs),
+) -> IngestionJobAccepted:
+    """Store the file, queue its indexing and return; poll ``GET /documents/jobs/{job_id}``.
+
+    Content that is already indexed is not stored again: the response is
+    ``200`` with status ``duplicate`` and no job.
+    """
+
+    try:
+        accepted = await jobs.submit_upload(request.headers, request.stream())
+    except UploadRejectedError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+    if accepted.job_id is None:
+        response.status_code = status.HTTP_200_OK
+        return accepted
+    return _accepted(request, response, accepted)
+
+
+@router.put(
+    "/{filename}",
+    response_model=IngestionJobAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=_UPLOAD_BODY,
+)
+async def replace_document(
+    filename: str,
+    request: Request,
+    response: Response,
+    jobs: IngestionJobs = Depends(get_ingestion_jobs),
+) -> IngestionJobAccepted:
+    """Store the file as ``filename`` and queue indexing that replaces its old chunks."""
+
+    try:
+        accepted = await jobs.submit_upload(request.headers, request.stream(), filename)
+    except UploadRejectedError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+    if accepted.job_id is None:
+        response.status_code = status.HTTP_200_OK
+        return accepted
+    return _accepted(request, response, accepted)
+
+
+@router.delete(
+    "/{filename}",
+    response_model=IngestionJobAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def delete_document(
+    filename: str,
+    request: Request,
+    response: Response,
+    jobs: IngestionJobs = Depends(get_ingestion_jobs),
+) -> IngestionJobAccepted:
+    """Queue removal of the file and its chunks; poll ``GET /documents/jobs/{job_id}``."""
+
+    try:
+        return _accepted(request, response, jobs.submit_delete(filename))
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
 
 
 @router.post(
     "/ingest",
-    response_model=List[DocumentIngestionResult],
+    response_model=IngestionJobAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def ingest_existing_documents(
+    request: Request,
+    response: Response,
+    jobs: IngestionJobs = Depends(get_ingestion_jobs),
+) -> IngestionJobAccepted:
+    """Queue indexing of new or changed files in the documents folder."""
+
+    return _accepted(request, response, jobs.submit_existing())
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobStatus)
+def get_ingestion_job(
+    job_id: str,
+    jobs: IngestionJobs = Depends(get_ingestion_jobs),
+) -> IngestionJobStatus:
+    try:
+        return jobs.status(job_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+
+
+@router.delete(
+    "/jobs/{job_id}",
+    response_model=IngestionJobStatus,
     status_code=status.HTTP_202_ACCEPTED,
 )
-async def ingest_existing_documents(
-    _settings: Settings = Depends(get_app_settings),
-) -> List[DocumentIngestionResult]:
-    service = _service()
-    return service.ingest_existing()
+def cancel_ingestion_job(
+    job_id: str,
+    jobs: IngestionJobs = Depends(get_ingestion_jobs),
+) -> IngestionJobStatus:
+    """Cancel a queued job, or ask a running one to stop after the files it has taken."""
+
+    try:
+        return jobs.cancel(job_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
@@ -1,4 +1,11 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_admission_controller, get_redis_registry
+from app.core.redis import RedisRegistry
+from app.services.admission import AdmissionController
+from app.services.response_cache import SemanticResponseCache
 
 router = APIRouter(tags=["health"], prefix="/health")
 
@@ -6,3 +13,22 @@ router = APIRouter(tags=["health"], prefix="/health")
 @router.get("/ping", summary="Service liveness probe")
 def health_check() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/redis", summary="Shared Redis connection pool metrics")
+def redis_pool_stats(registry: RedisRegistry = Depends(get_redis_registry)) -> dict[str, float]:
+    return registry.stats()
+
+
+@router.get("/response-cache", summary="Semantic response cache hit rate")
+def response_cache_stats(
+    registry: RedisRegistry = Depends(get_redis_registry),
+) -> dict[str, float]:
+    return SemanticResponseCache(registry.connection).stats()
+
+
+@router.get("/queue", summary="Chat queue depth and estimated wait")
+def chat_queue_estimate(
+    admission: AdmissionController = Depends(get_admission_controller),
+) -> dict[str, Optional[float]]:
+    return admission.estimate().as_dict()
@@ -1,37 +1,173 @@
+"""Async SQLAlchemy engine, sessions and round-trip accounting.
+
+One pooled engine is kept per event loop, like the async HTTP clients: the API
+serves every request from the loop uvicorn runs, and the worker uses the loop
+its jobs share (see ``app.services.registry``). Pool size, overflow, timeout
+and recycle come from the ``DATABASE_POOL_*`` settings.
+
+Every statement, ``COMMIT`` and ``ROLLBACK`` sent while :func:`count_round_trips`
+is active is counted; the API reports the total per request in the
+``X-DB-Round-Trips`` response header.
+"""
+
 from __future__ import annotations
 
-from contextlib import contextmanager
-from functools import lru_cache
-from typing import Iterator
+import asyncio
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, Optional
 
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 
+# Async drivers for URLs that name a sync one (or none).
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "psycopg"}
+_SYNC_ONLY_DRIVERS = {"pysqlite", "psycopg2"}
 
-def _build_engine_url() -> str:
-    settings = get_settings()
-    return settings.database_url
+_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncEngine]" = (
+    weakref.WeakKeyDictionary()
+)
 
 
-@lru_cache()
-def get_engine():
-    url = _build_engine_url()
-    return create_engine(url, echo=False, pool_pre_ping=True)
+@dataclass
+class RoundTrips:
+    count: int = 0
 
 
-def init_db() -> None:
-    engine = get_engine()
-    SQLModel.metadata.create_all(engine)
+_round_trips: ContextVar[Optional[RoundTrips]] = ContextVar("db_round_trips", default=None)
 
 
 @contextmanager
-def session_scope() -> Iterator[Session]:
-    engine = get_engine()
-    with Session(engine) as session:
+def count_round_trips() -> Iterator[RoundTrips]:
+    """Count the database round trips made by the current context until exit.
+
+    Only engines created with ``DATABASE_ROUND_TRIPS`` on report them.
+    """
+
+    counter = RoundTrips()
+    token = _round_trips.set(counter)
+    try:
+        yield counter
+    finally:
+        _round_trips.reset(token)
+
+
+def _record_round_trip(*_: Any) -> None:
+    counter = _round_trips.get()
+    if counter is not None:
+        counter.count += 1
+
+
+def async_database_url(url: str) -> str:
+    """``url`` with an asyncio driver, e.g. ``sqlite://`` becomes ``sqlite+aiosqlite://``."""
+
+    parsed = make_url(url)
+    backend, _, driver = parsed.drivername.partition("+")
+    if backend in _ASYNC_DRIVERS and (not driver or driver in _SYNC_ONLY_DRIVERS):
+        parsed = parsed.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}")
+    return parsed.render_as_string(hide_password=False)
+
+
+def create_engine_for(settings: Settings) -> AsyncEngine:
+    url = async_database_url(settings.database_url)
+    options: dict[str, Any] = {"echo": False, "pool_pre_ping": True}
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_recycle=settings.database_pool_recycle,
+        )
+    engine = create_async_engine(url, **options)
+    if settings.database_round_trips:
+        event.listen(engine.sync_engine, "before_cursor_execute", _record_round_trip)
+        event.listen(engine.sync_engine, "commit", _record_round_trip)
+        event.listen(engine.sync_engine, "rollback", _record_round_trip)
+    return engine
+
+
+def get_engine() -> AsyncEngine:
+    """The pooled engine for the running event loop, created on first use."""
+
+    loop = asyncio.get_running_loop()
+    engine = _engines.get(loop)
+    if engine is None:
+        engine = create_engine_for(get_settings())
+        _engines[loop] = engine
+    return engine
+
+
+async def dispose_engine() -> None:
+    """Close the running loop's pooled connections."""
+
+    engine = _engines.pop(asyncio.get_running_loop(), None)
+    if engine is not None:
+        await engine.dispose()
+
+
+# Fills the denormalized conversation columns for rows written before they existed.
+_BACKFILL_CONVERSATIONS = """
+UPDATE conversations SET
+    message_count = (
+        SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id
+    ),
+    last_message_preview = (
+        SELECT SUBSTR(messages.content, 1, 120) FROM messages
+        WHERE messages.conversation_id = conversations.id
+        ORDER BY messages.created_at DESC LIMIT 1
+    )
+"""
+
+
+def upgrade_schema(connection: Connection) -> None:
+    """Add columns and indexes introduced after a database was first created.
+
+    ``create_all`` only creates missing tables, so existing deployments get new
+    columns here (with a one-off backfill) and any index the models declare.
+    """
+
+    inspector = inspect(connection)
+    if inspector.has_table("conversations"):
+        columns = {column["name"] for column in inspector.get_columns("conversations")}
+        if "last_message_preview" not in columns:
+            connection.execute(
+                text("ALTER TABLE conversations ADD COLUMN last_message_preview VARCHAR(120)")
+            )
+        if "message_count" not in columns:
+            connection.execute(
+                text(
+                    "ALTER TABLE conversations "
+                    "ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0"
+                )
+            )
+            connection.execute(text(_BACKFILL_CONVERSATIONS))
+
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+async def init_db() -> None:
+    async with get_engine().begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+        await connection.run_sync(upgrade_schema)
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    # Objects stay readable after commit, so a turn's rows are never re-selected.
+    factory = async_sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
         yield session
 
 
-def get_session() -> Iterator[Session]:
-    with session_scope() as session:
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with session_scope() as session:
         yield session
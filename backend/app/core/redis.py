@@ -0,0 +1,108 @@
+"""Application-scoped Redis connection pool and RQ queue handles.
+
+One registry is created per process (in the FastAPI lifespan for the API) and
+shared by every request, so chat traffic reuses pooled TCP connections instead
+of opening a new client per message.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from redis import BlockingConnectionPool, Redis
+from redis import asyncio as redis_asyncio
+from rq import Queue
+
+from app.core.config import Settings, get_settings
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """Blocking pool that also counts how often callers had to wait for a connection."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._stats_lock = threading.Lock()
+        self._waits = 0
+        self._wait_seconds = 0.0
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self, command_name: Optional[str] = None, *keys: Any, **options: Any):
+        # Every slot is checked out once the queue of free slots is empty.
+        if not self.pool.empty():
+            return super().get_connection(command_name, *keys, **options)
+
+        started = time.perf_counter()
+        try:
+            return super().get_connection(command_name, *keys, **options)
+        finally:
+            with self._stats_lock:
+                self._waits += 1
+                self._wait_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, float]:
+        with self.pool.mutex:
+            idle = sum(1 for connection in self.pool.queue if connection is not None)
+        created = len(self._connections)
+        with self._stats_lock:
+            waits, wait_seconds = self._waits, self._wait_seconds
+        return {
+            "max_connections": self.max_connections,
+            "created": created,
+            "in_use": created - idle,
+            "idle": idle,
+            "waits": waits,
+            "wait_seconds": round(wait_seconds, 6),
+        }
+
+
+class RedisRegistry:
+    """Thread-safe owner of the shared Redis client and one ``Queue`` per name."""
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self._settings = settings or get_settings()
+        self._pool = InstrumentedConnectionPool.from_url(
+            self._settings.redis_url,
+            max_connections=self._settings.redis_pool_size,
+            timeout=self._settings.redis_pool_timeout,
+            health_check_interval=self._settings.redis_health_check_interval,
+        )
+        self._connection = Redis(connection_pool=self._pool)
+        # Blocking waits (BLPOP on job results, XREAD on token streams) hold their
+        # connection until the answer arrives, so they get their own pool, bound to
+        # the app's loop; a burst of waiting chats cannot starve short commands.
+        self._async_connection = redis_asyncio.Redis(
+            connection_pool=redis_asyncio.BlockingConnectionPool.from_url(
+                self._settings.redis_url,
+                max_connections=self._settings.redis_wait_pool_size,
+                timeout=self._settings.redis_pool_timeout,
+                health_check_interval=self._settings.redis_health_check_interval,
+            )
+        )
+        self._queues: Dict[str, Queue] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> Redis:
+        return self._connection
+
+    @property
+    def async_connection(self) -> redis_asyncio.Redis:
+        return self._async_connection
+
+    def queue(self, name: Optional[str] = None) -> Queue:
+        name = name or self._settings.task_queue_name
+        with self._lock:
+            queue = self._queues.get(name)
+            if queue is None:
+                queue = Queue(name, connection=self._connection)
+                self._queues[name] = queue
+            return queue
+
+    def stats(self) -> Dict[str, float]:
+        return self._pool.stats()
+
+    async def aclose(self) -> None:
+        await self._async_connection.aclose()
+        await self._async_connection.connection_pool.disconnect()
+        self._pool.disconnect()
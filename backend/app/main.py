@@ -1,21 +1,31 @@
+import threading
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel
 
 from app.api.routes import chat, conversations, documents, health
 from app.core.config import Settings, get_settings
-from app.core.database import get_engine
+from app.core.database import count_round_trips, dispose_engine, init_db
+from app.core.redis import RedisRegistry
+from app.services.registry import warm_up
 
 
 @asynccontextmanager
-def lifespan(app: FastAPI):
+async def lifespan(app: FastAPI):
     settings = get_settings()
     settings.vector_store_path.mkdir(parents=True, exist_ok=True)
     settings.documents_path.mkdir(parents=True, exist_ok=True)
-    SQLModel.metadata.create_all(get_engine())
-    yield
+    await init_db()
+    # Load the embedding model and vector store in the background so startup
+    # stays fast and the first chat request does not pay the cold start.
+    threading.Thread(target=warm_up, name="registry-warm-up", daemon=True).start()
+    app.state.redis = RedisRegistry(settings)
+    try:
+        yield
+    finally:
+        await app.state.redis.aclose()
+        await dispose_engine()
 
 
 def create_application() -> FastAPI:
@@ -27,6 +37,18 @@ def create_application() -> FastAPI:
         lifespan=lifespan,
     )
 
+    exposed_headers = ["Location", "Retry-After", "X-Next-Cursor"]
+    if settings.database_round_trips:
+        exposed_headers.append("X-DB-Round-Trips")
+
+        @app.middleware("http")
+        async def report_round_trips(request: Request, call_next) -> Response:
+            # Streamed responses report the trips made before their first byte.
+            with count_round_trips() as round_trips:
+                response = await call_next(request)
+            response.headers["X-DB-Round-Trips"] = str(round_trips.count)
+            return response
+
     if settings.cors_origins:
         app.add_middleware(
             CORSMiddleware,
@@ -34,6 +56,7 @@ def create_application() -> FastAPI:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=exposed_headers,
         )
 
     app.include_router(health.router, prefix=settings.api_prefix)
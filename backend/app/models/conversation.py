@@ -1,33 +1,49 @@
-from __future__ import annotations
+"""Database models for the Flow RAG backend."""
+# No ``from __future__ import annotations`` here: SQLModel resolves relationship
+# targets from the evaluated annotations, and a stringified ``List["Message"]``
+# is passed to SQLAlchemy verbatim, which fails at mapper configuration.
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID, uuid4
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
+# Length of ``Conversation.last_message_preview``, as shown in the sidebar.
+PREVIEW_LENGTH = 120
+
 
 class Conversation(SQLModel, table=True):
     """Represents a chat conversation initiated by a user nickname."""
 
     __tablename__ = "conversations"
+    # Serves the sidebar query: one nickname's chats, most recently updated first.
+    __table_args__ = (Index("ix_conversations_nickname_updated_at", "nickname", "updated_at"),)
 
     id: UUID = Field(default_factory=uuid4, primary_key=True, index=True, nullable=False)
-    nickname: str = Field(index=True, max_length=120)
+    nickname: str = Field(max_length=120)
     title: Optional[str] = Field(default=None, max_length=200)
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    # Maintained by ConversationService.add_message so listing never reads messages.
+    last_message_preview: Optional[str] = Field(default=None, max_length=PREVIEW_LENGTH)
+    message_count: int = Field(default=0, nullable=False)
 
-    messages: list["Message"] = Relationship(back_populates="conversation", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    messages: List["Message"] = Relationship(back_populates="conversation", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
 
 class Message(SQLModel, table=True):
     """Stores a single chat message within a conversation."""
 
     __tablename__ = "messages"
+    # Serves history pages: one conversation's messages in time order.
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+    )
 
     id: UUID = Field(default_factory=uuid4, primary_key=True, index=True, nullable=False)
-    conversation_id: UUID = Field(foreign_key="conversations.id", nullable=False, index=True)
+    conversation_id: UUID = Field(foreign_key="conversations.id", nullable=False)
     role: str = Field(regex=r"^(user|assistant)$", max_length=16)
     content: str
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
@@ -10,6 +10,9 @@ class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1)
     conversation_id: Optional[str] = Field(None, description="Conversation identifier")
     nickname: str = Field(..., min_length=1, max_length=120)
+    include_history: bool = Field(
+        False, description="Return the whole conversation instead of just this turn"
+    )
 
 
 class DocumentContext(BaseModel):
@@ -23,4 +26,21 @@ class ChatResponse(BaseModel):
     response: str
     context: List[DocumentContext] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # The user message and the answer, or the full history when it was requested.
     messages: List[MessageResponse] = Field(default_factory=list)
+    context_tokens: int = 0
+    context_tokens_saved: int = 0
+    context_tokens_dropped: int = 0
+
+
+class ChatJobAccepted(BaseModel):
+    job_id: str
+    conversation_id: str
+    status: str
+
+
+class ChatJobStatus(BaseModel):
+    job_id: str
+    status: str
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
@@ -25,6 +25,7 @@ class ConversationResponse(BaseModel):
 
 class ConversationSummary(ConversationResponse):
     last_message_preview: Optional[str] = None
+    message_count: int = 0
 
 
 class MessageResponse(BaseModel):
@@ -38,4 +39,5 @@ class MessageResponse(BaseModel):
 
 
 class ConversationWithMessages(ConversationResponse):
+    message_count: int = 0
     messages: List[MessageResponse] = Field(default_factory=list)
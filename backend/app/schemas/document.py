@@ -1,9 +1,40 @@
 from pathlib import Path
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class DocumentIngestionResult(BaseModel):
     document_path: Path
     document_id: str
     chunks_indexed: int
+    chunks_removed: int = 0
+
+
+class IngestionJobAccepted(BaseModel):
+    # ``None`` when an upload matched indexed content and no job was queued.
+    job_id: Optional[str] = None
+    status: str
+    # Set for uploads: where the file was stored before the job was queued,
+    # or the indexed file it duplicates.
+    document_path: Optional[Path] = None
+    document_id: Optional[str] = None
+    sha256: Optional[str] = None
+
+
+class IngestionJobProgress(BaseModel):
+    files_total: int = 0
+    files_parsed: int = 0
+    chunks_embedded: int = 0
+    bytes_total: int = 0
+    bytes_parsed: int = 0
+    eta_seconds: Optional[float] = None
+
+
+class IngestionJobStatus(BaseModel):
+    job_id: str
+    status: str
+    cancel_requested: bool = False
+    progress: Optional[IngestionJobProgress] = None
+    results: List[DocumentIngestionResult] = Field(default_factory=list)
+    error: Optional[str] = None
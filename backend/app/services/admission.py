@@ -0,0 +1,166 @@
+"""Decides whether a chat may be queued right now.
+
+Two checks run before a chat job is enqueued:
+
+* a token bucket per nickname, kept in Redis so every API replica shares it,
+  turns away users sending faster than ``CHAT_RATE_LIMIT_PER_MINUTE`` (429);
+* an estimate of how long the job would take to answer, from the queue depth,
+  the jobs already running, the number of registered workers and recent job
+  durations, turns away chats that would miss ``CHAT_DEADLINE_SECONDS`` (503).
+
+Both rejections carry a ``Retry-After`` hint in seconds.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+from redis import Redis
+from rq import Queue
+from rq.worker_registration import WORKERS_BY_QUEUE_KEY
+
+from app.core.config import Settings, get_settings
+from app.services.task_queue import durations_key
+
+RATE_KEY_PREFIX = "flow:rate:"
+
+# Refills the bucket for the time elapsed since the last call, then takes one
+# token if there is one. Returns {allowed, seconds until a token is available};
+# the wait is a string because Lua numbers come back from Redis as integers.
+_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class AdmissionRejectedError(RuntimeError):
+    """A chat was refused; ``status_code`` is 429 or 503 and ``retry_after`` is in seconds."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+@dataclass
+class QueueEstimate:
+    queued: int
+    running: int
+    workers: int
+    mean_job_seconds: float
+    # ``None`` when no worker is registered for the queue.
+    wait_seconds: Optional[float]
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        return asdict(self)
+
+
+class RateLimiter:
+    """Per-nickname token bucket shared through Redis."""
+
+    def __init__(self, connection: Redis, settings: Optional[Settings] = None):
+        self._settings = settings or get_settings()
+        self._script = connection.register_script(_TOKEN_BUCKET)
+
+    def acquire(self, nickname: str) -> float:
+        """Take a token for ``nickname``; returns 0 on success, else seconds to wait."""
+
+        per_minute = self._settings.chat_rate_limit_per_minute
+        if per_minute <= 0:
+            return 0.0
+        allowed, wait = self._script(
+            keys=[f"{RATE_KEY_PREFIX}{nickname}"],
+            args=[per_minute / 60, self._settings.chat_rate_limit_burst, time.time()],
+        )
+        return 0.0 if int(allowed) else float(wait)
+
+
+class AdmissionController:
+    """Applies the rate limit and the queue-wait check for one chat queue."""
+
+    def __init__(
+        self,
+        connection: Redis,
+        queue: Queue,
+        settings: Optional[Settings] = None,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        self._connection = connection
+        self._queue = queue
+        self._settings = settings or get_settings()
+        self._limiter = limiter or RateLimiter(connection, self._settings)
+
+    def estimate(self) -> QueueEstimate:
+        """Expected seconds from enqueueing a job now until its answer is ready."""
+
+        pipeline = self._connection.pipeline(transaction=False)
+        pipeline.llen(self._queue.key)
+        pipeline.zcard(self._queue.started_job_registry.key)
+        pipeline.scard(WORKERS_BY_QUEUE_KEY % self._queue.name)
+        pipeline.lrange(durations_key(self._queue.name), 0, -1)
+        queued, running, workers, samples = pipeline.execute()
+
+        durations = [float(sample) for sample in samples]
+        mean = (
+            sum(durations) / len(durations)
+            if durations
+            else self._settings.admission_default_job_seconds
+        )
+        wait: Optional[float] = None
+        if workers:
+            # Jobs ahead of this one, plus itself, are served ``workers`` at a time.
+            wait = round(mean * max(1.0, (queued + running + 1) / workers), 3)
+        return QueueEstimate(
+            queued=queued,
+            running=running,
+            workers=workers,
+            mean_job_seconds=round(mean, 3),
+            wait_seconds=wait,
+        )
+
+    def admit(self, nickname: str, interactive: bool = True) -> None:
+        """Raise :class:`AdmissionRejectedError` unless a chat from ``nickname`` may be queued.
+
+        Interactive chats must be answerable within the deadline; detached jobs
+        only count against the rate limit.
+        """
+
+        if interactive:
+            estimate = self.estimate()
+            if estimate.wait_seconds is None:
+                raise AdmissionRejectedError(
+                    503,
+                    "No worker is serving chat requests",
+                    self._settings.admission_default_job_seconds,
+                )
+            deadline = self._settings.chat_deadline_seconds
+            if estimate.wait_seconds > deadline:
+                raise AdmissionRejectedError(
+                    503,
+                    "The chat queue is too long to answer in time",
+                    estimate.wait_seconds - deadline,
+                )
+
+        wait = self._limiter.acquire(nickname)
+        if wait:
+            raise AdmissionRejectedError(429, "Too many chat requests for this nickname", wait)
@@ -1,67 +1,226 @@
 from __future__ import annotations
 
+import asyncio
+import time
 import uuid
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.schemas.chat import ChatRequest, ChatResponse
+from app.core.config import get_settings
+from app.models.conversation import Conversation, Message
+from app.schemas.chat import ChatJobAccepted, ChatJobStatus, ChatRequest, ChatResponse
 from app.schemas.conversation import MessageResponse
+from app.services.admission import AdmissionController
 from app.services.conversation_service import ConversationService
-from app.services.task_queue import TaskQueue
-from app.worker.tasks import process_chat
+from app.services.rag_pipeline import completion_text
+from app.services.task_queue import TaskQueue, TaskResult
+from app.services.token_stream import aread_events, new_stream_key
+from app.worker.tasks import answer_chat, process_chat, stream_chat
+
+StreamEvent = Tuple[str, Dict[str, Any]]
+
+
+def _status_name(status: Any) -> str:
+    """RQ statuses are ``JobStatus`` enum members; expose their plain value."""
+
+    return str(getattr(status, "value", status))
 
 
 class ChatService:
-    """Domain service coordinating worker queue for chat requests."""
+    """Domain service coordinating worker queue for chat requests.
+
+    Admission is checked before anything is written. The user message is then
+    committed before its job is queued, with the conversation row (inserted or
+    updated) in the same commit, so a question is kept even when its answer
+    times out or fails. That commit also ends the
+    transaction, so no connection is held while the answer is generated. The
+    assistant message is committed once it is known.
+    """
 
-    def __init__(self, session: Session, queue: TaskQueue | None = None):
+    def __init__(
+        self,
+        session: AsyncSession,
+        queue: TaskQueue | None = None,
+        admission: AdmissionController | None = None,
+    ):
         self._queue = queue or TaskQueue()
         self._session = session
         self._conversations = ConversationService(session)
+        self._admission = admission
+        self._deadline_seconds = get_settings().chat_deadline_seconds
 
-    def process(self, request: ChatRequest) -> ChatResponse:
-        conversation_id = request.conversation_id
-        if conversation_id:
-            conversation_uuid = uuid.UUID(conversation_id)
-            conversation = self._conversations.get(conversation_uuid)
-        else:
-            conversation = self._conversations.create(request.nickname)
-            conversation_id = str(conversation.id)
-
-        user_message = self._conversations.add_message(uuid.UUID(conversation_id), "user", request.message)
-        self._session.commit()
+    async def aprocess(self, request: ChatRequest) -> ChatResponse:
+        """Answer one chat turn, waiting for the job without holding a thread."""
 
-        job = self._queue.enqueue(
+        # A rejected chat must not leave an unanswered question behind.
+        await asyncio.to_thread(self._admit, request)
+        conversation = await self._conversation(request)
+        question = await self._ask(conversation, request)
+        job = await asyncio.to_thread(
+            self._enqueue,
             process_chat,
-            {"message": request.message, "conversation_id": conversation_id},
+            {"message": request.message, "conversation_id": str(conversation.id)},
         )
-        result = self._queue.wait_for_result(job.job_id)
-        payload: Dict[str, Any] = result.payload or {}
-        flow_response = payload.get("response", {})
-        assistant_output = self._extract_text(flow_response)
-        context = payload.get("context") or []
-
-        assistant_message = self._conversations.add_message(
-            uuid.UUID(conversation_id),
-            "assistant",
-            assistant_output,
-        )
-        self._session.commit()
+        result = await self._queue.await_result(job.job_id, timeout=self._deadline_seconds)
 
-        full_history = self._conversations.list_messages(uuid.UUID(conversation_id))
-        messages = [MessageResponse.model_validate(message) for message in full_history]
+        payload: Dict[str, Any] = result.payload or {}
+        assistant_output = completion_text(payload.get("response", {}))
+        usage = payload.get("usage") or {}
+        answer = await self._store_answer(conversation, assistant_output)
 
+        conversation_id = str(conversation.id)
+        if request.include_history:
+            messages = await self._history(conversation_id)
+        else:
+            messages = [
+                MessageResponse.model_validate(question),
+                MessageResponse.model_validate(answer),
+            ]
         return ChatResponse(
             conversation_id=conversation_id,
             response=assistant_output,
-            context=context,
-            created_at=assistant_message.created_at,
+            context=payload.get("context") or [],
+            created_at=answer.created_at,
+            messages=messages,
+            context_tokens=usage.get("context_tokens", 0),
+            context_tokens_saved=usage.get("context_tokens_saved", 0),
+            context_tokens_dropped=usage.get("context_tokens_dropped", 0),
+        )
+
+    async def submit(self, request: ChatRequest) -> ChatJobAccepted:
+        """Enqueue a chat whose job stores the answer itself; poll with :meth:`job_status`.
+
+        The caller may open the conversation before the answer exists, so the
+        user message is committed here and the worker adds the answer.
+        """
+
+        await asyncio.to_thread(self._admit, request, False)
+        conversation = await self._conversation(request)
+        question = await self._ask(conversation, request)
+
+        conversation_id = str(conversation.id)
+        job = await asyncio.to_thread(
+            self._queue.enqueue,
+            answer_chat,
+            {
+                "message": request.message,
+                "conversation_id": conversation_id,
+                "user_message": MessageResponse.model_validate(question).model_dump(mode="json"),
+            },
+        )
+        return ChatJobAccepted(
+            job_id=job.job_id,
+            conversation_id=conversation_id,
+            status=_status_name(job.status),
+        )
+
+    async def job_status(self, job_id: str, include_history: bool = False) -> ChatJobStatus:
+        job = await asyncio.to_thread(self._queue.fetch, job_id)
+        status = _status_name(job.status)
+        payload: Dict[str, Any] = job.payload or {}
+        if status == "failed":
+            return ChatJobStatus(job_id=job_id, status=status, error="Chat job failed")
+        if status != "finished" or "message" not in payload:
+            return ChatJobStatus(job_id=job_id, status=status)
+
+        message = MessageResponse.model_validate(payload["message"])
+        conversation_id = payload["conversation_id"]
+        usage = payload.get("usage") or {}
+        if include_history:
+            messages = await self._history(conversation_id)
+        else:
+            user_message = MessageResponse.model_validate(payload["user_message"])
+            messages = [user_message, message]
+        result = ChatResponse(
+            conversation_id=conversation_id,
+            response=message.content,
+            context=payload.get("context") or [],
+            created_at=message.created_at,
             messages=messages,
+            context_tokens=usage.get("context_tokens", 0),
+            context_tokens_saved=usage.get("context_tokens_saved", 0),
+            context_tokens_dropped=usage.get("context_tokens_dropped", 0),
         )
+        return ChatJobStatus(job_id=job_id, status=status, result=result)
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[StreamEvent]:
+        """Start a streamed completion and return an iterator over its events.
+
+        The question is stored and the job enqueued before this returns; the
+        job stores the answer, whether or not the client is still reading.
+        """
+
+        started = time.perf_counter()
+        await asyncio.to_thread(self._admit, request)
+        conversation = await self._conversation(request)
+        await self._ask(conversation, request)
+        stream_key = new_stream_key()
+        await asyncio.to_thread(
+            self._enqueue,
+            stream_chat,
+            {
+                "message": request.message,
+                "conversation_id": str(conversation.id),
+                "stream_key": stream_key,
+            },
+        )
+        return self._relay(str(conversation.id), stream_key, started)
+
+    async def _relay(
+        self, conversation_id: str, stream_key: str, started: float
+    ) -> AsyncIterator[StreamEvent]:
+        yield "meta", {"conversation_id": conversation_id}
+
+        first_token_ms: Optional[float] = None
+        idle_timeout = get_settings().chat_stream_idle_timeout
+        async for event, data in aread_events(
+            self._queue.async_connection, stream_key, idle_timeout
+        ):
+            if event == "token" and first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+            if event != "done":
+                yield event, data
+                continue
+
+            yield (
+                "done",
+                {
+                    "conversation_id": conversation_id,
+                    "message": data.get("message"),
+                    "time_to_first_token_ms": first_token_ms,
+                    "usage": data.get("usage") or {},
+                },
+            )
+
+    async def _conversation(self, request: ChatRequest) -> Conversation:
+        """The requested conversation, or a new one that the question's commit inserts."""
+
+        if not request.conversation_id:
+            return self._conversations.new(request.nickname)
+        return await self._conversations.get(uuid.UUID(request.conversation_id))
+
+    async def _ask(self, conversation: Conversation, request: ChatRequest) -> Message:
+        """Commit the user's message, ending the transaction before the job runs."""
+
+        question = Message(conversation_id=conversation.id, role="user", content=request.message)
+        self._conversations.append(conversation, [question])
+        await self._session.commit()
+        return question
+
+    async def _store_answer(self, conversation: Conversation, answer: str) -> Message:
+        reply = Message(conversation_id=conversation.id, role="assistant", content=answer)
+        self._conversations.append(conversation, [reply])
+        await self._session.commit()
+        return reply
+
+    async def _history(self, conversation_id: str) -> List[MessageResponse]:
+        full_history = await self._conversations.list_messages(uuid.UUID(conversation_id))
+        return [MessageResponse.model_validate(message) for message in full_history]
+
+    def _enqueue(self, func: Any, payload: Dict[str, Any]) -> TaskResult:
+        return self._queue.enqueue(func, payload, deadline=time.time() + self._deadline_seconds)
 
-    def _extract_text(self, response: Dict[str, Any]) -> str:
-        choices = response.get("choices", [])
-        if not choices:
-            return ""
-        return choices[0].get("message", {}).get("content", "")
+    def _admit(self, request: ChatRequest, interactive: bool = True) -> None:
+        if self._admission is not None:
+            self._admission.admit(request.nickname, interactive=interactive)
@@ -0,0 +1,254 @@
+"""Turns retrieved chunks into the context block sent to Flow.
+
+Retrieval over-fetches candidates. Assembly then picks a diverse subset with
+maximal marginal relevance (MMR) and merges chunks that overlap or touch in
+the same source, since the splitter repeats up to ``chunk_overlap``
+characters between neighbours. It packs the result, most relevant first,
+into a token budget.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+from app.core.config import Settings, get_settings
+
+# Shortest suffix/prefix match treated as splitter overlap when offsets are unknown.
+MIN_TEXT_OVERLAP = 20
+# Metadata key of a hybrid search's fused score; chunks rank by cosine ``score`` without it.
+RANK_SCORE = "rank_score"
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken when its encoding is available locally.
+
+    tiktoken fetches encodings on first use; without one (no package, or an
+    offline host with a cold cache) counts fall back to four characters per
+    token, which is close for English prose. ``encoding_name=None`` builds the
+    estimate without touching tiktoken.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, encoding_name: Optional[str]):
+        self._encoding: Any = None
+        if encoding_name is None:
+            return
+        try:
+            import tiktoken
+
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception:  # noqa: BLE001 - any failure means "use the estimate"
+            self._encoding = None
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // self.CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, tokens: int) -> str:
+        if self._encoding is not None:
+            encoded = self._encoding.encode(text, disallowed_special=())
+            return self._encoding.decode(encoded[:tokens])
+        return text[: tokens * self.CHARS_PER_TOKEN]
+
+
+_ESTIMATE = TokenCounter(None)
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def load_token_counter(encoding_name: str) -> TokenCounter:
+    """Load ``encoding_name``, fetching it on a cold tiktoken cache; call at startup.
+
+    The fetch has no timeout, so it belongs in process warm-up
+    (``registry.warm_up``), never in a request.
+    """
+
+    with _counters_lock:
+        counter = _counters.get(encoding_name)
+        if counter is None:
+            counter = _counters[encoding_name] = TokenCounter(encoding_name)
+        return counter
+
+
+def get_token_counter(encoding_name: str) -> TokenCounter:
+    """The counter loaded at startup, or the character estimate until it is; never fetches."""
+
+    return _counters.get(encoding_name, _ESTIMATE)
+
+
+@dataclass
+class AssembledContext:
+    documents: List[Document] = field(default_factory=list)
+    chunk_ids: List[str] = field(default_factory=list)
+    context_tokens: int = 0
+    # Repeated text removed by merging overlapping chunks.
+    tokens_saved: int = 0
+    # Merged text left out, or truncated, to fit the token budget.
+    tokens_dropped: int = 0
+
+    @property
+    def usage(self) -> Dict[str, int]:
+        return {
+            "context_tokens": self.context_tokens,
+            "context_tokens_saved": self.tokens_saved,
+            "context_tokens_dropped": self.tokens_dropped,
+        }
+
+
+def mmr_select(
+    query_vector: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_mult: float,
+    relevance: Optional[np.ndarray] = None,
+) -> List[int]:
+    """Indices of ``k`` rows balancing relevance against similarity to rows already chosen.
+
+    Rows and query are unit-normalized, so dot products are cosine similarities.
+    Relevance is the cosine to the query unless given, on a comparable 0-1 scale.
+    """
+
+    if not len(vectors):
+        return []
+    if relevance is None:
+        relevance = vectors @ query_vector
+    similarity = vectors @ vectors.T
+    selected = [int(np.argmax(relevance))]
+    remaining = [idx for idx in range(len(vectors)) if idx != selected[0]]
+    while remaining and len(selected) < k:
+        redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best = remaining.pop(int(np.argmax(scores)))
+        selected.append(best)
+    return selected
+
+
+def _rank_score(document: Document) -> float:
+    return document.metadata.get(RANK_SCORE, document.metadata.get("score", 0.0))
+
+
+def _text_overlap(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of ``left`` that is also a prefix of ``right``."""
+
+    for size in range(min(len(left), len(right), max_overlap), MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_pair(left: Document, right: Document, max_overlap: int) -> Optional[Document]:
+    """Join two chunks of one source into one if they overlap or are adjacent."""
+
+    left_start = left.metadata.get("start_index")
+    right_start = right.metadata.get("start_index")
+    if isinstance(left_start, int) and isinstance(right_start, int):
+        if right_start < left_start:
+            left, right = right, left
+            left_start, right_start = right_start, left_start
+        left_end = left_start + len(left.page_content)
+        if right_start > left_end:
+            return None
+        tail = right.page_content[left_end - right_start :]
+        text = left.page_content + tail
+    else:
+        overlap = _text_overlap(left.page_content, right.page_content, max_overlap)
+        if not overlap:
+            overlap = _text_overlap(right.page_content, left.page_content, max_overlap)
+            if not overlap:
+                return None
+            left, right = right, left
+        text = left.page_content + right.page_content[overlap:]
+
+    metadata = {
+        **left.metadata,
+        "score": max(left.metadata.get("score", 0.0), right.metadata.get("score", 0.0)),
+        "chunk_ids": left.metadata["chunk_ids"] + right.metadata["chunk_ids"],
+    }
+    if RANK_SCORE in left.metadata or RANK_SCORE in right.metadata:
+        metadata[RANK_SCORE] = max(_rank_score(left), _rank_score(right))
+    return Document(page_content=text, metadata=metadata)
+
+
+def merge_overlapping(documents: Sequence[Document], max_overlap: int) -> List[Document]:
+    """Collapse overlapping or adjacent chunks of the same source, keeping rank order."""
+
+    merged: List[Document] = []
+    for document in documents:
+        current = Document(
+            page_content=document.page_content,
+            metadata={
+                **document.metadata,
+                "chunk_ids": [str(document.metadata.get("chunk_id", ""))],
+            },
+        )
+        # Keep folding until nothing else in the list joins the grown chunk.
+        folded = True
+        while folded:
+            folded = False
+            for position, other in enumerate(merged):
+                if other.metadata.get("source") != current.metadata.get("source"):
+                    continue
+                joined = _merge_pair(other, current, max_overlap)
+                if joined is not None:
+                    merged.pop(position)
+                    current = joined
+                    folded = True
+                    break
+        merged.append(current)
+
+    merged.sort(key=_rank_score, reverse=True)
+    return merged
+
+
+class ContextAssembler:
+    """Selects, de-duplicates and budgets retrieved chunks for one prompt."""
+
+    def __init__(self, settings: Optional[Settings] = None, counter: Optional[TokenCounter] = None):
+        self._settings = settings or get_settings()
+        self._counter = counter or get_token_counter(self._settings.context_tokenizer)
+
+    def assemble(
+        self, query_vector: np.ndarray, documents: Sequence[Document], vectors: np.ndarray
+    ) -> AssembledContext:
+        settings = self._settings
+        relevance = None
+        if documents and all(RANK_SCORE in doc.metadata for doc in documents):
+            # Fused scores are tiny (about 1/60); scaled so the best candidate is 1.
+            fused = np.array([doc.metadata[RANK_SCORE] for doc in documents], dtype=np.float32)
+            relevance = fused / fused.max()
+        picked = mmr_select(
+            query_vector, vectors, settings.context_top_k, settings.context_mmr_lambda, relevance
+        )
+        chosen = [documents[idx] for idx in picked]
+        # What concatenating the chosen chunks verbatim would have cost.
+        raw_tokens = sum(self._counter.count(doc.page_content) for doc in chosen)
+
+        merged = merge_overlapping(chosen, settings.chunk_overlap)
+        merged_tokens = [self._counter.count(doc.page_content) for doc in merged]
+
+        budget = settings.context_token_budget
+        assembled = AssembledContext()
+        for document, tokens in zip(merged, merged_tokens):
+            if assembled.context_tokens + tokens > budget:
+                if assembled.documents:
+                    continue
+                # Always send something: trim the single best chunk to the budget.
+                document = Document(
+                    page_content=self._counter.truncate(document.page_content, budget),
+                    metadata=document.metadata,
+                )
+                tokens = self._counter.count(document.page_content)
+            assembled.documents.append(document)
+            assembled.chunk_ids.extend(document.metadata["chunk_ids"])
+            assembled.context_tokens += tokens
+
+        assembled.tokens_saved = max(0, raw_tokens - sum(merged_tokens))
+        assembled.tokens_dropped = sum(merged_tokens) - assembled.context_tokens
+        return assembled
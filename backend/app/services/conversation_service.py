@@ -1,70 +1,187 @@
 from __future__ import annotations
 
+import base64
+import binascii
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence, Tuple
 from uuid import UUID
 
-from sqlmodel import Session, select
+from sqlalchemy import and_, inspect, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.models.conversation import Conversation, Message
+from app.models.conversation import PREVIEW_LENGTH, Conversation, Message
+
+
+def encode_cursor(conversation: Conversation) -> str:
+    """Opaque position after ``conversation`` in the (updated_at, id) descending order."""
+
+    raw = f"{conversation.updated_at.isoformat()}|{conversation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        updated_at, conversation_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(updated_at), UUID(conversation_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
 
 
 class ConversationService:
-    """Business logic for persisting conversations and messages."""
+    """Business logic for persisting conversations and messages.
+
+    Writes are staged on the session and sent by the caller's commit, so a
+    chat turn's inserts and the conversation update share one transaction.
+    """
 
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self._session = session
 
-    def create(self, nickname: str, title: Optional[str] = None) -> Conversation:
-        conversation = Conversation(nickname=nickname, title=title or "New chat")
+    def new(self, nickname: str, title: Optional[str] = None) -> Conversation:
+        """A conversation that is inserted by the next commit of :meth:`append`."""
+
+        return Conversation(nickname=nickname, title=title or "New chat")
+
+    async def create(self, nickname: str, title: Optional[str] = None) -> Conversation:
+        conversation = self.new(nickname, title)
         self._session.add(conversation)
-        self._session.commit()
-        self._session.refresh(conversation)
+        await self._session.commit()
         return conversation
 
-    def get(self, conversation_id: UUID) -> Conversation:
-        conversation = self._session.get(Conversation, conversation_id)
+    async def get(self, conversation_id: UUID) -> Conversation:
+        conversation = await self._session.get(Conversation, conversation_id)
         if not conversation:
             raise ValueError("Conversation not found")
         return conversation
 
-    def list_for_nickname(self, nickname: str) -> list[Conversation]:
-        statement = (
-            select(Conversation)
-            .where(Conversation.nickname == nickname)
-            .order_by(Conversation.updated_at.desc())
-        )
-        return list(self._session.exec(statement))
+    async def list_for_nickname(
+        self, nickname: str, limit: int = 50, cursor: Optional[str] = None
+    ) -> Tuple[list[Conversation], Optional[str]]:
+        """One page of ``nickname``'s conversations, most recent first, and the next cursor.
+
+        Keyset pagination on ``(updated_at, id)`` walks the composite index, so
+        each page costs one query however many conversations precede it.
+        """
+
+        statement = select(Conversation).where(Conversation.nickname == nickname)
+        if cursor:
+            updated_at, conversation_id = decode_cursor(cursor)
+            statement = statement.where(
+                or_(
+                    Conversation.updated_at < updated_at,
+                    and_(Conversation.updated_at == updated_at, Conversation.id < conversation_id),
+                )
+            )
+        statement = statement.order_by(
+            Conversation.updated_at.desc(), Conversation.id.desc()
+        ).limit(limit + 1)
 
-    def list_messages(self, conversation_id: UUID) -> list[Message]:
+        conversations = list(await self._session.exec(statement))
+        if len(conversations) <= limit:
+            return conversations, None
+        page = conversations[:limit]
+        return page, encode_cursor(page[-1])
+
+    async def list_messages(self, conversation_id: UUID) -> list[Message]:
         statement = (
             select(Message)
             .where(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.asc())
+            .order_by(Message.created_at.asc(), Message.id.asc())
         )
-        return list(self._session.exec(statement))
+        return list(await self._session.exec(statement))
+
+    async def page_messages(
+        self,
+        conversation_id: UUID,
+        limit: int = 50,
+        since: Optional[UUID] = None,
+        before: Optional[UUID] = None,
+    ) -> Tuple[list[Message], Optional[UUID]]:
+        """Up to ``limit`` messages in time order, and the cursor for the next page.
+
+        With ``since`` the page holds the messages right after that message;
+        otherwise it holds the latest ones, or the latest before ``before``.
+        The returned cursor is the message id to pass again as ``since`` (newest
+        on the page) or ``before`` (oldest on the page) when more remain in
+        that direction. Each page is one range scan of the
+        ``(conversation_id, created_at)`` index.
+        """
+
+        if since is not None and before is not None:
+            raise ValueError("Use either since or before, not both")
+
+        statement = select(Message).where(Message.conversation_id == conversation_id)
+        forward = since is not None
+        anchor_id = since if forward else before
+        if anchor_id is not None:
+            anchor_at = (
+                select(Message.created_at).where(Message.id == anchor_id).scalar_subquery()
+            )
+            if forward:
+                statement = statement.where(
+                    or_(
+                        Message.created_at > anchor_at,
+                        and_(Message.created_at == anchor_at, Message.id > anchor_id),
+                    )
+                )
+            else:
+                statement = statement.where(
+                    or_(
+                        Message.created_at < anchor_at,
+                        and_(Message.created_at == anchor_at, Message.id < anchor_id),
+                    )
+                )
+
+        if forward:
+            statement = statement.order_by(Message.created_at.asc(), Message.id.asc())
+        else:
+            statement = statement.order_by(Message.created_at.desc(), Message.id.desc())
+        messages = list(await self._session.exec(statement.limit(limit + 1)))
 
-    def get_last_message(self, conversation_id: UUID) -> Optional[Message]:
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if not forward:
+            messages.reverse()
+        if not has_more or not messages:
+            return messages, None
+        return messages, messages[-1].id if forward else messages[0].id
+
+    async def get_last_message(self, conversation_id: UUID) -> Optional[Message]:
         statement = (
             select(Message)
             .where(Message.conversation_id == conversation_id)
             .order_by(Message.created_at.desc())
         )
-        return self._session.exec(statement).first()
+        return (await self._session.exec(statement)).first()
+
+    async def add_message(self, conversation_id: UUID, role: str, content: str) -> Message:
+        """Stage one message for an existing conversation; the caller commits."""
 
-    def add_message(self, conversation_id: UUID, role: str, content: str) -> Message:
+        conversation = await self.get(conversation_id)
         message = Message(conversation_id=conversation_id, role=role, content=content)
-        self._session.add(message)
-        self._session.flush()
-        self._touch_conversation(conversation_id, last_user_message=content if role == "user" else None)
-        self._session.flush()
+        self.append(conversation, [message])
         return message
 
-    def _touch_conversation(self, conversation_id: UUID, last_user_message: Optional[str] = None) -> None:
-        conversation = self._session.get(Conversation, conversation_id)
-        if not conversation:
-            raise ValueError("Conversation not found")
-        conversation.updated_at = datetime.utcnow()
-        if last_user_message and (not conversation.title or conversation.title == "New chat"):
-            conversation.title = last_user_message[:80]
+    def append(self, conversation: Conversation, messages: Sequence[Message]) -> None:
+        """Stage ``messages`` (oldest first) and the conversation's summary columns.
+
+        Nothing is sent until the caller commits. A new conversation is inserted
+        along with them, its count and title set here; a stored one is updated
+        in the same flush.
+        """
+
+        self._session.add_all(messages)
+        latest = messages[-1]
+        conversation.updated_at = latest.created_at
+        conversation.last_message_preview = latest.content[:PREVIEW_LENGTH]
+        if inspect(conversation).persistent:
+            # Incremented in SQL so the API and a worker adding messages concurrently
+            # both count. The attribute is expired afterwards; do not read it back.
+            conversation.message_count = Conversation.message_count + len(messages)
+        else:
+            conversation.message_count = (conversation.message_count or 0) + len(messages)
+        question = next((message.content for message in messages if message.role == "user"), None)
+        if question and (not conversation.title or conversation.title == "New chat"):
+            conversation.title = question[:80]
         self._session.add(conversation)
@@ -1,18 +1,15 @@
 from __future__ import annotations
 
-import os
-import shutil
-import uuid
 from pathlib import Path
-from typing import Iterable, List
-
-from fastapi import UploadFile
-from langchain.schema import Document
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
 
 from app.core.config import Settings, get_settings
 from app.schemas.document import DocumentIngestionResult
 from app.services.document_loader import DocumentLoaderService
+from app.services.document_manifest import DocumentManifest, FileRecord, hash_file
 from app.services.embedding_store import EmbeddingStore
+from app.services.ingestion_pipeline import IngestionPipeline, ProgressCallback
+from app.services.registry import get_embedding_store
 
 
 class DocumentIngestionService:
@@ -23,14 +20,23 @@ class DocumentIngestionService:
         loader: DocumentLoaderService | None = None,
         store: EmbeddingStore | None = None,
         settings: Settings | None = None,
+        manifest: DocumentManifest | None = None,
+        pipeline: IngestionPipeline | None = None,
     ):
         self._loader = loader or DocumentLoaderService()
-        self._store = store or EmbeddingStore()
+        self._store = store or get_embedding_store()
         self._settings = settings or get_settings()
+        self._manifest = manifest or DocumentManifest(
+            Path(self._settings.vector_store_path) / "documents.json"
+        )
+        self._pipeline = pipeline or IngestionPipeline(self._store, self._settings)
 
-    def ingest_existing(self) -> List[DocumentIngestionResult]:
-        docs = self._loader.load_documents()
-        chunks = self._store.add_documents(docs)
+    def ingest_existing(
+        self,
+        on_progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> List[DocumentIngestionResult]:
+        chunks = self._ingest_unlocked(self._loader.list_files(), on_progress, should_stop)
         return [
             DocumentIngestionResult(
                 document_path=Path(self._settings.documents_path),
@@ -39,33 +45,128 @@ class DocumentIngestionService:
             )
         ]
 
-    def ingest_upload(self, upload: UploadFile) -> DocumentIngestionResult:
-        self._validate_upload(upload)
-        destination = self._save_upload(upload)
-        documents = self._loader.load_documents(destination.parent)
-        chunks = self._store.add_documents(documents)
+    def ingest_file(
+        self,
+        file_path: Path,
+        on_progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        upload: Optional[FileRecord] = None,
+    ) -> DocumentIngestionResult:
+        """Index one file already stored in the documents folder.
+
+        ``upload`` is the file as the upload receiver wrote it; its hash is
+        reused instead of reading the file again while size and mtime match.
+        """
+
+        known = {file_path: upload} if upload is not None else None
+        chunks = self._ingest_unlocked([file_path], on_progress, should_stop, known)
         return DocumentIngestionResult(
-            document_path=destination,
-            document_id=destination.stem,
+            document_path=file_path,
+            document_id=file_path.stem,
             chunks_indexed=chunks,
         )
 
-    def _save_upload(self, upload: UploadFile) -> Path:
-        filename = upload.filename or f"upload-{uuid.uuid4()}"
-        target = self._settings.documents_path / filename
-        with target.open("wb") as buffer:
-            shutil.copyfileobj(upload.file, buffer)
-        upload.file.seek(0)
-        return target
-
-    def _validate_upload(self, upload: UploadFile) -> None:
-        extension = Path(upload.filename or "").suffix.lower()
-        if extension not in self._settings.allowed_file_extensions:
-            raise ValueError("Unsupported file type")
-
-        upload.file.seek(0, os.SEEK_END)
-        size_bytes = upload.file.tell()
-        upload.file.seek(0)
-        max_bytes = self._settings.max_upload_megabytes * 1024 * 1024
-        if size_bytes > max_bytes:
-            raise ValueError("File exceeds allowed size")
+    def delete_document(self, file_path: Path) -> DocumentIngestionResult:
+        """Remove a stored file and its chunks.
+
+        If other files were recorded as copies of it, the first of them is
+        indexed in its place and the rest become copies of that one.
+        """
+
+        with self._manifest.transaction() as manifest:
+            removed = self._store.delete_document(file_path)
+            file_path.unlink(missing_ok=True)
+            manifest.forget(file_path)
+            added = self._rehome_copies(manifest, file_path)
+        return DocumentIngestionResult(
+            document_path=file_path,
+            document_id=file_path.stem,
+            chunks_indexed=added,
+            chunks_removed=removed,
+        )
+
+    def _ingest_unlocked(
+        self,
+        file_paths: Iterable[Path],
+        on_progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        known: Optional[Mapping[Path, FileRecord]] = None,
+    ) -> int:
+        """``_ingest_files`` holding the manifest lock only to commit the result.
+
+        Parsing and embedding can take minutes, so an upload no longer waits
+        behind a full rescan; the manifest is saved once the chunks are stored.
+        """
+
+        self._manifest.refresh()
+        added = self._ingest_files(self._manifest, file_paths, on_progress, should_stop, known)
+        self._manifest.commit()
+        return added
+
+    def _ingest_files(
+        self,
+        manifest: DocumentManifest,
+        file_paths: Iterable[Path],
+        on_progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        known: Optional[Mapping[Path, FileRecord]] = None,
+    ) -> int:
+        """Index the files whose content is not in the store yet; return chunks added.
+
+        A changed file's new chunks replace its old ones (see ``IngestionPipeline``).
+        Files in ``known`` are only hashed if they changed since that record.
+        """
+
+        pending: Dict[Path, FileRecord] = {}
+        pending_hashes: Dict[str, Path] = {}
+        # Changed files whose old content other files were recorded as copies of.
+        changed: List[Path] = []
+        for file_path in file_paths:
+            stat = file_path.stat()
+            if manifest.is_unchanged(file_path, stat):
+                continue
+
+            hashed = (known or {}).get(file_path)
+            if hashed is not None and hashed.matches(stat):
+                sha256 = hashed.sha256
+            else:
+                sha256 = hash_file(file_path)
+            previous = manifest.get(file_path)
+            record = FileRecord(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=sha256)
+            if previous is not None and previous.sha256 == sha256:
+                # Touched but not modified: only the stat fields need refreshing.
+                record.chunks = previous.chunks
+                record.copy_of = previous.copy_of
+                manifest.record(file_path, record)
+                continue
+
+            if previous is not None:
+                changed.append(file_path)
+            owner = manifest.find_by_hash(sha256) or pending_hashes.get(sha256)
+            if owner is None:
+                pending[file_path] = record
+                pending_hashes[sha256] = file_path
+                continue
+            # A byte-identical copy of a file indexed under another path.
+            if previous is not None and previous.copy_of is None:
+                self._store.delete_document(file_path)
+            record.copy_of = str(owner)
+            manifest.record(file_path, record)
+
+        added = 0
+        for file_path, chunks in self._pipeline.run(list(pending), on_progress, should_stop):
+            record = pending[file_path]
+            record.chunks = chunks
+            manifest.record(file_path, record)
+            added += chunks
+        for file_path in changed:
+            added += self._rehome_copies(manifest, file_path)
+        return added
+
+    def _rehome_copies(self, manifest: DocumentManifest, owner: Path) -> int:
+        """Index the copies of ``owner``'s former content again, now that it is gone."""
+
+        copies = [Path(path) for path in manifest.copies_of(owner)]
+        for copy in copies:
+            manifest.forget(copy)
+        return self._ingest_files(manifest, [copy for copy in copies if copy.exists()])
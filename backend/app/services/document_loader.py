@@ -4,11 +4,41 @@ from pathlib import Path
 from typing import Iterable, List
 
 from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 
 from app.core.config import Settings, get_settings
 
 
+def load_file(file_path: Path) -> List[Document]:
+    """Parse one PDF or text file into LangChain Documents (one per PDF page)."""
+
+    if Path(file_path).suffix.lower() == ".pdf":
+        loader = PyPDFLoader(str(file_path))
+    else:
+        loader = TextLoader(str(file_path), encoding="utf-8")
+    return loader.load()
+
+
+def split_documents(
+    documents: Iterable[Document], chunk_size: int, chunk_overlap: int
+) -> List[Document]:
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        # Offsets let context assembly merge neighbouring chunks exactly.
+        add_start_index=True,
+    )
+    return text_splitter.split_documents(list(documents))
+
+
+def load_chunks(file_path: Path, chunk_size: int, chunk_overlap: int) -> List[Document]:
+    """Parse and split one file; module-level so ingestion can run it in worker processes."""
+
+    return split_documents(load_file(file_path), chunk_size, chunk_overlap)
+
+
 class DocumentLoaderService:
     """Loads documents from disk into LangChain Document objects."""
 
@@ -16,20 +46,21 @@ class DocumentLoaderService:
         self._settings = settings or get_settings()
 
     def load_documents(self, directory: Path | None = None) -> List[Document]:
-        path = Path(directory or self._settings.documents_path)
         documents: List[Document] = []
+        for entry in self.list_files(directory):
+            documents.extend(self.load_file(entry))
+        return documents
+
+    def list_files(self, directory: Path | None = None) -> List[Path]:
+        path = Path(directory or self._settings.documents_path)
         if not path.exists():
-            return documents
+            return []
 
-        for entry in path.iterdir():
-            if entry.is_file() and entry.suffix.lower() in self._settings.allowed_file_extensions:
-                documents.extend(self._load_file(entry))
-        return documents
+        return sorted(
+            entry
+            for entry in path.iterdir()
+            if entry.is_file() and entry.suffix.lower() in self._settings.allowed_file_extensions
+        )
 
-    def _load_file(self, file_path: Path) -> Iterable[Document]:
-        suffix = file_path.suffix.lower()
-        if suffix == ".pdf":
-            loader = PyPDFLoader(str(file_path))
-        else:
-            loader = TextLoader(str(file_path), encoding="utf-8")
-        return loader.load()
+    def load_file(self, file_path: Path) -> Iterable[Document]:
+        return load_file(file_path)
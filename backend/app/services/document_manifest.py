@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from app.services.vector_storage import file_lock, write_json_atomic
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in fixed-size chunks."""
+
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class FileRecord:
+    size: int
+    mtime_ns: int
+    sha256: str
+    chunks: int = 0
+    # Set for byte-identical copies: the path whose chunks stand in for this file.
+    copy_of: Optional[str] = None
+
+    def matches(self, stat: os.stat_result) -> bool:
+        """Whether the file still has the size and mtime it had when recorded."""
+
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+class DocumentManifest:
+    """Tracks which source files are already indexed, keyed by path.
+
+    A file whose size and mtime match its record is skipped without being
+    read. Otherwise its content hash decides whether it changed or is a copy of
+    a file that is already indexed under another path.
+
+    Long ingestion runs :meth:`refresh`, works without the lock, then
+    :meth:`commit` applies its changes on top of whatever other jobs saved
+    meanwhile. Short updates use :meth:`transaction`.
+    """
+
+    def __init__(self, path: Path):
+        self._file = Path(path)
+        self._file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = self._file.with_suffix(".lock")
+        self._records: Dict[str, FileRecord] = {}
+        # Records set (or forgotten, as ``None``) since the manifest was last read.
+        self._changes: Dict[str, Optional[FileRecord]] = {}
+
+    def get(self, file_path: Path) -> Optional[FileRecord]:
+        return self._records.get(str(file_path))
+
+    def find_by_hash(self, sha256: str) -> Optional[str]:
+        """Path whose chunks are indexed for this content, never a copy of it."""
+
+        for path, record in self._records.items():
+            if record.sha256 == sha256 and record.copy_of is None:
+                return path
+        return None
+
+    def copies_of(self, file_path: Path) -> List[str]:
+        return [path for path, record in self._records.items() if record.copy_of == str(file_path)]
+
+    def indexed_path(self, sha256: str) -> Optional[str]:
+        """Path already indexed with this content, read from the saved manifest.
+
+        No lock is taken: the manifest file is only ever replaced atomically.
+        """
+
+        self._load()
+        return self.find_by_hash(sha256)
+
+    def is_unchanged(self, file_path: Path, stat: os.stat_result) -> bool:
+        record = self.get(file_path)
+        return record is not None and record.matches(stat)
+
+    def record(self, file_path: Path, record: FileRecord) -> None:
+        self._records[str(file_path)] = record
+        self._changes[str(file_path)] = record
+
+    def forget(self, file_path: Path) -> Optional[FileRecord]:
+        self._changes[str(file_path)] = None
+        return self._records.pop(str(file_path), None)
+
+    def refresh(self) -> None:
+        """Read the saved records, dropping unsaved changes.
+
+        No lock is taken: the manifest file is only ever replaced atomically.
+        """
+
+        self._load()
+
+    def commit(self) -> None:
+        """Save the changes made since :meth:`refresh` over the latest saved records."""
+
+        with file_lock(self._lock_file):
+            changes = self._changes
+            self._load()
+            for path, record in changes.items():
+                if record is None:
+                    self._records.pop(path, None)
+                else:
+                    self._records[path] = record
+            self._save()
+
+    @contextmanager
+    def transaction(self) -> Iterator[DocumentManifest]:
+        """Reload, let the caller update records, then save, all under a lock."""
+
+        with file_lock(self._lock_file):
+            self._load()
+            yield self
+            self._save()
+
+    def _load(self) -> None:
+        self._changes = {}
+        if not self._file.exists():
+            self._records = {}
+            return
+        raw = json.loads(self._file.read_text(encoding="utf-8"))
+        self._records = {path: FileRecord(**record) for path, record in raw.items()}
+
+    def _save(self) -> None:
+        write_json_atomic(
+            self._file,
+            {path: asdict(record) for path, record in self._records.items()},
+        )
+        self._changes = {}
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.vector_storage import (
+    VECTOR_DTYPE,
+    file_lock,
+    fsync_append,
+    write_json_atomic,
+)
+
+DIGEST_SIZE = 16
+
+# Row of each digest and the vectors those rows index, published together.
+_Snapshot = Tuple[Dict[str, int], np.ndarray]
+
+
+def chunk_digest(text: str) -> str:
+    """Content address of a chunk: a 128-bit BLAKE2b digest of its UTF-8 text."""
+
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent, append-only map from chunk digest to embedding vector.
+
+    Keys and vectors are stored as fixed-width records so the cache can be
+    extended without rewriting it and reopened by memory-mapping. Entries are
+    tied to the embedding model that produced them; switching models starts a
+    fresh cache.
+    """
+
+    def __init__(self, path: Path, model_name: str):
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._meta_file = self._path / "cache.json"
+        self._keys_file = self._path / "keys.bin"
+        self._vectors_file = self._path / "vectors.f32"
+        self._lock_file = self._path / ".lock"
+        self._model_name = model_name
+        # Ingestion threads share one cache; readers take the snapshot without locking.
+        self._snapshot: _Snapshot = ({}, np.zeros((0, 0), dtype=VECTOR_DTYPE))
+        self._load_lock = threading.Lock()
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._snapshot[0])
+
+    def get_many(self, digests: Sequence[str]) -> Dict[str, np.ndarray]:
+        self._refresh()
+        rows, vectors = self._snapshot
+        return {digest: np.asarray(vectors[rows[digest]]) for digest in digests if digest in rows}
+
+    def put_many(self, digests: Sequence[str], vectors: np.ndarray) -> None:
+        matrix = np.asarray(vectors, dtype=VECTOR_DTYPE)
+        with file_lock(self._lock_file):
+            count, dimension = self._read_meta()
+            self._load(count, dimension)
+
+            fresh: List[int] = []
+            seen = set(self._snapshot[0])
+            for row, digest in enumerate(digests):
+                if digest not in seen:
+                    seen.add(digest)
+                    fresh.append(row)
+            if not fresh:
+                return
+
+            dimension = dimension or matrix.shape[1]
+            keys = b"".join(bytes.fromhex(digests[row]) for row in fresh)
+            fsync_append(self._keys_file, count * DIGEST_SIZE, keys)
+            fsync_append(
+                self._vectors_file,
+                count * dimension * VECTOR_DTYPE.itemsize,
+                matrix[fresh].tobytes(),
+            )
+            write_json_atomic(
+                self._meta_file,
+                {"model": self._model_name, "dimension": dimension, "count": count + len(fresh)},
+            )
+            self._load(count + len(fresh), dimension)
+
+    def _refresh(self) -> None:
+        count, dimension = self._read_meta()
+        if count != len(self):
+            self._load(count, dimension)
+
+    def _read_meta(self) -> tuple[int, int]:
+        if not self._meta_file.exists():
+            return 0, 0
+        meta = json.loads(self._meta_file.read_text(encoding="utf-8"))
+        if meta.get("model") != self._model_name:
+            return 0, 0
+        return int(meta["count"]), int(meta["dimension"])
+
+    def _load(self, count: int, dimension: int) -> None:
+        with self._load_lock:
+            rows, vectors = self._snapshot
+            if count == len(rows) and dimension == vectors.shape[1]:
+                return
+
+            # Built aside and swapped in whole, so no reader pairs new rows with old vectors.
+            rows = dict(rows) if count >= len(rows) else {}
+            loaded = len(rows)
+            if count > loaded:
+                # Only the keys appended since the last load need to be read.
+                with self._keys_file.open("rb") as handle:
+                    handle.seek(loaded * DIGEST_SIZE)
+                    raw = handle.read((count - loaded) * DIGEST_SIZE)
+                for offset in range(0, len(raw), DIGEST_SIZE):
+                    key = raw[offset : offset + DIGEST_SIZE].hex()
+                    rows[key] = loaded + offset // DIGEST_SIZE
+
+            vectors = (
+                np.memmap(
+                    self._vectors_file, dtype=VECTOR_DTYPE, mode="r", shape=(count, dimension)
+                )
+                if count
+                else np.zeros((0, dimension), dtype=VECTOR_DTYPE)
+            )
+            self._snapshot = (rows, vectors)
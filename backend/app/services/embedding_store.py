@@ -1,102 +1,262 @@
 from __future__ import annotations
 
-import json
+import threading
 from pathlib import Path
-from typing import Iterable, List
+from typing import Dict, Iterable, List, Sequence, Tuple
 
 import numpy as np
 from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import SentenceTransformerEmbeddings
 
 from app.core.config import Settings, get_settings
+from app.services.document_loader import split_documents
+from app.services.embedding_cache import EmbeddingCache, chunk_digest
+from app.services.vector_search import (
+    IvfIndex,
+    exact_search,
+    lexical_search,
+    reciprocal_rank_fusion,
+    rescored_search,
+)
+from app.services.vector_storage import (
+    OWNER_FIELD,
+    StorageSnapshot,
+    VectorStorage,
+    migrate_json_store,
+)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 
 
 class EmbeddingStore:
-    """Handles vector store persistence and similarity search."""
+    """Handles vector store persistence and similarity search.
+
+    Chunks belong to the document in their ``source`` metadata, which
+    ``replace_document`` and ``delete_document`` act on.
+    """
 
-    def __init__(self, settings: Settings | None = None):
+    def __init__(
+        self,
+        settings: Settings | None = None,
+        embeddings: SentenceTransformerEmbeddings | None = None,
+    ):
         self._settings = settings or get_settings()
         self._vector_store_path = Path(self._settings.vector_store_path)
         self._vector_store_path.mkdir(parents=True, exist_ok=True)
-        self._embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-        self._index_file = self._vector_store_path / "store.json"
-        self._documents: List[str] = []
-        self._metadatas: List[dict] = []
-        self._vectors: List[List[float]] = []
-        self._load_store()
-
-    def _load_store(self) -> None:
-        if not self._index_file.exists():
-            return
+        self._embeddings = embeddings or SentenceTransformerEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME
+        )
+        self._cache = EmbeddingCache(
+            self._vector_store_path / "embedding_cache",
+            EMBEDDING_MODEL_NAME,
+        )
+        # One-shot upgrade of stores written before the binary layout existed.
+        migrate_json_store(self._vector_store_path)
+        self._storage = VectorStorage(
+            self._vector_store_path,
+            quantization=self._settings.vector_quantization,
+            lexical=self._settings.lexical_search,
+        )
+        self._index: IvfIndex | None = None
+        if self._settings.vector_index == "ivf":
+            self._index = IvfIndex(
+                self._vector_store_path / "ivf",
+                nlist=self._settings.ivf_nlist,
+                nprobe=self._settings.ivf_nprobe,
+            )
+            self._sync_index()
+        self._compaction: threading.Thread | None = None
+        # Worker threads refresh concurrently; one reload per new generation is enough.
+        self._refresh_lock = threading.Lock()
 
-        try:
-            raw = json.loads(self._index_file.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
-            return
+    @property
+    def version(self) -> int:
+        """Generation of the on-disk store this instance currently serves."""
 
-        self._documents = list(raw.get("documents", []))
-        self._metadatas = list(raw.get("metadatas", []))
-        raw_vectors = raw.get("vectors", [])
-        self._vectors = [
-            [float(value) for value in vector]
-            for vector in raw_vectors
-            if isinstance(vector, (list, tuple))
-        ]
+        return self._storage.generation
+
+    def refresh(self) -> bool:
+        """Pick up chunks committed by other processes; cheap when nothing changed."""
 
-    def _persist_store(self) -> None:
-        payload = {
-            "documents": self._documents,
-            "metadatas": self._metadatas,
-            "vectors": self._vectors,
-        }
-        self._index_file.write_text(json.dumps(payload), encoding="utf-8")
+        with self._refresh_lock:
+            if not self._storage.refresh():
+                return False
+            self._sync_index()
+            return True
 
     def add_documents(self, documents: Iterable[Document]) -> int:
-        docs = list(documents)
-        if not docs:
+        return self.add_chunks(
+            split_documents(documents, self._settings.chunk_size, self._settings.chunk_overlap)
+        )
+
+    def add_chunks(self, chunks: Sequence[Document], replaces: Sequence[Path | str] = ()) -> int:
+        """Embed already split chunks and store them as one new segment.
+
+        Chunks already stored for the ``replaces`` documents are deleted in the
+        same commit; chunks in ``chunks`` itself are never affected.
+        """
+
+        if not chunks and not replaces:
             return 0
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=200,
-            length_function=len,
+        contents = [chunk.page_content for chunk in chunks]
+        digests = [chunk_digest(content) for content in contents]
+        vectors = self._embed(contents, digests) if contents else np.zeros((0, 0))
+
+        self._storage.append(
+            contents,
+            [
+                {**chunk.metadata, "chunk_id": digest}
+                for chunk, digest in zip(chunks, digests, strict=True)
+            ],
+            vectors,
+            replaces=[str(source) for source in replaces],
         )
-        split_docs: List[Document] = text_splitter.split_documents(docs)
-        contents = [doc.page_content for doc in split_docs]
-        embeddings = self._embeddings.embed_documents(contents)
+        self._sync_index()
+        self._schedule_compaction()
+        return len(chunks)
+
+    def replace_document(self, source: Path | str, chunks: Sequence[Document]) -> int:
+        """Swap the stored chunks of ``source`` for ``chunks`` in one commit."""
+
+        owned = [
+            Document(
+                page_content=chunk.page_content,
+                metadata={**chunk.metadata, OWNER_FIELD: str(source)},
+            )
+            for chunk in chunks
+        ]
+        return self.add_chunks(owned, replaces=[source])
+
+    def delete_document(self, source: Path | str) -> int:
+        """Tombstone every chunk of ``source``; return how many were removed."""
 
-        for doc, embedding in zip(split_docs, embeddings):
-            self._documents.append(doc.page_content)
-            self._metadatas.append(dict(doc.metadata))
-            self._vectors.append([float(value) for value in embedding])
+        removed = self._storage.delete([str(source)])
+        self._schedule_compaction()
+        return removed
 
-        self._persist_store()
-        return len(split_docs)
+    def _sync_index(self) -> None:
+        if self._index is not None:
+            snapshot = self._storage.snapshot()
+            self._index.sync(snapshot.vectors, snapshot.epoch)
+
+    def _embed(self, contents: List[str], digests: List[str]) -> np.ndarray:
+        """Embed chunks, computing vectors only for content the cache has never seen."""
+
+        vectors = self._cache.get_many(digests)
+        missing: Dict[str, str] = {}
+        for content, digest in zip(contents, digests, strict=True):
+            if digest not in vectors:
+                missing.setdefault(digest, content)
+
+        if missing:
+            fresh = np.asarray(
+                self._embeddings.embed_documents(list(missing.values())),
+                dtype=np.float32,
+            )
+            self._cache.put_many(list(missing), fresh)
+            vectors.update(zip(missing, fresh, strict=True))
+
+        return np.stack([vectors[digest] for digest in digests])
+
+    def _schedule_compaction(self) -> None:
+        target_rows = self._settings.segment_target_rows
+        trigger = self._settings.segment_compaction_trigger
+        max_dead_fraction = self._settings.segment_max_dead_fraction
+        if not self._storage.needs_compaction(target_rows, trigger, max_dead_fraction):
+            return
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+
+        # Searches keep running against the old segments until the new manifest
+        # is swapped in. Dropping deleted rows renumbers the rest, so the IVF
+        # index is remapped before the lock is released; until then searches
+        # on the new rows are exact.
+        self._compaction = threading.Thread(
+            target=self._storage.compact,
+            args=(target_rows, max_dead_fraction),
+            kwargs={"on_renumber": self._index.remap if self._index is not None else None},
+            name="vector-store-compaction",
+            daemon=True,
+        )
+        self._compaction.start()
 
     def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        if not self._vectors:
+        query_vector = self.embed_query(query)
+        if query_vector is None:
             return []
+        documents, _ = self.search_with_vectors(query_vector, k, query)
+        return documents
 
-        vector_matrix = np.array(self._vectors, dtype=np.float32)
-        query_vector = np.array(self._embeddings.embed_query(query), dtype=np.float32)
+    def embed_query(self, query: str) -> np.ndarray | None:
+        """Unit-normalized query embedding, or ``None`` for a zero vector."""
 
+        query_vector = np.asarray(self._embeddings.embed_query(query), dtype=np.float32)
         query_norm = np.linalg.norm(query_vector)
         if query_norm == 0:
-            return []
+            return None
+        return query_vector / query_norm
+
+    def search_by_vector(self, query_vector: np.ndarray, k: int = 4) -> List[Document]:
+        """Nearest chunks to a unit-normalized query vector, best first."""
+
+        documents, _ = self.search_with_vectors(query_vector, k)
+        return documents
 
-        document_norms = np.linalg.norm(vector_matrix, axis=1)
-        denom = document_norms * query_norm
-        denom[denom == 0] = 1e-12
+    def search_with_vectors(
+        self, query_vector: np.ndarray, k: int = 4, query: str | None = None
+    ) -> Tuple[List[Document], np.ndarray]:
+        """Like ``search_by_vector``, also returning the chunks' stored unit vectors.
 
-        similarities = vector_matrix @ query_vector / denom
-        top_indices = np.argsort(similarities)[::-1][:k]
+        With the ``query`` text and lexical search enabled, the vector and BM25
+        rankings are fused by reciprocal rank; each chunk's fused score is in
+        its ``rank_score`` metadata, next to its cosine ``score``.
+        """
+
+        self.refresh()
+        # Row numbers are only stable within one snapshot.
+        snapshot = self._storage.snapshot()
+        if not snapshot.live_count:
+            return [], np.zeros((0, len(query_vector)), dtype=np.float32)
+
+        rank_scores = None
+        if query and snapshot.lexical is not None:
+            depth = max(k, self._settings.hybrid_candidates)
+            nearest, _ = self._vector_search(snapshot, query_vector, depth)
+            matching, _ = lexical_search(snapshot.lexical, query, depth, snapshot.live)
+            top_indices, rank_scores = reciprocal_rank_fusion(
+                [nearest, matching], k, self._settings.rrf_k
+            )
+            scores = snapshot.vectors[top_indices] @ query_vector
+        else:
+            top_indices, scores = self._vector_search(snapshot, query_vector, k)
 
         documents: List[Document] = []
-        for idx in top_indices:
-            metadata = dict(self._metadatas[idx])
+        for position, (idx, score) in enumerate(zip(top_indices, scores, strict=True)):
+            metadata = snapshot.metadata(int(idx))
             # Persist cosine similarity so downstream consumers can rank results.
-            metadata["score"] = float(similarities[idx])
-            documents.append(Document(page_content=self._documents[idx], metadata=metadata))
+            metadata["score"] = float(score)
+            if rank_scores is not None:
+                metadata["rank_score"] = float(rank_scores[position])
+            documents.append(Document(page_content=snapshot.text(int(idx)), metadata=metadata))
 
-        return documents
+        return documents, snapshot.vectors[np.asarray(top_indices)]
+
+    def _vector_search(
+        self, snapshot: StorageSnapshot, query_vector: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Stored rows are unit-normalized, so dot products are cosine similarities.
+        if self._index is not None and self._index.is_trained:
+            return self._index.search(
+                snapshot.vectors, query_vector, k, snapshot.live, snapshot.epoch
+            )
+        if snapshot.codes is not None:
+            return rescored_search(
+                snapshot.codes,
+                snapshot.vectors,
+                query_vector,
+                k,
+                self._settings.vector_rescore_candidates,
+                snapshot.live,
+            )
+        return exact_search(snapshot.vectors, query_vector, k, snapshot.live)
@@ -1,32 +1,263 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Optional
 
 import httpx
 
 from app.core.config import Settings, get_settings
 
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_client_lock = threading.Lock()
+_clients: Dict[int, httpx.Client] = {}
+_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _limits(settings: Settings) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.flow_max_connections,
+        max_keepalive_connections=settings.flow_max_keepalive_connections,
+        keepalive_expiry=settings.flow_keepalive_expiry,
+    )
+
+
+def _timeout(settings: Settings, remaining: Optional[float] = None) -> httpx.Timeout:
+    read = settings.flow_read_timeout
+    connect = settings.flow_connect_timeout
+    if remaining is not None:
+        read, connect = min(read, remaining), min(connect, remaining)
+    return httpx.Timeout(read, connect=connect, pool=connect)
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before ``deadline`` (epoch seconds); raise once it has passed."""
+
+    if deadline is None:
+        return None
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("The caller's deadline passed before Flow answered")
+    return remaining
+
+
+def _remaining_or_zero(deadline: Optional[float]) -> Optional[float]:
+    # After a failed attempt a passed deadline means "do not retry", not an error.
+    return None if deadline is None else max(0.0, deadline - time.time())
+
+
+def build_http_client(settings: Settings) -> httpx.Client:
+    """Create a keep-alive client with the configured pool limits and timeouts."""
+
+    # Connection failures never reached Flow, so the transport retries them once.
+    transport = httpx.HTTPTransport(http2=settings.flow_http2, limits=_limits(settings), retries=1)
+    return httpx.Client(transport=transport, timeout=_timeout(settings))
+
+
+def build_async_http_client(settings: Settings) -> httpx.AsyncClient:
+    """Asyncio counterpart of :func:`build_http_client`."""
+
+    transport = httpx.AsyncHTTPTransport(
+        http2=settings.flow_http2, limits=_limits(settings), retries=1
+    )
+    return httpx.AsyncClient(transport=transport, timeout=_timeout(settings))
+
+
+def get_http_client() -> httpx.Client:
+    """Return this process's shared Flow client.
+
+    Clients are keyed by pid so a forked worker process never reuses sockets
+    opened by its parent.
+    """
+
+    pid = os.getpid()
+    with _client_lock:
+        client = _clients.get(pid)
+        if client is None:
+            _clients.clear()
+            client = _clients[pid] = build_http_client(get_settings())
+        return client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the shared async Flow client for the running event loop.
+
+    ``httpx.AsyncClient`` connections belong to the loop that opened them, so
+    each loop gets its own client.
+    """
+
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = build_async_http_client(get_settings())
+        return client
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a ``Retry-After`` header (delta or HTTP date)."""
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_delay(
+    settings: Settings,
+    attempt: int,
+    response: httpx.Response,
+    remaining: Optional[float] = None,
+) -> Optional[float]:
+    """Seconds to sleep before retrying, or ``None`` to give up.
+
+    Backoff is "full jitter" exponential. A ``Retry-After`` longer than the
+    maximum backoff is honoured by giving up rather than holding the worker,
+    and so is any wait that would reach the caller's deadline (``remaining``
+    seconds away).
+    """
+
+    if attempt >= settings.flow_max_retries:
+        return None
+    ceiling = min(settings.flow_retry_max_backoff, settings.flow_retry_backoff * 2**attempt)
+    delay = random.uniform(0, ceiling)
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    if retry_after is not None:
+        if retry_after > settings.flow_retry_max_backoff:
+            return None
+        delay = max(delay, retry_after)
+    if remaining is not None and delay >= remaining:
+        return None
+    return delay
+
+
+def _headers(settings: Settings) -> dict[str, str]:
+    headers = {
+        "FlowTenant": settings.flow_tenant,
+        "FlowAgent": settings.flow_agent,
+        "FlowAgentSecret": settings.flow_agent_secret,
+        "Content-Type": "application/json",
+    }
+    if settings.flow_channel:
+        headers["FlowChannel"] = settings.flow_channel
+    return headers
+
 
 class FlowClient:
-    """HTTP client for CI&T Flow chat completions."""
+    """HTTP client for CI&T Flow chat completions.
+
+    Calls take an optional ``deadline`` (epoch seconds, as in a job's meta).
+    Each attempt's timeouts and the retries are capped by it, so a chat whose
+    caller has already been answered does not keep the worker busy.
+    """
 
-    def __init__(self, settings: Settings | None = None):
+    def __init__(self, settings: Settings | None = None, http_client: httpx.Client | None = None):
         self._settings = settings or get_settings()
+        self._http = http_client or get_http_client()
 
-    def _headers(self) -> dict[str, str]:
-        headers = {
-            "FlowTenant": self._settings.flow_tenant,
-            "FlowAgent": self._settings.flow_agent,
-            "FlowAgentSecret": self._settings.flow_agent_secret,
-            "Content-Type": "application/json",
-        }
-        if self._settings.flow_channel:
-            headers["FlowChannel"] = self._settings.flow_channel
-        return headers
-
-    def chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def chat_completion(
+        self, payload: Dict[str, Any], deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        response = self._send(payload, stream=False, deadline=deadline)
+        return response.json()
+
+    def stream_chat_completion(
+        self, payload: Dict[str, Any], deadline: Optional[float] = None
+    ) -> Iterator[str]:
+        """Yield content deltas from Flow's server-sent event stream as they arrive."""
+
+        response = self._send({**payload, "stream": True}, stream=True, deadline=deadline)
+        try:
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                for choice in chunk.get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            response.close()
+
+    def _send(
+        self, payload: Dict[str, Any], stream: bool, deadline: Optional[float]
+    ) -> httpx.Response:
         url = f"{self._settings.flow_base_url}/openai/chat/completions"
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(url, headers=self._headers(), json=payload)
-            response.raise_for_status()
-            return response.json()
+        attempt = 0
+        while True:
+            remaining = _remaining(deadline)
+            request = self._http.build_request(
+                "POST",
+                url,
+                headers=_headers(self._settings),
+                json=payload,
+                timeout=_timeout(self._settings, remaining),
+            )
+            response = self._http.send(request, stream=stream)
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+            delay = retry_delay(self._settings, attempt, response, _remaining_or_zero(deadline))
+            if delay is None:
+                break
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+        if response.is_error:
+            response.read()
+            response.close()
+        response.raise_for_status()
+        return response
+
+
+class AsyncFlowClient:
+    """Asyncio variant of :class:`FlowClient` with the same retry policy."""
+
+    def __init__(
+        self, settings: Settings | None = None, http_client: httpx.AsyncClient | None = None
+    ):
+        self._settings = settings or get_settings()
+        self._http = http_client
+
+    async def chat_completion(
+        self, payload: Dict[str, Any], deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        http = self._http or get_async_http_client()
+        url = f"{self._settings.flow_base_url}/openai/chat/completions"
+        attempt = 0
+        while True:
+            response = await http.post(
+                url,
+                headers=_headers(self._settings),
+                json=payload,
+                timeout=_timeout(self._settings, _remaining(deadline)),
+            )
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+            delay = retry_delay(self._settings, attempt, response, _remaining_or_zero(deadline))
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,170 @@
+"""Document ingestion as background jobs with progress and cancellation.
+
+Ingestion is queued on the bulk queue, so workers serve chat first and never
+give it more than ``WORKER_BULK_CONCURRENCY`` threads. The API only streams an
+upload to disk (see ``app.services.upload_receiver``) before queueing it.
+Parsing, splitting and embedding all happen in the worker, and so do deletes.
+
+While it runs, the job keeps an ``IngestionProgress`` snapshot in its RQ meta.
+Cancelling a queued job drops it. A running job is asked to stop through a
+Redis flag it checks between files. It then stores the files it has already
+taken and finishes with ``cancelled`` set.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+from rq.job import Job
+
+from app.core.config import Settings, get_settings
+from app.schemas.document import (
+    DocumentIngestionResult,
+    IngestionJobAccepted,
+    IngestionJobProgress,
+    IngestionJobStatus,
+)
+from app.services.ingestion_pipeline import IngestionProgress
+from app.services.task_queue import TaskQueue
+from app.services.upload_receiver import UploadReceiver, safe_filename
+
+CANCEL_KEY_PREFIX = "flow:ingest-cancel:"
+# Progress is written to Redis at most this often.
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+def cancel_key(job_id: str) -> str:
+    return f"{CANCEL_KEY_PREFIX}{job_id}"
+
+
+def _status_name(status: Any) -> str:
+    return str(getattr(status, "value", status))
+
+
+class ProgressReporter:
+    """Job-side half: publishes progress to the job's meta and reads the cancel flag."""
+
+    def __init__(self, job: Job, interval: float = PROGRESS_INTERVAL_SECONDS):
+        self._job = job
+        self._interval = interval
+        self._saved_at = 0.0
+        self._latest: Optional[IngestionProgress] = None
+
+    def update(self, progress: IngestionProgress) -> None:
+        self._latest = progress
+        now = time.monotonic()
+        if now - self._saved_at >= self._interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._latest is None:
+            return
+        self._job.meta["progress"] = self._latest.as_dict()
+        self._job.save_meta()
+        self._saved_at = time.monotonic()
+
+    def should_stop(self) -> bool:
+        return bool(self._job.connection.exists(cancel_key(self._job.id)))
+
+
+class IngestionJobs:
+    """API-side half: queues ingestion jobs, reports on them and cancels them."""
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        settings: Optional[Settings] = None,
+        receiver: Optional[UploadReceiver] = None,
+    ):
+        self._queue = queue
+        self._settings = settings or get_settings()
+        self._receiver = receiver or UploadReceiver(self._settings)
+
+    async def submit_upload(
+        self,
+        headers: Mapping[str, str],
+        stream: AsyncIterator[bytes],
+        filename: Optional[str] = None,
+    ) -> IngestionJobAccepted:
+        """Stream the upload to disk, then queue its indexing unless it is a known file.
+
+        With ``filename`` the upload replaces that document: its old chunks are
+        deleted when the job stores the new ones.
+        """
+
+        stored = await self._receiver.receive(headers, stream, filename)
+        if stored.duplicate:
+            return IngestionJobAccepted(
+                status="duplicate",
+                document_path=stored.path,
+                document_id=stored.path.stem,
+                sha256=stored.sha256,
+            )
+        # The receiver hashed the upload while streaming it; the job reuses that digest.
+        upload = {"size": stored.size, "mtime_ns": stored.mtime_ns, "sha256": stored.sha256}
+        accepted = await asyncio.to_thread(
+            self._submit, {"path": str(stored.path), "upload": upload}
+        )
+        accepted.document_path = stored.path
+        accepted.document_id = stored.path.stem
+        accepted.sha256 = stored.sha256
+        return accepted
+
+    def submit_existing(self) -> IngestionJobAccepted:
+        """Queue a scan of the documents folder for new or changed files."""
+
+        return self._submit({})
+
+    def submit_delete(self, filename: str) -> IngestionJobAccepted:
+        """Queue removal of a stored document and its chunks.
+
+        It runs on the bulk queue like ingestion, so it waits for any ingestion
+        already updating the document manifest.
+        """
+
+        path = Path(self._settings.documents_path) / filename
+        if safe_filename(filename) != filename or not path.is_file():
+            raise ValueError(f"Document {filename} not found")
+        accepted = self._submit({"delete": str(path)})
+        accepted.document_path = path
+        accepted.document_id = path.stem
+        return accepted
+
+    def status(self, job_id: str) -> IngestionJobStatus:
+        job = self._queue.fetch(job_id)
+        status = _status_name(job.status)
+        payload: Dict[str, Any] = job.payload or {}
+        # Finished jobs return their final progress; running ones keep it in meta.
+        progress = payload.get("progress") or job.meta.get("progress")
+        if status == "finished" and payload.get("cancelled"):
+            status = "canceled"
+        return IngestionJobStatus(
+            job_id=job_id,
+            status=status,
+            cancel_requested=bool(self._queue.connection.exists(cancel_key(job_id))),
+            progress=IngestionJobProgress(**progress) if progress else None,
+            results=[
+                DocumentIngestionResult.model_validate(result)
+                for result in payload.get("results") or []
+            ],
+            error="Ingestion job failed" if status == "failed" else None,
+        )
+
+    def cancel(self, job_id: str) -> IngestionJobStatus:
+        """Drop a queued job, or ask a running one to stop after the files it has taken."""
+
+        if not self._queue.cancel(job_id) and self.status(job_id).status == "started":
+            self._queue.connection.set(cancel_key(job_id), 1, ex=self._settings.ingest_job_timeout)
+        return self.status(job_id)
+
+    def _submit(self, payload: Dict[str, Any]) -> IngestionJobAccepted:
+        # Imported here because the task module imports this one.
+        from app.worker.tasks import ingest_documents
+
+        job = self._queue.enqueue(
+            ingest_documents, payload, job_timeout=self._settings.ingest_job_timeout
+        )
+        return IngestionJobAccepted(job_id=job.job_id, status=_status_name(job.status))
@@ -0,0 +1,200 @@
+"""Streams files through parsing, embedding and storage in bounded batches.
+
+Parsing and splitting (PDF extraction above all) is CPU-bound, so it runs on a
+process pool. At most two files per process are in flight, and their chunks
+are consumed in submission order. Chunks are gathered into batches of
+``INGEST_BATCH_SIZE``, and each full batch is embedded and stored as one
+segment while the pool parses the next files. Memory therefore stays bounded
+by the files in flight plus one batch, however many files an ingestion covers.
+
+Ingesting a file replaces whatever the store held for it: the batch holding a
+file's first chunks also deletes its earlier ones, in the same commit.
+
+Callers can follow an ``IngestionProgress`` as it advances and ask the pipeline
+to stop; it then finishes the files whose chunks it has started storing, so
+every reported file is stored whole.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+)
+
+from langchain.schema import Document
+
+from app.core.config import Settings, get_settings
+from app.services.document_loader import load_chunks
+
+# Files each parser process may have queued or finished but not yet consumed.
+FILES_IN_FLIGHT_PER_WORKER = 2
+
+
+class ChunkSink(Protocol):
+    def add_chunks(self, chunks: Sequence[Document], replaces: Sequence[Path] = ()) -> int: ...
+
+
+@dataclass
+class IngestionProgress:
+    files_total: int = 0
+    bytes_total: int = 0
+    files_parsed: int = 0
+    bytes_parsed: int = 0
+    chunks_embedded: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Seconds left at the byte rate so far; ``None`` until a file is parsed."""
+
+        if not self.bytes_parsed:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        rate = self.bytes_parsed / max(elapsed, 1e-6)
+        return round(max(0, self.bytes_total - self.bytes_parsed) / rate, 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "files_total": self.files_total,
+            "files_parsed": self.files_parsed,
+            "chunks_embedded": self.chunks_embedded,
+            "bytes_total": self.bytes_total,
+            "bytes_parsed": self.bytes_parsed,
+            "eta_seconds": self.eta_seconds,
+        }
+
+
+ProgressCallback = Callable[[IngestionProgress], None]
+
+
+class IngestionPipeline:
+    """Parses files in parallel and stores their chunks in fixed-size batches."""
+
+    def __init__(
+        self,
+        store: ChunkSink,
+        settings: Optional[Settings] = None,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self._store = store
+        self._settings = settings or get_settings()
+        self._workers = workers or self._settings.ingest_workers or os.cpu_count() or 1
+        self._batch_size = max(1, batch_size or self._settings.ingest_batch_size)
+
+    def run(
+        self,
+        paths: Sequence[Path],
+        on_progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[Tuple[Path, int]]:
+        """Yield ``(path, chunks)`` for each file, in order, once all its chunks are stored.
+
+        ``on_progress`` is called after every parsed file and stored batch.
+        When ``should_stop`` returns true between files, no further file is
+        taken and the ones already taken are stored and reported.
+        """
+
+        progress = IngestionProgress(
+            files_total=len(paths), bytes_total=sum(path.stat().st_size for path in paths)
+        )
+        parse = partial(
+            load_chunks,
+            chunk_size=self._settings.chunk_size,
+            chunk_overlap=self._settings.chunk_overlap,
+        )
+        workers = min(self._workers, len(paths))
+        if workers <= 1:
+            # A single file is not worth starting a process pool for.
+            parsed = ((path, parse(path)) for path in paths)
+            yield from self._batched(parsed, progress, on_progress, should_stop)
+            return
+
+        # Spawned, not forked: the parent may hold model threads and open sockets.
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        try:
+            parsed = _parse_ahead(executor, parse, paths, FILES_IN_FLIGHT_PER_WORKER * workers)
+            yield from self._batched(parsed, progress, on_progress, should_stop)
+        finally:
+            # Files parsed ahead of a stop are dropped rather than waited for.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _batched(
+        self,
+        parsed: Iterable[Tuple[Path, List[Document]]],
+        progress: IngestionProgress,
+        on_progress: Optional[ProgressCallback],
+        should_stop: Optional[Callable[[], bool]],
+    ) -> Iterator[Tuple[Path, int]]:
+        report = on_progress or (lambda _: None)
+        batch: List[Document] = []
+        # Files whose first chunks are in ``batch``, so it must replace their old ones.
+        starting: List[Path] = []
+        # Files whose chunks are all in ``batch`` or already stored.
+        done: List[Tuple[Path, int]] = []
+
+        def _store() -> None:
+            nonlocal batch, starting
+            progress.chunks_embedded += self._store.add_chunks(batch, replaces=starting)
+            batch, starting = [], []
+            report(progress)
+
+        for path, chunks in parsed:
+            progress.files_parsed += 1
+            progress.bytes_parsed += path.stat().st_size
+            report(progress)
+            starting.append(path)
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= self._batch_size:
+                    _store()
+                    yield from done
+                    done.clear()
+            done.append((path, len(chunks)))
+            if should_stop is not None and should_stop():
+                break
+
+        if batch or starting:
+            _store()
+        yield from done
+
+
+def _parse_ahead(
+    executor: Executor,
+    parse: Callable[[Path], List[Document]],
+    paths: Sequence[Path],
+    limit: int,
+) -> Iterator[Tuple[Path, List[Document]]]:
+    """Parse results in order, keeping up to ``limit`` files submitted ahead of the reader."""
+
+    remaining = iter(paths)
+    in_flight: Deque[Tuple[Path, Future[List[Document]]]] = deque(
+        (path, executor.submit(parse, path)) for path in islice(remaining, limit)
+    )
+    while in_flight:
+        path, future = in_flight.popleft()
+        chunks = future.result()
+        upcoming = next(remaining, None)
+        if upcoming is not None:
+            in_flight.append((upcoming, executor.submit(parse, upcoming)))
+        yield path, chunks
@@ -0,0 +1,236 @@
+"""BM25 inverted index over chunk text, kept per segment next to the vectors.
+
+Embeddings rank exact identifiers poorly: a question about ``FlowAgentSecret``
+or ``ERR_TOKEN_EXPIRED`` gets chunks that talk about secrets and tokens in
+general. With ``LEXICAL_SEARCH`` on, every segment also keeps the postings of
+its chunks, and retrieval fuses a BM25 ranking with the vector ranking.
+
+Postings are derived data, like quantized codes. They are written the first
+time a segment is opened, so adding documents only indexes the new segment,
+and a compacted segment is re-indexed from its text. One segment's postings are
+a vocabulary plus flat arrays: the term-sorted row numbers (``uint32``), their
+term frequencies (``uint16``), each term's end offset and each row's length.
+Collection statistics (row count, average length, document frequency) are
+summed over segments at query time, so segments never depend on each other.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+from collections import Counter
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+POSTINGS_FILE = "postings.npz"
+
+# Standard BM25 saturation and length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Longer "words" are base64 blobs, hashes or minified code, not search terms.
+MAX_TOKEN_CHARS = 64
+
+# Frequent English words carry no signal and would make every query touch most rows.
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can do does for from had has have how i if in is it its "
+    "me my no not of on or our so than that the their them then there these they this to "
+    "was we were what when where which who why will with you your".split()
+)
+
+_WORD = re.compile(r"\w+")
+# Sub-words of one identifier: "FlowAgentSecret" -> Flow, Agent, Secret;
+# "HTTPError404" -> HTTP, Error, 404; "ERR_TOKEN" -> ERR, TOKEN.
+_SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+# Matching rows are found by sorting the postings read when there are fewer than
+# one per this many rows, and by scanning the dense scores otherwise.
+_SORT_FRACTION = 8
+
+_ROW_DTYPE = np.dtype("<u4")
+_TF_DTYPE = np.dtype("<u2")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words, plus the parts of camelCase and snake_case identifiers.
+
+    The whole identifier stays a term, so an exact ``FlowAgentSecret`` scores
+    above chunks that only mention "agent" and "secret".
+    """
+
+    tokens: List[str] = []
+    for word in _WORD.findall(text):
+        if len(word) > MAX_TOKEN_CHARS or word.lower() in STOP_WORDS:
+            continue
+        tokens.append(word.lower())
+        parts = _SUBWORD.findall(word)
+        if len(parts) > 1:
+            # Single letters and digits ("v" and "2" of "v2") would match most rows.
+            tokens.extend(part.lower() for part in parts if len(part) > 1)
+    return tokens
+
+
+class SegmentPostings:
+    """One segment's inverted index: term -> (rows, term frequencies)."""
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        ends: np.ndarray,
+        rows: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+    ):
+        self._terms: Dict[str, int] = {term: idx for idx, term in enumerate(terms)}
+        self._ends = ends
+        self.rows = rows
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.total_length = int(lengths.sum())
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self._ends, self.rows, self.frequencies, self.lengths)
+        return sum(int(array.nbytes) for array in arrays)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> SegmentPostings:
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths: List[int] = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                rows, frequencies = postings.setdefault(term, ([], []))
+                rows.append(row)
+                frequencies.append(frequency)
+
+        terms = sorted(postings)
+        sizes = [len(postings[term][0]) for term in terms]
+        # Rows were appended in order, so each term's list is already sorted.
+        rows = [row for term in terms for row in postings[term][0]]
+        frequencies = [frequency for term in terms for frequency in postings[term][1]]
+        return cls(
+            terms,
+            np.cumsum(sizes, dtype=np.int64),
+            np.asarray(rows, dtype=_ROW_DTYPE),
+            np.minimum(frequencies, np.iinfo(_TF_DTYPE).max).astype(_TF_DTYPE),
+            np.asarray(lengths, dtype=np.uint32),
+        )
+
+    @classmethod
+    def open(cls, directory: Path, texts: Iterable[str]) -> SegmentPostings:
+        """Load the segment's postings, building them from ``texts`` first if needed."""
+
+        postings_file = directory / POSTINGS_FILE
+        if postings_file.exists():
+            with np.load(postings_file) as saved:
+                vocabulary = saved["terms"].tobytes().decode("utf-8")
+                return cls(
+                    vocabulary.split("\n") if vocabulary else [],
+                    saved["ends"],
+                    saved["rows"],
+                    saved["frequencies"],
+                    saved["lengths"],
+                )
+
+        postings = cls.build(texts)
+        postings.save(postings_file)
+        return postings
+
+    def save(self, path: Path) -> None:
+        # Words never contain a newline, so the vocabulary is stored as one blob.
+        vocabulary = "\n".join(self._terms).encode("utf-8")
+        tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp_file.open("wb") as handle:
+            np.savez(
+                handle,
+                terms=np.frombuffer(vocabulary, dtype=np.uint8),
+                ends=self._ends,
+                rows=self.rows,
+                frequencies=self.frequencies,
+                lengths=self.lengths,
+            )
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_file, path)
+
+    def lookup(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows containing ``term``, ascending, and how often it occurs in each."""
+
+        idx = self._terms.get(term)
+        if idx is None:
+            return self.rows[:0], self.frequencies[:0]
+        start = int(self._ends[idx - 1]) if idx else 0
+        end = int(self._ends[idx])
+        return self.rows[start:end], self.frequencies[start:end]
+
+
+class LexicalView:
+    """Postings of several segments searched as one index over global row numbers."""
+
+    def __init__(self, parts: Sequence[SegmentPostings]):
+        self._parts = list(parts)
+        self._starts = np.cumsum([0] + [len(part) for part in self._parts[:-1]], dtype=np.int64)
+        self._count = sum(len(part) for part in self._parts)
+        self._total_length = sum(part.total_length for part in self._parts)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return sum(part.nbytes for part in self._parts)
+
+    @cached_property
+    def _norms(self) -> List[np.ndarray]:
+        # The length part of BM25's denominator, per row; fixed for one snapshot.
+        average_length = max(self._total_length / self._count, 1.0) if self._count else 1.0
+        return [
+            (BM25_K1 * (1 - BM25_B + BM25_B * part.lengths / average_length)).astype(np.float32)
+            for part in self._parts
+        ]
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 score of every row matching at least one query term, by ascending row.
+
+        Rows deleted but not yet compacted still count towards the statistics;
+        callers mask them out of the results.
+        """
+
+        terms = set(tokenize(query))
+        totals = np.zeros(self._count, dtype=np.float32)
+        touched: List[np.ndarray] = []
+        for term in terms:
+            hits = [part.lookup(term) for part in self._parts]
+            frequency = sum(len(rows) for rows, _ in hits)
+            if not frequency:
+                continue
+            idf = math.log(1 + (self._count - frequency + 0.5) / (frequency + 0.5))
+            for part, start, norms, (rows, tfs) in zip(
+                self._parts, self._starts, self._norms, hits, strict=True
+            ):
+                if not len(rows):
+                    continue
+                tf = tfs.astype(np.float32)
+                # A term occurs once per row in its postings, so plain indexing accumulates.
+                totals[start : start + len(part)][rows] += (
+                    idf * (BM25_K1 + 1) * tf / (tf + norms[rows])
+                )
+                touched.append(rows.astype(np.int64) + start)
+
+        postings = sum(len(rows) for rows in touched)
+        if postings * _SORT_FRACTION < self._count:
+            # Sorting the few postings read beats scanning every row for scores.
+            matched = np.unique(np.concatenate(touched)) if touched else np.empty(0, np.int64)
+        else:
+            # Every matching row scores above zero.
+            matched = np.flatnonzero(totals)
+        return matched, totals[matched]
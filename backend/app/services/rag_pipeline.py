@@ -1,28 +1,169 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import asyncio
+from typing import Any, Dict, Iterator, List, Tuple
 
+import numpy as np
 from langchain.schema import Document
 
+from app.core.config import Settings, get_settings
 from app.schemas.chat import DocumentContext
+from app.services.context_assembly import AssembledContext, ContextAssembler
 from app.services.embedding_store import EmbeddingStore
-from app.services.flow_client import FlowClient
+from app.services.flow_client import AsyncFlowClient, FlowClient
+from app.services.registry import get_embedding_store
+from app.services.response_cache import SemanticResponseCache
+from app.services.single_flight import SingleFlight
+
+# Query vector, retrieved chunk ids and store version.
+CacheKey = Tuple[np.ndarray, List[str], int]
+
+# Identical questions in flight at the same time share one embedding and retrieval,
+# whatever conversation asks them, and one Flow call per conversation.
+_retrievals = SingleFlight()
+_answers = SingleFlight()
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.casefold().split())
+
+
+def completion_text(response: Dict[str, Any]) -> str:
+    choices = response.get("choices", [])
+    if not choices:
+        return ""
+    return choices[0].get("message", {}).get("content", "")
 
 
 class RagPipeline:
     """Coordinates similarity search and Flow LLM responses."""
 
-    def __init__(self, store: EmbeddingStore | None = None, client: FlowClient | None = None):
-        self._store = store or EmbeddingStore()
+    def __init__(
+        self,
+        store: EmbeddingStore | None = None,
+        client: FlowClient | None = None,
+        cache: SemanticResponseCache | None = None,
+        settings: Settings | None = None,
+        async_client: AsyncFlowClient | None = None,
+    ):
+        self._settings = settings or get_settings()
+        self._store = store or get_embedding_store()
         self._client = client or FlowClient()
+        self._async_client = async_client or AsyncFlowClient(self._settings)
+        self._cache = cache
+        self._assembler = ContextAssembler(self._settings)
+
+    def generate(
+        self,
+        prompt: str,
+        conversation_id: str | None = None,
+        deadline: float | None = None,
+    ) -> Dict[str, Any]:
+        query_vector, assembled = self._retrieve(prompt)
+        context = self._build_context(assembled.documents)
+        cache_key = self._cache_key(query_vector, assembled)
+
+        response = self._cached(cache_key)
+        if response is None:
+            payload = self._build_payload(prompt, context, conversation_id)
+            response = self._client.chat_completion(payload, deadline)
+            self._remember(cache_key, response)
+        return {"response": response, "context": context, "usage": assembled.usage}
+
+    async def agenerate(
+        self,
+        prompt: str,
+        conversation_id: str | None = None,
+        deadline: float | None = None,
+    ) -> Dict[str, Any]:
+        """Asyncio variant of :meth:`generate`.
 
-    def generate(self, prompt: str, conversation_id: str | None = None) -> Dict[str, Any]:
-        retrieved_docs = self._store.similarity_search(prompt)
-        context = self._build_context(retrieved_docs)
+        Retrieval and cache lookups run in the default thread pool. Concurrent
+        calls with the same normalized prompt against the same store version
+        share one embedding and retrieval. Flow answers within the
+        conversation's history, so only calls from the same conversation also
+        share the answer. ``deadline`` (epoch seconds) bounds the Flow call.
+        """
+
+        key = (normalize_prompt(prompt), self._store.version)
+        retrieved = await _retrievals.do(key, lambda: asyncio.to_thread(self._retrieve, prompt))
+        result = await _answers.do(
+            (*key, conversation_id),
+            lambda: self._answer(prompt, conversation_id, retrieved, deadline),
+        )
+        return dict(result)
+
+    async def _answer(
+        self,
+        prompt: str,
+        conversation_id: str | None,
+        retrieved: Tuple[np.ndarray | None, AssembledContext],
+        deadline: float | None,
+    ) -> Dict[str, Any]:
+        query_vector, assembled = retrieved
+        context = self._build_context(assembled.documents)
+        cache_key = self._cache_key(query_vector, assembled)
+
+        response = await asyncio.to_thread(self._cached, cache_key)
+        if response is None:
+            payload = self._build_payload(prompt, context, conversation_id)
+            response = await self._async_client.chat_completion(payload, deadline)
+            await asyncio.to_thread(self._remember, cache_key, response)
+        return {"response": response, "context": context, "usage": assembled.usage}
+
+    def stream(
+        self,
+        prompt: str,
+        conversation_id: str | None = None,
+        deadline: float | None = None,
+    ) -> Tuple[List[DocumentContext], Dict[str, int], Iterator[str]]:
+        """Retrieve context, then return it, its token usage and an iterator over the answer."""
+
+        query_vector, assembled = self._retrieve(prompt)
+        context = self._build_context(assembled.documents)
+        cache_key = self._cache_key(query_vector, assembled)
+
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return context, assembled.usage, iter([completion_text(cached)])
 
         payload = self._build_payload(prompt, context, conversation_id)
-        response = self._client.chat_completion(payload)
-        return {"response": response, "context": context}
+        return context, assembled.usage, self._stream_and_remember(cache_key, payload, deadline)
+
+    def _retrieve(self, prompt: str) -> Tuple[np.ndarray | None, AssembledContext]:
+        query_vector = self._store.embed_query(prompt)
+        if query_vector is None:
+            return None, AssembledContext()
+        documents, vectors = self._store.search_with_vectors(
+            query_vector, self._settings.context_fetch_k, prompt
+        )
+        return query_vector, self._assembler.assemble(query_vector, documents, vectors)
+
+    def _cache_key(
+        self, query_vector: np.ndarray | None, assembled: AssembledContext
+    ) -> CacheKey | None:
+        if self._cache is None or query_vector is None:
+            return None
+        return query_vector, assembled.chunk_ids, self._store.version
+
+    def _cached(self, cache_key: CacheKey | None) -> Dict[str, Any] | None:
+        if self._cache is None or cache_key is None:
+            return None
+        return self._cache.get(*cache_key)
+
+    def _remember(self, cache_key: CacheKey | None, response: Dict[str, Any]) -> None:
+        if self._cache is not None and cache_key is not None:
+            self._cache.put(*cache_key, response)
+
+    def _stream_and_remember(
+        self, cache_key: CacheKey | None, payload: Dict[str, Any], deadline: float | None
+    ) -> Iterator[str]:
+        parts: List[str] = []
+        for token in self._client.stream_chat_completion(payload, deadline):
+            parts.append(token)
+            yield token
+        # Cached in the same shape as a non-streamed completion.
+        self._remember(cache_key, {"choices": [{"message": {"content": "".join(parts)}}]})
 
     def _build_context(self, documents: List[Document]) -> List[DocumentContext]:
         context: List[DocumentContext] = []
@@ -0,0 +1,77 @@
+"""Process-wide instances shared by API request handlers and worker jobs.
+
+Loading the SentenceTransformer model and the tiktoken encoding and opening
+the vector store are the expensive parts of a cold start, so each process pays them once and every
+request or job afterwards reuses the same objects. The store refreshes itself
+from disk when another process commits new chunks.
+
+Synchronous callers (worker jobs) run coroutines on one background event loop
+per process, so async work started by concurrent jobs can be coalesced.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Coroutine, Dict, TypeVar
+
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+from app.core.config import get_settings
+from app.services.context_assembly import load_token_counter
+from app.services.embedding_store import EMBEDDING_MODEL_NAME, EmbeddingStore
+
+# Re-entrant because building the store resolves the model through the registry too.
+_lock = threading.RLock()
+# Keyed by pid: a forked job process must not drive its parent's loop thread.
+_loops: Dict[int, asyncio.AbstractEventLoop] = {}
+
+T = TypeVar("T")
+
+
+@lru_cache()
+def _embedding_model() -> SentenceTransformerEmbeddings:
+    return SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+
+@lru_cache()
+def _embedding_store() -> EmbeddingStore:
+    return EmbeddingStore(embeddings=get_embedding_model())
+
+
+def get_embedding_model() -> SentenceTransformerEmbeddings:
+    with _lock:
+        return _embedding_model()
+
+
+def get_embedding_store() -> EmbeddingStore:
+    with _lock:
+        return _embedding_store()
+
+
+def warm_up() -> None:
+    """Load the tokenizer and embedding model and open the vector store before any request."""
+
+    load_token_counter(get_settings().context_tokenizer)
+    get_embedding_store()
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    pid = os.getpid()
+    with _lock:
+        loop = _loops.get(pid)
+        if loop is None:
+            _loops.clear()
+            loop = _loops[pid] = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="registry-event-loop", daemon=True
+            ).start()
+        return loop
+
+
+def run_coroutine(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run ``coroutine`` on the process's background event loop and wait for its result."""
+
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop()).result()
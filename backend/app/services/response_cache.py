@@ -0,0 +1,144 @@
+"""Semantic cache of Flow completions shared through Redis.
+
+An entry is filed under the store version and a fingerprint of the chunks
+that were retrieved for the question, so a lookup only compares the query
+embedding against answers built from exactly the same context. Any committed
+change to the vector store moves lookups to a fresh namespace; the old one
+expires on its own.
+
+Keys, all under ``flow:response-cache``:
+
+* ``v<version>:bucket:<fingerprint>`` -- set of entry ids for that context
+* ``v<version>:entry:<fingerprint>:<id>`` -- query vector and completion
+* ``v<version>:lru`` -- sorted set of entry ids by last use, for eviction
+* ``stats`` -- hit and miss counters across all processes
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from redis import Redis
+
+from app.core.config import Settings, get_settings
+
+CACHE_KEY_PREFIX = "flow:response-cache"
+
+
+def context_fingerprint(chunk_ids: Sequence[str]) -> str:
+    """Order-independent digest of the retrieved chunk ids."""
+
+    joined = "\n".join(sorted(chunk_ids)).encode("utf-8")
+    return hashlib.blake2b(joined, digest_size=16).hexdigest()
+
+
+class SemanticResponseCache:
+    """Returns a cached completion when a similar question retrieved the same chunks."""
+
+    def __init__(self, connection: Redis, settings: Optional[Settings] = None):
+        self._connection = connection
+        self._settings = settings or get_settings()
+        self._stats_key = f"{CACHE_KEY_PREFIX}:stats"
+
+    def get(
+        self, query_vector: np.ndarray, chunk_ids: Sequence[str], version: int
+    ) -> Optional[Dict[str, Any]]:
+        namespace = self._namespace(version)
+        bucket = f"{namespace}:bucket:{context_fingerprint(chunk_ids)}"
+        members = sorted(member.decode() for member in self._connection.smembers(bucket))
+        raw_entries = (
+            self._connection.mget([f"{namespace}:entry:{member}" for member in members])
+            if members
+            else []
+        )
+
+        best_score = -1.0
+        best: Optional[Dict[str, Any]] = None
+        best_member = ""
+        expired = []
+        for member, raw in zip(members, raw_entries, strict=True):
+            if raw is None:
+                expired.append(member)
+                continue
+            entry = json.loads(raw)
+            vector = np.frombuffer(base64.b64decode(entry["vector"]), dtype=np.float32)
+            score = float(vector @ query_vector)
+            if score > best_score:
+                best_score, best, best_member = score, entry, member
+
+        hit = best is not None and best_score >= self._settings.response_cache_threshold
+        pipeline = self._connection.pipeline(transaction=False)
+        if expired:
+            pipeline.srem(bucket, *expired)
+            pipeline.zrem(f"{namespace}:lru", *expired)
+        if hit:
+            pipeline.zadd(f"{namespace}:lru", {best_member: time.time()})
+        pipeline.hincrby(self._stats_key, "hits" if hit else "misses", 1)
+        pipeline.execute()
+        return best["response"] if hit and best is not None else None
+
+    def put(
+        self,
+        query_vector: np.ndarray,
+        chunk_ids: Sequence[str],
+        version: int,
+        response: Dict[str, Any],
+    ) -> None:
+        namespace = self._namespace(version)
+        fingerprint = context_fingerprint(chunk_ids)
+        member = f"{fingerprint}:{uuid.uuid4().hex}"
+        bucket = f"{namespace}:bucket:{fingerprint}"
+        lru = f"{namespace}:lru"
+        ttl = self._settings.response_cache_ttl_seconds
+        now = time.time()
+        vector = np.asarray(query_vector, dtype=np.float32).tobytes()
+        entry = {"vector": base64.b64encode(vector).decode(), "response": response}
+
+        pipeline = self._connection.pipeline(transaction=False)
+        pipeline.set(f"{namespace}:entry:{member}", json.dumps(entry), ex=ttl)
+        pipeline.sadd(bucket, member)
+        pipeline.expire(bucket, ttl)
+        # Anything not used for a full TTL has expired already.
+        pipeline.zremrangebyscore(lru, 0, now - ttl)
+        pipeline.zadd(lru, {member: now})
+        pipeline.expire(lru, ttl)
+        pipeline.zcard(lru)
+        size = pipeline.execute()[-1]
+
+        excess = size - self._settings.response_cache_max_entries
+        if excess > 0:
+            self._evict(namespace, excess)
+
+    def stats(self) -> Dict[str, float]:
+        raw = self._connection.hgetall(self._stats_key)
+        hits = int(raw.get(b"hits", 0))
+        misses = int(raw.get(b"misses", 0))
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _evict(self, namespace: str, count: int) -> None:
+        """Drop the ``count`` least recently used entries."""
+
+        popped = self._connection.zpopmin(f"{namespace}:lru", count)
+        evicted = [member.decode() for member, _ in popped]
+        if not evicted:
+            return
+        pipeline = self._connection.pipeline(transaction=False)
+        pipeline.delete(*(f"{namespace}:entry:{member}" for member in evicted))
+        for member in evicted:
+            fingerprint = member.split(":", 1)[0]
+            pipeline.srem(f"{namespace}:bucket:{fingerprint}", member)
+        pipeline.execute()
+
+    def _namespace(self, version: int) -> str:
+        return f"{CACHE_KEY_PREFIX}:v{version}"
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Collapses concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as its own task; callers that
+    arrive while it runs await the same task and receive the same result or
+    exception. A caller that is cancelled does not cancel the shared work for
+    the others. Keys are scoped to the running event loop.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Tuple[int, Hashable], asyncio.Task[Any]] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        scoped = (id(asyncio.get_running_loop()), key)
+        task = self._inflight.get(scoped)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[scoped] = task
+            task.add_done_callback(lambda _: self._inflight.pop(scoped, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
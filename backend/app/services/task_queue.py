@@ -1,52 +1,248 @@
 from __future__ import annotations
 
+import asyncio
 import time
-from dataclasses import dataclass
-from typing import Any, Callable, Optional
+import traceback
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import Any, Callable, Dict, Optional
 
 from redis import Redis
-from rq import Queue
+from redis.asyncio import Redis as AsyncRedis
+from rq import Callback, Queue
+from rq.job import Job, JobStatus
 
 from app.core.config import get_settings
 
+# Workers push each job's outcome onto this per-job list; waiters BLPOP it.
+COMPLETION_KEY_PREFIX = "flow:job-done:"
+# Outcomes nobody collected expire with roughly the same lifetime as RQ results.
+COMPLETION_TTL_SECONDS = 600
+# Recent run times per queue, newest first, for estimating how long a new job waits.
+DURATIONS_KEY_PREFIX = "flow:job-durations:"
+DURATION_SAMPLES = 50
+# BLPOP treats a timeout of 0 as "block forever", and Redis rounds anything under a
+# millisecond down to it, so a slice never waits less than this.
+MIN_POP_SECONDS = 0.01
+
+
+class JobDeadlineExceededError(RuntimeError):
+    """Raised by a job that started after its caller had stopped waiting."""
+
 
 @dataclass
 class TaskResult:
     status: str
     payload: Any
     job_id: str
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+def completion_key(job_id: str) -> str:
+    return f"{COMPLETION_KEY_PREFIX}{job_id}"
+
+
+def durations_key(queue_name: str) -> str:
+    return f"{DURATIONS_KEY_PREFIX}{queue_name}"
+
+
+def check_deadline(job: Optional[Job]) -> None:
+    """Refuse to run a job whose ``meta["deadline"]`` (epoch seconds) has passed."""
+
+    deadline = job.meta.get("deadline") if job is not None else None
+    if deadline is not None and time.time() > deadline:
+        raise JobDeadlineExceededError(f"Job {job.id} started after its caller's deadline")
+
+
+def _pop_timeout(remaining: float, check_interval: float) -> float:
+    return max(MIN_POP_SECONDS, min(remaining, check_interval))
+
+
+def _push_completion(job: Job, connection: Redis, status: str, payload: Any) -> None:
+    key = completion_key(job.id)
+    pipeline = connection.pipeline(transaction=False)
+    pipeline.rpush(key, job.serializer.dumps((status, payload)))
+    pipeline.expire(key, COMPLETION_TTL_SECONDS)
+    pipeline.execute()
+
+
+def notify_job_finished(
+    job: Job, connection: Redis, result: Any, *args: Any, **kwargs: Any
+) -> None:
+    """RQ success callback: hand the return value straight to the waiting caller."""
+
+    _push_completion(job, connection, JobStatus.FINISHED.value, result)
+    if job.started_at is not None and job.ended_at is not None:
+        key = durations_key(job.origin)
+        pipeline = connection.pipeline(transaction=False)
+        pipeline.lpush(key, (job.ended_at - job.started_at).total_seconds())
+        pipeline.ltrim(key, 0, DURATION_SAMPLES - 1)
+        pipeline.execute()
+
+
+def notify_job_failed(
+    job: Job,
+    connection: Redis,
+    exc_type: type[BaseException],
+    exc_value: BaseException,
+    exc_traceback: TracebackType,
+) -> None:
+    """RQ failure callback: hand the formatted exception to the waiting caller."""
+
+    exc_info = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+    _push_completion(job, connection, JobStatus.FAILED.value, exc_info)
 
 
 class TaskQueue:
-    """Thin wrapper around RQ queue for Flow API tasks."""
+    """Thin wrapper around RQ queue for Flow API tasks.
+
+    Jobs are enqueued with callbacks that push their outcome onto a per-job
+    Redis list, so waiting for a result is a blocking pop rather than polling.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        queue_name: Optional[str] = None,
+        queue: Optional[Queue] = None,
+        async_connection: Optional[AsyncRedis] = None,
+    ):
+        if queue is None:
+            settings = get_settings()
+            connection = Redis.from_url(redis_url or settings.redis_url)
+            queue = Queue(queue_name or settings.task_queue_name, connection=connection)
+        self._queue = queue
+        self._connection = queue.connection
+        self._async_connection = async_connection
 
-    def __init__(self, redis_url: Optional[str] = None, queue_name: Optional[str] = None):
-        settings = get_settings()
-        self._connection = Redis.from_url(redis_url or settings.redis_url)
-        self._queue = Queue(queue_name or settings.task_queue_name, connection=self._connection)
+    @property
+    def connection(self) -> Redis:
+        return self._connection
 
-    def enqueue(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> TaskResult:
-        job = self._queue.enqueue(func, *args, **kwargs)
+    @property
+    def async_connection(self) -> Optional[AsyncRedis]:
+        return self._async_connection
+
+    @property
+    def queue(self) -> Queue:
+        return self._queue
+
+    def enqueue(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        deadline: Optional[float] = None,
+        **kwargs: Any,
+    ) -> TaskResult:
+        """Enqueue ``func``; with a ``deadline`` (epoch seconds) the worker skips it once late."""
+
+        if deadline is not None:
+            kwargs["meta"] = {**kwargs.get("meta", {}), "deadline": deadline}
+        job = self._queue.enqueue(
+            func,
+            *args,
+            on_success=Callback(notify_job_finished),
+            on_failure=Callback(notify_job_failed),
+            **kwargs,
+        )
         return TaskResult(status=job.get_status(), payload=None, job_id=job.id)
 
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet; returns whether it was cancelled."""
+
+        job = self._queue.fetch_job(job_id)
+        if job is None or job.get_status() not in (JobStatus.QUEUED, JobStatus.DEFERRED):
+            return False
+        job.cancel()
+        return True
+
     def fetch(self, job_id: str) -> TaskResult:
         job = self._queue.fetch_job(job_id)
         if not job:
             raise ValueError(f"Job {job_id} not found")
         job.refresh()
-        return TaskResult(status=job.get_status(), payload=job.result, job_id=job.id)
+        return TaskResult(
+            status=job.get_status(), payload=job.result, job_id=job.id, meta=dict(job.meta)
+        )
+
+    def wait_for_result(
+        self, job_id: str, timeout: int = 30, check_interval: float = 5.0
+    ) -> TaskResult:
+        """Block until the worker reports the job's outcome or ``timeout`` expires.
+
+        The pop is split into ``check_interval`` slices; between slices the job
+        hash is read once, which catches jobs that ended without running their
+        callback (a killed work horse, or a result already collected). A job
+        still queued at the timeout is cancelled, since nobody will read it.
+        """
 
-    def wait_for_result(self, job_id: str, timeout: int = 30, poll_interval: float = 0.5) -> TaskResult:
         deadline = time.monotonic() + timeout
-        while time.monotonic() < deadline:
-            job = self._queue.fetch_job(job_id)
-            if not job:
-                raise ValueError(f"Job {job_id} not found")
-            job.refresh()
-            if job.is_finished:
-                return TaskResult(status=job.get_status(), payload=job.result, job_id=job.id)
-            if job.is_failed:
-                raise RuntimeError(f"Job {job_id} failed: {job.exc_info}")
-            time.sleep(poll_interval)
+        result = self._check_job(job_id)
+        if result is not None:
+            return result
+        key = completion_key(job_id)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            popped = self._connection.blpop([key], timeout=_pop_timeout(remaining, check_interval))
+            if popped is not None:
+                return self._decode_completion(job_id, popped[1])
+
+            result = self._check_job(job_id)
+            if result is not None:
+                return result
 
+        self.cancel(job_id)
         raise TimeoutError(f"Job {job_id} did not finish within {timeout} seconds")
+
+    async def await_result(
+        self, job_id: str, timeout: int = 30, check_interval: float = 5.0
+    ) -> TaskResult:
+        """Asyncio counterpart of :meth:`wait_for_result` that does not hold a thread.
+
+        The blocking pop runs on the async Redis connection; only the occasional
+        job-hash check goes through a worker thread.
+        """
+
+        if self._async_connection is None:
+            raise RuntimeError("TaskQueue has no async Redis connection")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        result = await asyncio.to_thread(self._check_job, job_id)
+        if result is not None:
+            return result
+        key = completion_key(job_id)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            popped = await self._async_connection.blpop(
+                [key], timeout=_pop_timeout(remaining, check_interval)
+            )
+            if popped is not None:
+                return self._decode_completion(job_id, popped[1])
+
+            result = await asyncio.to_thread(self._check_job, job_id)
+            if result is not None:
+                return result
+
+        await asyncio.to_thread(self.cancel, job_id)
+        raise TimeoutError(f"Job {job_id} did not finish within {timeout} seconds")
+
+    def _decode_completion(self, job_id: str, raw: bytes) -> TaskResult:
+        status, payload = self._queue.serializer.loads(raw)
+        if status == JobStatus.FAILED.value:
+            raise RuntimeError(f"Job {job_id} failed: {payload}")
+        return TaskResult(status=status, payload=payload, job_id=job_id)
+
+    def _check_job(self, job_id: str) -> Optional[TaskResult]:
+        job = self._queue.fetch_job(job_id)
+        if not job:
+            raise ValueError(f"Job {job_id} not found")
+        if job.is_finished:
+            return TaskResult(status=job.get_status(), payload=job.result, job_id=job.id)
+        if job.is_failed:
+            raise RuntimeError(f"Job {job_id} failed: {job.exc_info}")
+        return None
@@ -0,0 +1,71 @@
+"""Relay of streamed chat events from a worker job to the API over Redis streams.
+
+The worker appends one entry per event (``context``, each ``token``, then
+``done`` or ``error``) to a per-request stream; the API reads it with blocking
+``XREAD`` calls, awaited on the async client by :func:`aread_events`, and
+forwards every entry to the client as it arrives.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+STREAM_KEY_PREFIX = "flow:chat-stream:"
+# Streams outlive a slow reader but are never kept around indefinitely.
+STREAM_TTL_SECONDS = 600
+TERMINAL_EVENTS = frozenset({"done", "error"})
+
+
+def new_stream_key() -> str:
+    return f"{STREAM_KEY_PREFIX}{uuid.uuid4().hex}"
+
+
+class TokenStreamWriter:
+    """Appends events to one chat stream on behalf of a worker job."""
+
+    def __init__(self, connection: Redis, key: str):
+        self._connection = connection
+        self._key = key
+
+    def publish(self, event: str, data: Any) -> None:
+        pipeline = self._connection.pipeline(transaction=False)
+        pipeline.xadd(self._key, {"event": event, "data": json.dumps(data)})
+        pipeline.expire(self._key, STREAM_TTL_SECONDS)
+        pipeline.execute()
+
+
+async def aread_events(
+    connection: AsyncRedis,
+    key: str,
+    idle_timeout: float,
+    block_seconds: float = 1.0,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(event, data)`` pairs until a terminal event or ``idle_timeout``.
+
+    The idle timer restarts with every entry, so long generations are fine as
+    long as tokens keep arriving. Reads are awaited on the async client, so a
+    stream does not hold a thread.
+    """
+
+    last_id = "0-0"
+    deadline = time.monotonic() + idle_timeout
+    while time.monotonic() < deadline:
+        batches = await connection.xread({key: last_id}, block=int(block_seconds * 1000))
+        for _, entries in batches or []:
+            for entry_id, fields in entries:
+                last_id = entry_id
+                event = fields[b"event"].decode()
+                data = json.loads(fields[b"data"])
+                yield event, data
+                if event in TERMINAL_EVENTS:
+                    await connection.delete(key)
+                    return
+            deadline = time.monotonic() + idle_timeout
+
+    yield "error", {"detail": f"No response received within {idle_timeout} seconds"}
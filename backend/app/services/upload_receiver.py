@@ -0,0 +1,219 @@
+"""Streams a multipart upload to disk, enforcing limits and hashing as it goes.
+
+The request body is parsed as it arrives instead of being spooled first. The
+file part is written to a temporary file in ``documents_path`` in the chunks
+the server delivers, and the same pass updates its SHA-256 and size. A
+request over ``MAX_UPLOAD_MEGABYTES`` is refused from its ``Content-Length``
+before any byte is read, or as soon as the running size passes the limit. The
+finished file is fsynced and moved into place with an atomic rename. If the
+manifest already knows its hash, it is discarded instead, and nothing is
+re-indexed. A replacement, stored under a name the caller chose, is discarded
+only when that same file already has the content.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, AsyncIterator, Dict, List, Mapping, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import Settings, get_settings
+from app.services.document_manifest import DocumentManifest
+
+UPLOAD_FIELD = "file"
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+class UploadRejectedError(ValueError):
+    """The upload was refused; ``status_code`` is 400 or 413."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    sha256: str
+    size: int
+    # Of the file as written, so the ingestion job can trust ``sha256`` while it matches.
+    mtime_ns: Optional[int] = None
+    # True when identical content was already indexed; ``path`` is that file.
+    duplicate: bool = False
+
+
+def safe_filename(name: str) -> str:
+    """Only the final path component is kept, so a crafted name cannot escape."""
+
+    return Path(name.replace("\\", "/")).name
+
+
+class _FilePart:
+    """Parser callbacks that send the ``file`` field's bytes to one open file."""
+
+    def __init__(self, allowed_extensions: List[str], max_bytes: int, target: Optional[str] = None):
+        self._allowed = allowed_extensions
+        self._max_bytes = max_bytes
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._writing = False
+        # Stored under this name instead of the client's, when set.
+        self._target = target
+        self.filename: Optional[str] = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.pending: List[bytes] = []
+
+    def callbacks(self) -> Dict[str, object]:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode() != UPLOAD_FIELD or self.filename is not None:
+            return
+        raw_name = options.get(b"filename", b"").decode("utf-8", "replace")
+        filename = self._target or safe_filename(raw_name) or f"upload-{uuid.uuid4()}"
+        if Path(filename).suffix.lower() not in self._allowed:
+            raise UploadRejectedError(400, "Unsupported file type")
+        self.filename = filename
+        self._writing = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._writing:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self._max_bytes:
+            raise UploadRejectedError(413, "File exceeds allowed size")
+        self.digest.update(chunk)
+        self.pending.append(chunk)
+
+    def _on_part_end(self) -> None:
+        self._writing = False
+
+
+class UploadReceiver:
+    """Receives one multipart upload into the documents folder."""
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        manifest: Optional[DocumentManifest] = None,
+    ):
+        self._settings = settings or get_settings()
+        self._documents_path = Path(self._settings.documents_path)
+        self._manifest = manifest or DocumentManifest(
+            Path(self._settings.vector_store_path) / "documents.json"
+        )
+        self._max_bytes = self._settings.max_upload_megabytes * 1024 * 1024
+
+    async def receive(
+        self,
+        headers: Mapping[str, str],
+        stream: AsyncIterator[bytes],
+        filename: Optional[str] = None,
+    ) -> StoredUpload:
+        """Store the upload; ``filename`` replaces the file of that name instead."""
+
+        content_type, options = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in options:
+            raise UploadRejectedError(400, "Expected a multipart/form-data upload")
+        declared = headers.get("content-length")
+        if declared:
+            try:
+                declared_bytes = int(declared)
+            except ValueError:
+                raise UploadRejectedError(400, "Invalid Content-Length header") from None
+            if declared_bytes > self._max_bytes + MULTIPART_OVERHEAD_BYTES:
+                raise UploadRejectedError(413, "File exceeds allowed size")
+        if filename is not None and (
+            safe_filename(filename) != filename
+            or Path(filename).suffix.lower() not in self._settings.allowed_file_extensions
+        ):
+            raise UploadRejectedError(400, "Unsupported file name")
+
+        part = _FilePart(self._settings.allowed_file_extensions, self._max_bytes, filename)
+        parser = MultipartParser(options[b"boundary"], part.callbacks())
+        self._documents_path.mkdir(parents=True, exist_ok=True)
+        # Same directory as the target, so the final rename cannot cross filesystems.
+        descriptor, temp_name = tempfile.mkstemp(
+            prefix=".upload-", suffix=".part", dir=self._documents_path
+        )
+        temp_path = Path(temp_name)
+        try:
+            with os.fdopen(descriptor, "wb") as buffer:
+                async for chunk in stream:
+                    parser.write(chunk)
+                    if part.pending:
+                        data, part.pending = b"".join(part.pending), []
+                        await asyncio.to_thread(buffer.write, data)
+                parser.finalize()
+                if part.filename is None:
+                    raise UploadRejectedError(400, f"No '{UPLOAD_FIELD}' field in the upload")
+                await asyncio.to_thread(_sync, buffer)
+            return await asyncio.to_thread(self._commit, temp_path, part, filename is not None)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def _commit(self, temp_path: Path, part: _FilePart, replacing: bool) -> StoredUpload:
+        sha256 = part.digest.hexdigest()
+        target = self._documents_path / str(part.filename)
+        existing = self._manifest.indexed_path(sha256)
+        if (
+            existing is not None
+            and Path(existing).exists()
+            and (not replacing or Path(existing) == target)
+        ):
+            return StoredUpload(path=Path(existing), sha256=sha256, size=part.size, duplicate=True)
+
+        os.replace(temp_path, target)
+        _sync_directory(self._documents_path)
+        return StoredUpload(
+            path=target, sha256=sha256, size=part.size, mtime_ns=target.stat().st_mtime_ns
+        )
+
+
+def _sync(buffer: IO[bytes]) -> None:
+    buffer.flush()
+    os.fsync(buffer.fileno())
+
+
+def _sync_directory(path: Path) -> None:
+    # Makes the rename itself durable, not just the file's contents.
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
@@ -0,0 +1,138 @@
+"""Compact copies of the stored vectors for a cheap first scoring pass.
+
+With ``VECTOR_QUANTIZATION`` set, every segment also keeps its rows as
+float16 (half the bytes) or as per-dimension scalar-quantized int8 (a quarter).
+A search scores the whole corpus over these codes, keeps the best
+``VECTOR_RESCORE_CANDIDATES`` rows and rescores only those from the float32
+matrix, so results keep full precision while the scan touches far fewer bytes.
+
+Codes are derived data: they are written next to a segment's vectors the first
+time it is opened with a mode, and rebuilt from the vectors if missing.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Sequence
+
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+_CODE_DTYPES = {"float16": np.dtype("<f2"), "int8": np.dtype("i1")}
+
+# Rows decoded to float32 at a time while scoring. Small enough that the decoded
+# block is still in cache when it is multiplied with the query.
+_BLOCK_ROWS = 1024
+
+
+def check_mode(mode: str) -> str:
+    if mode not in QUANTIZATION_MODES:
+        expected = ", ".join(QUANTIZATION_MODES)
+        raise ValueError(f"Unknown vector quantization {mode!r}; expected one of {expected}")
+    return mode
+
+
+class QuantizedVectors:
+    """One segment's rows as codes, scored against a query without decoding them all.
+
+    For int8, dimension ``d`` of a row is ``offset[d] + scale[d] * code[d]``, so
+    ``row @ query`` is ``code @ (scale * query) + offset @ query``.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        scale: Optional[np.ndarray] = None,
+        offset: Optional[np.ndarray] = None,
+    ):
+        self.codes = codes
+        self._scale = scale
+        self._offset = offset
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        params = 0 if self._scale is None else self._scale.nbytes + self._offset.nbytes
+        return int(self.codes.nbytes) + params
+
+    @classmethod
+    def encode(cls, vectors: np.ndarray, mode: str) -> QuantizedVectors:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if check_mode(mode) == "float16":
+            return cls(matrix.astype(_CODE_DTYPES[mode]))
+
+        low = matrix.min(axis=0) if len(matrix) else np.zeros(matrix.shape[1], np.float32)
+        high = matrix.max(axis=0) if len(matrix) else low
+        scale = ((high - low) / 255).astype(np.float32)
+        scale[scale == 0] = 1.0
+        # Codes run from -128 to 127; ``offset`` is the value code 0 stands for.
+        offset = (low + 128 * scale).astype(np.float32)
+        codes = np.clip(np.rint((matrix - offset) / scale), -128, 127).astype(_CODE_DTYPES[mode])
+        return cls(codes, scale, offset)
+
+    @classmethod
+    def open(cls, directory: Path, mode: str, vectors: np.ndarray) -> QuantizedVectors:
+        """Map the segment's codes for ``mode``, building them from ``vectors`` first if needed."""
+
+        shape = (len(vectors), vectors.shape[1])
+        if not shape[0]:
+            return cls.encode(np.zeros(shape, dtype=np.float32), mode)
+
+        codes_file = directory / f"codes-{check_mode(mode)}.bin"
+        params_file = directory / f"codes-{mode}.npy"
+        if not codes_file.exists():
+            encoded = cls.encode(vectors, mode)
+            if encoded._scale is not None:
+                params = np.stack([encoded._scale, encoded._offset])
+                _replace(params_file, lambda handle: np.save(handle, params))
+            # Written last: its presence means the parameters are in place too.
+            _replace(codes_file, lambda handle: handle.write(encoded.codes.tobytes()))
+
+        codes = np.memmap(codes_file, dtype=_CODE_DTYPES[mode], mode="r", shape=shape)
+        if mode == "float16":
+            return cls(codes)
+        scale, offset = np.load(params_file)
+        return cls(codes, scale, offset)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate ``vectors @ query`` for every row."""
+
+        query = np.asarray(query, dtype=np.float32)
+        weights = query if self._scale is None else self._scale * query
+        bias = 0.0 if self._offset is None else float(self._offset @ query)
+        output = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), _BLOCK_ROWS):
+            block = np.asarray(self.codes[start : start + _BLOCK_ROWS], dtype=np.float32)
+            output[start : start + len(block)] = block @ weights + bias
+        return output
+
+
+class QuantizedView:
+    """Codes of several segments scored as one matrix: supports ``len`` and ``@ query``."""
+
+    def __init__(self, parts: Sequence[QuantizedVectors]):
+        self._parts = list(parts)
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self._parts)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(part.nbytes for part in self._parts)
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        if not self._parts:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate([part.scores(query) for part in self._parts])
+
+
+def _replace(path: Path, write: Callable[[BinaryIO], object]) -> None:
+    tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp_file.open("wb") as handle:
+        write(handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_file, path)
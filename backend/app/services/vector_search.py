@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.lexical_index import LexicalView
+from app.services.vector_storage import (
+    file_lock,
+    fsync_append,
+    normalize_rows,
+    write_json_atomic,
+)
+
+# Below this many vectors per list k-means centroids are too noisy to be useful.
+MIN_POINTS_PER_CENTROID = 39
+TRAINING_POINTS_PER_CENTROID = 256
+
+_ASSIGNMENT_DTYPE = np.dtype("<i4")
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the ``k`` highest scores, best first."""
+
+    if k <= 0 or not len(scores):
+        return np.empty(0, dtype=np.intp)
+    if k >= len(scores):
+        return np.argsort(scores)[::-1]
+
+    candidates = np.argpartition(scores, -k)[-k:]
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def exact_search(
+    vectors: np.ndarray,
+    query: np.ndarray,
+    k: int,
+    live: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute-force cosine search over unit-normalized ``vectors``.
+
+    Rows cleared in ``live`` are deleted: they are scored with everything else
+    and then masked out, so a delete never has to rewrite the matrix.
+    """
+
+    scores = vectors @ query
+    if live is not None:
+        scores = np.where(live, scores, -np.inf)
+        k = min(k, int(np.count_nonzero(live)))
+    best = top_k_indices(scores, k)
+    return best, scores[best]
+
+
+def rescored_search(
+    codes: np.ndarray,
+    vectors: np.ndarray,
+    query: np.ndarray,
+    k: int,
+    candidates: int,
+    live: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Score every row over compact ``codes``, then rescore the best few at full precision.
+
+    ``codes`` only has to support ``@ query``; a ``QuantizedView`` does. The
+    ``candidates`` best approximate rows are read from ``vectors`` and ranked
+    by their exact scores, so quantization error can only drop a true neighbour
+    from the shortlist, never misorder the results.
+    """
+
+    shortlist, _ = exact_search(codes, query, max(k, candidates), live)
+    # In row order, so the rescoring reads walk the memory-mapped segments forwards.
+    shortlist = np.sort(shortlist)
+    scores = vectors[shortlist] @ query
+    best = top_k_indices(scores, k)
+    return shortlist[best], scores[best]
+
+
+def lexical_search(
+    lexical: LexicalView,
+    query: str,
+    k: int,
+    live: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """The ``k`` rows with the highest BM25 score for ``query``, skipping deleted rows."""
+
+    rows, scores = lexical.scores(query)
+    if live is not None:
+        keep = live[rows]
+        rows, scores = rows[keep], scores[keep]
+    best = top_k_indices(scores, k)
+    return rows[best], scores[best]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[np.ndarray], k: int, rrf_k: int = 60
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge best-first row rankings into one, scoring each row ``sum(1 / (rrf_k + rank))``.
+
+    Only ranks are used, so BM25 and cosine scores never have to be put on one
+    scale. Ranks start at 1; ties keep the first ranking's order.
+    """
+
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking.tolist(), start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank)
+    best = sorted(fused, key=fused.__getitem__, reverse=True)[:k]
+    return np.asarray(best, dtype=np.int64), np.asarray(
+        [fused[row] for row in best], dtype=np.float32
+    )
+
+
+def _nearest_centroids(
+    data: np.ndarray,
+    centroids: np.ndarray,
+    batch_size: int = 16384,
+) -> np.ndarray:
+    labels = np.empty(len(data), dtype=_ASSIGNMENT_DTYPE)
+    for start in range(0, len(data), batch_size):
+        batch = np.asarray(data[start : start + batch_size])
+        labels[start : start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity and return ``k`` unit centroids."""
+
+    rng = np.random.default_rng(seed)
+    centroids = np.array(data[rng.choice(len(data), k, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        labels = _nearest_centroids(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        empty = np.bincount(labels, minlength=k) == 0
+        # Re-seed empty clusters so every inverted list stays addressable.
+        sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+        centroids = normalize_rows(sums).astype(np.float32)
+    return centroids
+
+
+@dataclass(frozen=True)
+class _IvfState:
+    centroids: Optional[np.ndarray]
+    assignments: np.ndarray
+    order: np.ndarray
+    offsets: np.ndarray
+    token: str = ""
+    # Storage epoch the row numbers in ``assignments`` belong to.
+    epoch: int = 0
+
+    @classmethod
+    def build(
+        cls,
+        centroids: Optional[np.ndarray],
+        assignments: np.ndarray,
+        nlist: int,
+        token: str,
+        epoch: int = 0,
+    ) -> _IvfState:
+        counts = np.bincount(assignments, minlength=nlist)
+        return cls(
+            centroids=centroids,
+            assignments=assignments,
+            order=np.argsort(assignments, kind="stable"),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.intp),
+            token=token,
+            epoch=epoch,
+        )
+
+
+class IvfIndex:
+    """Inverted-file (IVF-flat) index over the rows of a ``VectorStorage``.
+
+    Each row is assigned to its nearest k-means centroid. A query scores the
+    ``nprobe`` closest centroids and then only the rows in those lists, reading
+    them at full precision from the memory-mapped matrix. Updates happen under
+    a lock file and pick up assignments written by other processes first.
+
+    Assignments follow the store's row numbers, which change only when a
+    compaction drops deleted rows. The compactor calls ``remap`` to carry them
+    over to the new epoch; an index found behind the store's epoch any other way
+    is rebuilt.
+    """
+
+    def __init__(self, path: Path, nlist: int, nprobe: int):
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._meta_file = self._path / "ivf.json"
+        self._centroids_file = self._path / "ivf_centroids.npy"
+        self._assignments_file = self._path / "ivf_assignments.i4"
+        self._lock_file = self._path / ".lock"
+        self._nlist = nlist
+        self.nprobe = nprobe
+        self._state = self._empty_state()
+        with file_lock(self._lock_file):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._state.assignments)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._state.centroids is not None
+
+    @property
+    def epoch(self) -> int:
+        return self._state.epoch
+
+    def sync(self, vectors: np.ndarray, epoch: int = 0) -> None:
+        """Assign rows of ``vectors`` that are not indexed yet, training first if needed.
+
+        ``epoch`` is the storage epoch ``vectors`` were read at.
+        """
+
+        with file_lock(self._lock_file):
+            self._load()
+            if epoch < self.epoch:
+                # The caller's snapshot predates a compaction the index already follows.
+                return
+            count = len(vectors)
+            if epoch > self.epoch or count < len(self):
+                # The rows were renumbered without a remap; the assignments no longer line up.
+                self._reset(epoch)
+            if not self.is_trained:
+                if count < self._nlist * MIN_POINTS_PER_CENTROID:
+                    return
+                self._train(vectors)
+
+            state = self._state
+            indexed = len(state.assignments)
+            if count == indexed:
+                return
+
+            new_labels = _nearest_centroids(vectors[indexed:count], state.centroids)
+            fsync_append(
+                self._assignments_file,
+                indexed * _ASSIGNMENT_DTYPE.itemsize,
+                new_labels.tobytes(),
+            )
+            self._write_meta(count, state.token, state.epoch)
+            self._state = _IvfState.build(
+                state.centroids,
+                np.concatenate([state.assignments, new_labels]),
+                self._nlist,
+                state.token,
+                state.epoch,
+            )
+
+    def remap(self, kept: np.ndarray, epoch: int) -> None:
+        """Follow a compaction to ``epoch`` that kept the rows set in ``kept``.
+
+        Rows keep their lists, so nothing is re-assigned or retrained; the
+        assignments of dropped rows are simply removed.
+        """
+
+        with file_lock(self._lock_file):
+            self._load()
+            state = self._state
+            if not self.is_trained or state.epoch != epoch - 1:
+                # Nothing to carry over, or already out of step: the next ``sync`` rebuilds it.
+                return
+
+            assignments = state.assignments[kept[: len(state.assignments)]]
+            tmp_file = self._assignments_file.with_suffix(".tmp")
+            with tmp_file.open("wb") as handle:
+                handle.write(assignments.tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_file, self._assignments_file)
+            # A new token makes other processes reload the assignments in full.
+            token = uuid.uuid4().hex
+            self._write_meta(len(assignments), token, epoch)
+            self._state = _IvfState.build(state.centroids, assignments, self._nlist, token, epoch)
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        live: Optional[np.ndarray] = None,
+        epoch: int = 0,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Probe the closest lists of rows, skipping rows cleared in ``live``.
+
+        ``vectors`` must be read at storage ``epoch``. If the index is still on
+        an older one, a compaction is being remapped and the search is exact.
+        """
+
+        state = self._state
+        if state.epoch != epoch:
+            return exact_search(vectors, query, k, live)
+
+        probes = top_k_indices(state.centroids @ query, self.nprobe)
+        parts: List[np.ndarray] = [
+            state.order[state.offsets[probe] : state.offsets[probe + 1]] for probe in probes
+        ]
+        candidates = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+        if live is not None:
+            candidates = candidates[live[candidates]]
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+
+        scores = vectors[candidates] @ query
+        best = top_k_indices(scores, k)
+        return candidates[best], scores[best]
+
+    def _empty_state(self, epoch: int = 0) -> _IvfState:
+        return _IvfState.build(None, np.zeros(0, dtype=_ASSIGNMENT_DTYPE), self._nlist, "", epoch)
+
+    def _reset(self, epoch: int = 0) -> None:
+        for file in (self._meta_file, self._centroids_file, self._assignments_file):
+            file.unlink(missing_ok=True)
+        self._state = self._empty_state(epoch)
+
+    def _train(self, vectors: np.ndarray) -> None:
+        sample_size = min(len(vectors), self._nlist * TRAINING_POINTS_PER_CENTROID)
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+        centroids = spherical_kmeans(np.asarray(vectors[sample_rows]), self._nlist)
+
+        epoch = self._state.epoch
+        self._reset(epoch)
+        with self._centroids_file.open("wb") as handle:
+            np.save(handle, centroids)
+        token = uuid.uuid4().hex
+        self._write_meta(0, token, epoch)
+        self._state = _IvfState.build(centroids, self._state.assignments, self._nlist, token, epoch)
+
+    def _write_meta(self, count: int, token: str, epoch: int) -> None:
+        write_json_atomic(
+            self._meta_file,
+            {"nlist": self._nlist, "count": count, "token": token, "epoch": epoch},
+        )
+
+    def _load(self) -> None:
+        """Catch up with the index on disk, which another process may have extended."""
+
+        if not self._meta_file.exists() or not self._centroids_file.exists():
+            # Untrained; only the epoch it was last synced at is worth keeping.
+            self._state = self._empty_state(self._state.epoch)
+            return
+
+        meta = json.loads(self._meta_file.read_text(encoding="utf-8"))
+        if meta.get("nlist") != self._nlist:
+            # Settings changed since the index was built; retrain on next sync.
+            self._reset()
+            return
+
+        state = self._state
+        token = meta.get("token", "")
+        count = int(meta.get("count", 0))
+        if token != state.token:
+            state = _IvfState.build(
+                np.load(self._centroids_file),
+                np.zeros(0, dtype=_ASSIGNMENT_DTYPE),
+                self._nlist,
+                token,
+                int(meta.get("epoch", 0)),
+            )
+        indexed = len(state.assignments)
+        if count == indexed and state is self._state:
+            return
+
+        with self._assignments_file.open("rb") as handle:
+            handle.seek(indexed * _ASSIGNMENT_DTYPE.itemsize)
+            tail = np.frombuffer(
+                handle.read((count - indexed) * _ASSIGNMENT_DTYPE.itemsize),
+                dtype=_ASSIGNMENT_DTYPE,
+            )
+        self._state = _IvfState.build(
+            state.centroids,
+            np.concatenate([state.assignments, tail]),
+            self._nlist,
+            token,
+            state.epoch,
+        )
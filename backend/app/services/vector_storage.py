@@ -0,0 +1,859 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.lexical_index import LexicalView, SegmentPostings
+from app.services.vector_quantization import QuantizedVectors, QuantizedView, check_mode
+
+# Stores from before the binary layout are JSON and converted by ``migrate_json_store``.
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+SEGMENTS_DIR = "segments"
+VECTORS_FILE = "vectors.f32"
+CHUNKS_FILE = "chunks.bin"
+CHUNK_OFFSETS_FILE = "chunks.idx"
+METADATA_FILE = "metadata.bin"
+METADATA_OFFSETS_FILE = "metadata.idx"
+OWNERS_FILE = "owners.json"
+TOMBSTONES_PREFIX = "tombstones-"
+LEGACY_STORE_FILE = "store.json"
+
+VECTOR_DTYPE = np.dtype("<f4")
+OFFSET_DTYPE = np.dtype("<u8")
+
+_RELOAD_ATTEMPTS = 3
+
+# Metadata field naming the document a row belongs to; deletes and replaces go by it.
+OWNER_FIELD = "source"
+
+# Called with the rows a compaction kept, in the old numbering, and the new epoch.
+RenumberCallback = Callable[[np.ndarray, int], None]
+
+
+@dataclass
+class SegmentInfo:
+    name: str
+    count: int
+    # Rows deleted since the segment was written, and the bitmap file marking them.
+    deleted: int = 0
+    tombstones: Optional[str] = None
+
+    @property
+    def dead_fraction(self) -> float:
+        return self.deleted / self.count if self.count else 0.0
+
+
+@dataclass
+class StorageManifest:
+    """Committed state of the on-disk vector store.
+
+    Segments are immutable once written; the manifest is the only file that is
+    ever replaced, and always by atomic rename, so a crash at any point leaves
+    either the previous or the next consistent state. Deletes add a tombstone
+    bitmap next to a segment's rows rather than changing them.
+    """
+
+    format_version: int = FORMAT_VERSION
+    dimension: int = 0
+    # Rows in all segments, deleted ones included; row numbers run up to it.
+    count: int = 0
+    generation: int = 0
+    # Bumped when a compaction drops deleted rows and so renumbers the rows after them.
+    epoch: int = 0
+    next_segment: int = 1
+    segments: List[SegmentInfo] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> StorageManifest:
+        segments = [SegmentInfo(**item) for item in raw.get("segments", [])]
+        fields = {key: value for key, value in raw.items() if key != "segments"}
+        return cls(segments=segments, **fields)
+
+
+def fsync_append(path: Path, committed_size: int, payload: bytes) -> None:
+    """Append ``payload`` after the first ``committed_size`` bytes of ``path`` and fsync."""
+
+    with path.open("ab") as handle:
+        # Drop bytes left behind by an append that never reached the manifest.
+        handle.truncate(committed_size)
+        handle.write(payload)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def write_json_atomic(path: Path, payload: Dict[str, Any]) -> None:
+    """Write ``payload`` to a temporary file, fsync it and rename it over ``path``."""
+
+    tmp_file = path.with_suffix(".tmp")
+    with tmp_file.open("w", encoding="utf-8") as handle:
+        json.dump(payload, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_file, path)
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive ``flock`` on ``path`` for the duration of the block."""
+
+    with path.open("a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length, leaving all-zero rows untouched."""
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _open_memmap(path: Path, dtype: np.dtype, shape: tuple[int, ...]) -> np.ndarray:
+    if not shape[0]:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _write_file(path: Path, chunks: Iterable[bytes]) -> None:
+    with path.open("wb") as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _fresh_dir(path: Path) -> None:
+    # Any directory already here was left by a write that crashed before commit.
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+
+
+def _owner_runs(rows: np.ndarray) -> List[List[int]]:
+    """Sorted row numbers as ``[start, end)`` runs; a document's rows are mostly contiguous."""
+
+    breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+    return [[int(run[0]), int(run[-1]) + 1] for run in np.split(rows, breaks) if len(run)]
+
+
+def _read_live(path: Path, count: int) -> np.ndarray:
+    deleted = np.unpackbits(np.fromfile(path, dtype=np.uint8), count=count)
+    return deleted == 0
+
+
+def _plan_compaction(sizes: Sequence[int], target_rows: int) -> List[List[int]]:
+    """Group adjacent segments smaller than ``target_rows`` into runs to merge.
+
+    Runs never grow past ``target_rows`` and only runs of two or more segments
+    are returned, so every merge strictly reduces the segment count.
+    """
+
+    runs: List[List[int]] = []
+    run: List[int] = []
+    run_rows = 0
+    for idx, size in enumerate(sizes):
+        if size >= target_rows or run_rows + size > target_rows:
+            runs.append(run)
+            run, run_rows = [], 0
+        if size < target_rows:
+            run.append(idx)
+            run_rows += size
+    runs.append(run)
+    return [run for run in runs if len(run) > 1]
+
+
+class _BlobColumn:
+    """Variable-length records stored as one data file plus an end-offset table."""
+
+    def __init__(self, data_path: Path, offsets_path: Path, count: int):
+        self.offsets = _open_memmap(offsets_path, OFFSET_DTYPE, (count,))
+        nbytes = int(self.offsets[-1]) if count else 0
+        self.data = _open_memmap(data_path, np.dtype(np.uint8), (nbytes,))
+
+    def get(self, idx: int) -> bytes:
+        start = int(self.offsets[idx - 1]) if idx else 0
+        end = int(self.offsets[idx])
+        return self.data[start:end].tobytes()
+
+    @staticmethod
+    def write(data_path: Path, offsets_path: Path, records: Sequence[bytes]) -> None:
+        ends = np.cumsum([len(record) for record in records], dtype=OFFSET_DTYPE)
+        _write_file(data_path, records)
+        _write_file(offsets_path, [ends.tobytes()])
+
+    @staticmethod
+    def merge(
+        data_path: Path,
+        offsets_path: Path,
+        columns: Sequence[_BlobColumn],
+        keeps: Sequence[Optional[np.ndarray]],
+    ) -> None:
+        rebased: List[bytes] = []
+
+        def _payloads() -> Iterator[bytes]:
+            base = 0
+            for column, keep in zip(columns, keeps, strict=True):
+                if keep is None:
+                    payload = column.data.tobytes()
+                    ends = np.asarray(column.offsets)
+                else:
+                    records = [column.get(int(idx)) for idx in np.flatnonzero(keep)]
+                    payload = b"".join(records)
+                    ends = np.cumsum([len(record) for record in records], dtype=OFFSET_DTYPE)
+                rebased.append((ends + np.uint64(base)).astype(OFFSET_DTYPE).tobytes())
+                base += len(payload)
+                yield payload
+
+        _write_file(data_path, _payloads())
+        _write_file(offsets_path, rebased)
+
+
+class Segment:
+    """Immutable batch of rows written once and memory-mapped on open."""
+
+    def __init__(self, path: Path, count: int, dimension: int):
+        self.path = path
+        self.count = count
+        self.vectors = _open_memmap(path / VECTORS_FILE, VECTOR_DTYPE, (count, dimension))
+        self._chunks = _BlobColumn(path / CHUNKS_FILE, path / CHUNK_OFFSETS_FILE, count)
+        self._metadata = _BlobColumn(path / METADATA_FILE, path / METADATA_OFFSETS_FILE, count)
+        self._codes: Dict[str, QuantizedVectors] = {}
+
+    def codes(self, mode: str) -> QuantizedVectors:
+        """The rows quantized for ``mode``, built and saved next to them on first use."""
+
+        if mode not in self._codes:
+            self._codes[mode] = QuantizedVectors.open(self.path, mode, self.vectors)
+        return self._codes[mode]
+
+    @cached_property
+    def postings(self) -> SegmentPostings:
+        """BM25 postings of the rows' text, built and saved next to them on first use."""
+
+        return SegmentPostings.open(self.path, (self.text(idx) for idx in range(self.count)))
+
+    def text(self, idx: int) -> str:
+        return self._chunks.get(idx).decode("utf-8")
+
+    def metadata(self, idx: int) -> Dict[str, Any]:
+        return json.loads(self._metadata.get(idx))
+
+    @cached_property
+    def owners(self) -> Dict[str, np.ndarray]:
+        """Rows of each document in this segment, by ``OWNER_FIELD``."""
+
+        owners_file = self.path / OWNERS_FILE
+        if owners_file.exists():
+            runs = json.loads(owners_file.read_text(encoding="utf-8"))
+            return {
+                owner: np.concatenate([np.arange(start, end) for start, end in spans])
+                for owner, spans in runs.items()
+            }
+        # Segments written before ownership was recorded: read it from the metadata.
+        return _group_owners(self.metadata(idx).get(OWNER_FIELD) for idx in range(self.count))
+
+    @staticmethod
+    def write(
+        path: Path,
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        vectors: np.ndarray,
+    ) -> None:
+        _fresh_dir(path)
+        _write_file(path / VECTORS_FILE, [vectors.astype(VECTOR_DTYPE).tobytes()])
+        _BlobColumn.write(
+            path / CHUNKS_FILE,
+            path / CHUNK_OFFSETS_FILE,
+            [text.encode("utf-8") for text in texts],
+        )
+        _BlobColumn.write(
+            path / METADATA_FILE,
+            path / METADATA_OFFSETS_FILE,
+            [json.dumps(item, separators=(",", ":")).encode("utf-8") for item in metadatas],
+        )
+        _write_owners(path, _group_owners(item.get(OWNER_FIELD) for item in metadatas))
+
+    @staticmethod
+    def merge(
+        path: Path,
+        segments: Sequence[Segment],
+        keeps: Sequence[Optional[np.ndarray]],
+    ) -> None:
+        """Write ``segments`` as one, keeping only the rows set in each mask (all for ``None``)."""
+
+        _fresh_dir(path)
+        _write_file(
+            path / VECTORS_FILE,
+            (
+                np.asarray(segment.vectors if keep is None else segment.vectors[keep]).tobytes()
+                for segment, keep in zip(segments, keeps, strict=True)
+            ),
+        )
+        _BlobColumn.merge(
+            path / CHUNKS_FILE,
+            path / CHUNK_OFFSETS_FILE,
+            [segment._chunks for segment in segments],
+            keeps,
+        )
+        _BlobColumn.merge(
+            path / METADATA_FILE,
+            path / METADATA_OFFSETS_FILE,
+            [segment._metadata for segment in segments],
+            keeps,
+        )
+
+        owners: Dict[str, List[np.ndarray]] = {}
+        base = 0
+        for segment, keep in zip(segments, keeps, strict=True):
+            # Position of each kept row in the merged segment, before ``base``.
+            renumbered = None if keep is None else np.cumsum(keep) - 1
+            for owner, rows in segment.owners.items():
+                if renumbered is not None:
+                    rows = renumbered[rows[keep[rows]]]
+                if len(rows):
+                    owners.setdefault(owner, []).append(rows + base)
+            base += segment.count if keep is None else int(keep.sum())
+        _write_owners(path, {owner: np.concatenate(parts) for owner, parts in owners.items()})
+
+
+def _group_owners(owners: Iterable[Optional[str]]) -> Dict[str, np.ndarray]:
+    grouped: Dict[str, List[int]] = {}
+    for idx, owner in enumerate(owners):
+        if owner is not None:
+            grouped.setdefault(str(owner), []).append(idx)
+    return {owner: np.asarray(rows) for owner, rows in grouped.items()}
+
+
+def _write_owners(path: Path, owners: Dict[str, np.ndarray]) -> None:
+    runs = {owner: _owner_runs(rows) for owner, rows in owners.items()}
+    _write_file(path / OWNERS_FILE, [json.dumps(runs, separators=(",", ":")).encode("utf-8")])
+
+
+class SegmentedVectors:
+    """Read-only ``(count, dimension)`` row view spanning several segment matrices.
+
+    Supports what the search code needs: ``len``, ``@ query`` and row selection
+    by integer, slice or index array.
+    """
+
+    def __init__(self, matrices: Sequence[np.ndarray], dimension: int):
+        self._matrices = list(matrices)
+        self.starts = np.cumsum([0] + [len(matrix) for matrix in self._matrices])
+        self.shape = (int(self.starts[-1]), dimension)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        if not self._matrices:
+            return np.zeros(0, dtype=VECTOR_DTYPE)
+        return np.concatenate([matrix @ query for matrix in self._matrices])
+
+    def __getitem__(self, key: int | slice | np.ndarray) -> np.ndarray:
+        if isinstance(key, (int, np.integer)):
+            segment = int(np.searchsorted(self.starts, key, side="right")) - 1
+            return np.asarray(self._matrices[segment][key - self.starts[segment]])
+
+        rows = np.arange(*key.indices(len(self))) if isinstance(key, slice) else np.asarray(key)
+        output = np.empty((len(rows), self.shape[1]), dtype=VECTOR_DTYPE)
+        segment_ids = np.searchsorted(self.starts, rows, side="right") - 1
+        for segment in np.unique(segment_ids):
+            mask = segment_ids == segment
+            output[mask] = self._matrices[segment][rows[mask] - self.starts[segment]]
+        return output
+
+
+@dataclass(frozen=True)
+class StorageSnapshot:
+    """One committed generation of the store, safe to read while newer ones land.
+
+    Row numbers are only meaningful within a snapshot: a compaction that drops
+    deleted rows renumbers the rows after them in the next one.
+    """
+
+    manifest: StorageManifest
+    segments: List[Segment]
+    vectors: SegmentedVectors
+    # Per segment, which rows are not deleted; ``None`` when none are.
+    segment_live: List[Optional[np.ndarray]] = field(default_factory=list)
+    # The same across all rows, or ``None`` when nothing is deleted.
+    live: Optional[np.ndarray] = None
+    # Compact codes of every row for a first scoring pass, when quantization is on.
+    codes: Optional[QuantizedView] = None
+    # BM25 postings of every row's text, when lexical search is on.
+    lexical: Optional[LexicalView] = None
+
+    @property
+    def epoch(self) -> int:
+        return self.manifest.epoch
+
+    @property
+    def live_count(self) -> int:
+        return self.manifest.count - sum(info.deleted for info in self.manifest.segments)
+
+    def locate(self, idx: int) -> tuple[Segment, int]:
+        if idx < 0 or idx >= self.manifest.count:
+            raise IndexError(idx)
+        starts = self.vectors.starts
+        segment = int(np.searchsorted(starts, idx, side="right")) - 1
+        return self.segments[segment], idx - int(starts[segment])
+
+    def text(self, idx: int) -> str:
+        segment, local = self.locate(idx)
+        return segment.text(local)
+
+    def metadata(self, idx: int) -> Dict[str, Any]:
+        segment, local = self.locate(idx)
+        return segment.metadata(local)
+
+
+class VectorStorage:
+    """Versioned, segmented binary layout for embeddings, chunk text and metadata.
+
+    Every ``append`` writes one immutable segment holding a row-normalized
+    float32 matrix plus chunk text and compact JSON metadata blobs, then commits
+    it by atomically replacing the small manifest. Write cost is proportional to
+    the batch, opening the store only memory-maps files, and ``compact`` merges
+    runs of small segments without changing row order. Writers serialize on a
+    lock file, so the API and worker processes can share one directory.
+
+    Rows belong to the document named by their ``OWNER_FIELD``. Deleting a
+    document only writes tombstone bitmaps for the segments holding its rows;
+    searches mask those rows out, and ``compact`` drops them once they make up
+    enough of a segment.
+
+    With ``quantization`` set to ``float16`` or ``int8``, each opened segment
+    also maps (building on first use) a compact copy of its rows; see
+    ``app.services.vector_quantization``. With ``lexical`` set, each also keeps
+    BM25 postings of its text; see ``app.services.lexical_index``.
+    """
+
+    def __init__(self, path: Path, quantization: str = "none", lexical: bool = False):
+        self._path = Path(path)
+        self._quantization = check_mode(quantization)
+        self._lexical = lexical
+        self._segments_path = self._path / SEGMENTS_DIR
+        self._segments_path.mkdir(parents=True, exist_ok=True)
+        self._manifest_file = self._path / MANIFEST_FILE
+        self._lock_file = self._path / LOCK_FILE
+        self._snapshot = StorageSnapshot(
+            StorageManifest(generation=-1), [], SegmentedVectors([], 0)
+        )
+        self._manifest_stamp: tuple[int, int, int] | None = None
+        self.reload()
+
+    def __len__(self) -> int:
+        return self._snapshot.manifest.count
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def dimension(self) -> int:
+        return self._snapshot.manifest.dimension
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every committed append, delete or compaction."""
+
+        return self._snapshot.manifest.generation
+
+    @property
+    def epoch(self) -> int:
+        """Counter bumped whenever a compaction renumbers rows."""
+
+        return self._snapshot.manifest.epoch
+
+    @property
+    def live(self) -> Optional[np.ndarray]:
+        """Mask of rows that are not deleted, or ``None`` when every row is live."""
+
+        return self._snapshot.live
+
+    @property
+    def live_count(self) -> int:
+        return self._snapshot.live_count
+
+    @property
+    def segment_sizes(self) -> List[int]:
+        return [segment.count for segment in self._snapshot.segments]
+
+    @property
+    def vectors(self) -> SegmentedVectors:
+        """Read-only view over the unit-normalized embeddings of every segment."""
+
+        return self._snapshot.vectors
+
+    def snapshot(self) -> StorageSnapshot:
+        """The current generation, for reads whose row numbers must stay consistent."""
+
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Reload only if the manifest was replaced since it was last read.
+
+        Costs one ``stat`` when nothing changed. Returns whether a newer
+        generation was opened.
+        """
+
+        try:
+            stat = self._manifest_file.stat()
+        except FileNotFoundError:
+            return False
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._manifest_stamp:
+            return False
+
+        generation = self.generation
+        self.reload()
+        self._manifest_stamp = stamp
+        return self.generation != generation
+
+    def reload(self) -> None:
+        """Pick up segments committed by this or another process."""
+
+        for attempt in range(_RELOAD_ATTEMPTS):
+            try:
+                self._open(self._read_manifest())
+                return
+            except FileNotFoundError:
+                # A concurrent compaction removed a segment between reading the
+                # manifest and mapping it; the next manifest no longer lists it.
+                if attempt == _RELOAD_ATTEMPTS - 1:
+                    raise
+
+    def text(self, idx: int) -> str:
+        return self._snapshot.text(idx)
+
+    def metadata(self, idx: int) -> Dict[str, Any]:
+        return self._snapshot.metadata(idx)
+
+    def append(
+        self,
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        vectors: np.ndarray,
+        replaces: Sequence[str] = (),
+    ) -> int:
+        """Add rows as one segment; return how many rows of ``replaces`` it deleted.
+
+        The earlier rows of every document in ``replaces`` are tombstoned in the
+        same commit, so readers see either the old rows or the new ones.
+        """
+
+        if not texts and not replaces:
+            return 0
+
+        matrix = np.asarray(vectors, dtype=VECTOR_DTYPE)
+        if texts and (
+            matrix.ndim != 2 or matrix.shape[0] != len(texts) or len(metadatas) != len(texts)
+        ):
+            raise ValueError("Texts, metadatas and vectors must have matching lengths")
+
+        with file_lock(self._lock_file):
+            current = self._read_manifest()
+            self._open(current)
+            segments, deleted, obsolete = self._tombstone(current, replaces)
+            dimension = current.dimension
+            next_segment = current.next_segment
+            if texts:
+                dimension = dimension or matrix.shape[1]
+                if matrix.shape[1] != dimension:
+                    raise ValueError(
+                        f"Embedding dimension {matrix.shape[1]} does not match "
+                        f"store dimension {dimension}"
+                    )
+                name = self._segment_name(next_segment)
+                next_segment += 1
+                Segment.write(self._segments_path / name, texts, metadatas, normalize_rows(matrix))
+                segments.append(SegmentInfo(name=name, count=len(texts)))
+            elif not deleted:
+                return 0
+
+            self._commit(
+                StorageManifest(
+                    dimension=dimension,
+                    count=current.count + len(texts),
+                    generation=current.generation + 1,
+                    epoch=current.epoch,
+                    next_segment=next_segment,
+                    segments=segments,
+                )
+            )
+            for path in obsolete:
+                path.unlink(missing_ok=True)
+            return deleted
+
+    def delete(self, owners: Sequence[str]) -> int:
+        """Tombstone every row of the ``owners`` documents; return how many were live."""
+
+        return self.append([], [], np.zeros((0, 0), dtype=VECTOR_DTYPE), replaces=owners)
+
+    def needs_compaction(
+        self, target_rows: int, trigger: int, max_dead_fraction: float = 1.0
+    ) -> bool:
+        segments = self._snapshot.manifest.segments
+        small = [info for info in segments if info.count - info.deleted < target_rows]
+        return len(small) >= trigger or any(
+            info.deleted and info.dead_fraction >= max_dead_fraction for info in segments
+        )
+
+    def compact(
+        self,
+        target_rows: int,
+        max_dead_fraction: float = 1.0,
+        on_renumber: Optional[RenumberCallback] = None,
+    ) -> int:
+        """Merge runs of small segments and purge deleted rows; return segments removed.
+
+        Runs of adjacent segments with fewer than ``target_rows`` live rows are
+        merged, and any segment whose deleted share reaches ``max_dead_fraction``
+        is rewritten on its own. Either way deleted rows are left out. That
+        renumbers the rows after them, so ``on_renumber`` is called, still under
+        the lock, with the kept rows and the new epoch.
+        """
+
+        with file_lock(self._lock_file):
+            current = self._read_manifest()
+            self._open(current)
+            self._remove_orphans(current)
+            snapshot = self._snapshot
+
+            runs = _plan_compaction(
+                [info.count - info.deleted for info in current.segments], target_rows
+            )
+            merging = {idx for run in runs for idx in run}
+            runs += [
+                [idx]
+                for idx, info in enumerate(current.segments)
+                if idx not in merging and info.deleted and info.dead_fraction >= max_dead_fraction
+            ]
+            if not runs:
+                return 0
+
+            kept = np.ones(current.count, dtype=bool)
+            starts = snapshot.vectors.starts
+            replacements: Dict[int, Optional[SegmentInfo]] = {}
+            merged_away: set[int] = set()
+            next_segment = current.next_segment
+            for run in runs:
+                keeps = [snapshot.segment_live[idx] for idx in run]
+                for idx, keep in zip(run, keeps, strict=True):
+                    if keep is not None:
+                        kept[starts[idx] : starts[idx + 1]] = keep
+                rows = sum(
+                    current.segments[idx].count - current.segments[idx].deleted for idx in run
+                )
+                # A run with no live rows left is dropped without a replacement.
+                replacements[run[0]] = None
+                if rows:
+                    name = self._segment_name(next_segment)
+                    next_segment += 1
+                    Segment.merge(
+                        self._segments_path / name, [snapshot.segments[idx] for idx in run], keeps
+                    )
+                    replacements[run[0]] = SegmentInfo(name=name, count=rows)
+                merged_away.update(run)
+
+            segments: List[SegmentInfo] = []
+            for idx, info in enumerate(current.segments):
+                if idx in replacements:
+                    replacement = replacements[idx]
+                    if replacement is not None:
+                        segments.append(replacement)
+                elif idx not in merged_away:
+                    segments.append(info)
+            renumbered = not kept.all()
+            epoch = current.epoch + 1 if renumbered else current.epoch
+            obsolete = [snapshot.segments[idx].path for idx in sorted(merged_away)]
+            self._commit(
+                StorageManifest(
+                    dimension=current.dimension,
+                    count=sum(info.count for info in segments),
+                    generation=current.generation + 1,
+                    epoch=epoch,
+                    next_segment=next_segment,
+                    segments=segments,
+                )
+            )
+            if renumbered and on_renumber is not None:
+                on_renumber(kept, epoch)
+            for path in obsolete:
+                shutil.rmtree(path, ignore_errors=True)
+            return len(current.segments) - len(segments)
+
+    def _tombstone(
+        self, manifest: StorageManifest, owners: Sequence[str]
+    ) -> Tuple[List[SegmentInfo], int, List[Path]]:
+        """Write new tombstone bitmaps marking the live rows of ``owners`` as deleted.
+
+        Returns the segment list for the next manifest, how many rows were
+        deleted and the bitmap files that list supersedes.
+        """
+
+        segments = list(manifest.segments)
+        deleted = 0
+        obsolete: List[Path] = []
+        if not owners:
+            return segments, deleted, obsolete
+
+        snapshot = self._snapshot
+        for position, (info, segment) in enumerate(
+            zip(manifest.segments, snapshot.segments, strict=True)
+        ):
+            found = [segment.owners[owner] for owner in owners if owner in segment.owners]
+            if not found:
+                continue
+            live = snapshot.segment_live[position]
+            live = np.ones(info.count, dtype=bool) if live is None else live.copy()
+            rows = np.concatenate(found)
+            rows = rows[live[rows]]
+            if not len(rows):
+                continue
+
+            live[rows] = False
+            name = f"{TOMBSTONES_PREFIX}{manifest.generation + 1:08d}.bits"
+            _write_file(segment.path / name, [np.packbits(~live).tobytes()])
+            if info.tombstones:
+                obsolete.append(segment.path / info.tombstones)
+            segments[position] = SegmentInfo(
+                name=info.name, count=info.count, deleted=info.deleted + len(rows), tombstones=name
+            )
+            deleted += len(rows)
+        return segments, deleted, obsolete
+
+    def _commit(self, manifest: StorageManifest) -> None:
+        write_json_atomic(self._manifest_file, asdict(manifest))
+        self._open(manifest)
+
+    def _open(self, manifest: StorageManifest) -> None:
+        if manifest.generation == self._snapshot.manifest.generation:
+            return
+
+        previous = self._snapshot
+        existing = {segment.path.name: segment for segment in previous.segments}
+        masks = {
+            (info.name, info.tombstones): live
+            for info, live in zip(previous.manifest.segments, previous.segment_live, strict=True)
+            if live is not None
+        }
+        segments = [
+            existing.get(info.name)
+            or Segment(self._segments_path / info.name, info.count, manifest.dimension)
+            for info in manifest.segments
+        ]
+        segment_live: List[Optional[np.ndarray]] = []
+        for info, segment in zip(manifest.segments, segments, strict=True):
+            mask = None
+            if info.tombstones:
+                mask = masks.get((info.name, info.tombstones))
+                if mask is None:
+                    mask = _read_live(segment.path / info.tombstones, info.count)
+            segment_live.append(mask)
+        live = None
+        if any(mask is not None for mask in segment_live):
+            live = np.concatenate(
+                [
+                    np.ones(info.count, dtype=bool) if mask is None else mask
+                    for info, mask in zip(manifest.segments, segment_live, strict=True)
+                ]
+            )
+        vectors = SegmentedVectors([segment.vectors for segment in segments], manifest.dimension)
+        codes = None
+        if self._quantization != "none":
+            codes = QuantizedView([segment.codes(self._quantization) for segment in segments])
+        lexical = LexicalView([segment.postings for segment in segments]) if self._lexical else None
+        # Swap in one assignment so readers on other threads never see a torn state.
+        self._snapshot = StorageSnapshot(
+            manifest, segments, vectors, segment_live, live, codes, lexical
+        )
+
+    def _remove_orphans(self, manifest: StorageManifest) -> None:
+        # Segments and tombstones written by a write that crashed before commit,
+        # and tombstones a later delete superseded.
+        listed = {info.name: info.tombstones for info in manifest.segments}
+        for entry in self._segments_path.iterdir():
+            if entry.name not in listed:
+                shutil.rmtree(entry, ignore_errors=True)
+                continue
+            for bitmap in entry.glob(f"{TOMBSTONES_PREFIX}*"):
+                if bitmap.name != listed[entry.name]:
+                    bitmap.unlink(missing_ok=True)
+
+    @staticmethod
+    def _segment_name(number: int) -> str:
+        return f"seg-{number:08d}"
+
+    def _read_manifest(self) -> StorageManifest:
+        if not self._manifest_file.exists():
+            return StorageManifest()
+
+        manifest = StorageManifest.from_dict(
+            json.loads(self._manifest_file.read_text(encoding="utf-8"))
+        )
+        if manifest.format_version != FORMAT_VERSION:
+            raise RuntimeError(
+                f"Vector store format {manifest.format_version} is not supported; "
+                f"expected version {FORMAT_VERSION}"
+            )
+        return manifest
+
+
+def migrate_json_store(path: Path) -> int:
+    """Convert a legacy ``store.json`` into the binary layout.
+
+    The legacy file is renamed to ``store.json.migrated`` once its rows are
+    committed, so the migration runs at most once. Returns the number of rows
+    migrated.
+    """
+
+    legacy_file = Path(path) / LEGACY_STORE_FILE
+    if not legacy_file.exists():
+        return 0
+
+    raw = json.loads(legacy_file.read_text(encoding="utf-8"))
+    documents: List[str] = list(raw.get("documents", []))
+    metadatas: List[Dict[str, Any]] = list(raw.get("metadatas", []))
+    vectors = raw.get("vectors", [])
+
+    storage = VectorStorage(path)
+    if len(storage):
+        raise RuntimeError(f"Refusing to migrate {legacy_file} into a non-empty vector store")
+
+    total = min(len(documents), len(metadatas), len(vectors))
+    storage.append(
+        documents[:total],
+        metadatas[:total],
+        np.asarray(vectors[:total], dtype=VECTOR_DTYPE),
+    )
+
+    os.replace(legacy_file, legacy_file.with_name(f"{LEGACY_STORE_FILE}.migrated"))
+    return total
+
+
+def main() -> None:
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    migrated = migrate_json_store(settings.vector_store_path)
+    print(f"Migrated {migrated} chunks into {settings.vector_store_path}")
+
+
+if __name__ == "__main__":
+    main()
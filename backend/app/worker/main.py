@@ -1,13 +1,32 @@
-from rq import Connection, Worker
+from redis import Redis
+from rq import Worker
 
 from app.core.config import get_settings
+from app.services.registry import warm_up
+from app.worker.pool import ThreadPoolWorker
 
 
 def main() -> None:
     settings = get_settings()
-    with Connection():
-        worker = Worker([settings.task_queue_name], name="flow-worker")
-        worker.work()
+    # Thread workers share the loaded model and store; forked job processes inherit them.
+    warm_up()
+    connection = Redis.from_url(
+        settings.redis_url, health_check_interval=settings.redis_health_check_interval
+    )
+    # Interactive chat first, bulk work only when no chat is waiting.
+    queue_names = [settings.task_queue_name, settings.bulk_queue_name]
+    if settings.worker_concurrency > 1:
+        ThreadPoolWorker(
+            queue_names,
+            connection=connection,
+            concurrency=settings.worker_concurrency,
+            prefetch=settings.worker_prefetch,
+            limits={settings.bulk_queue_name: settings.worker_bulk_concurrency},
+        ).work()
+        return
+
+    worker = Worker(queue_names, name="flow-worker", connection=connection)
+    worker.work()
 
 
 if __name__ == "__main__":
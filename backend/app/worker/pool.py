@@ -0,0 +1,210 @@
+"""Runs RQ jobs on a pool of threads inside one warm worker process.
+
+The stock ``Worker`` forks a child per job and runs one job at a time, but a
+chat job spends nearly all of its time waiting on Flow. ``ThreadPoolWorker``
+keeps one preloaded process and runs ``concurrency`` jobs side by side. A
+dispatcher in the main thread pops jobs from Redis and hands them to executor
+threads. Each executor thread is backed by its own registered ``SimpleWorker``,
+so RQ's registries, callbacks and ``rq info`` keep working.
+
+Jobs share the process's embedding model, HTTP client and event loop (see
+``app.services.registry``), so identical questions in flight are coalesced.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import signal
+import threading
+import uuid
+from types import FrameType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from redis import Redis
+from rq import Queue, SimpleWorker
+from rq.exceptions import DequeueTimeout
+from rq.job import Job
+from rq.timeouts import TimerDeathPenalty
+
+logger = logging.getLogger(__name__)
+
+# A popped job waiting for a free thread, or ``None`` telling an executor to exit.
+_Item = Optional[Tuple[Job, Queue]]
+
+
+class ThreadWorker(SimpleWorker):
+    """``SimpleWorker`` that can run off the main thread."""
+
+    # SIGALRM only reaches the main thread; the timer penalty works in any thread.
+    death_penalty_class = TimerDeathPenalty
+
+
+class ThreadPoolWorker:
+    """Runs up to ``concurrency`` jobs at once, holding ``prefetch`` more in reserve.
+
+    Queues are served in the order given, so earlier queues take priority.
+    ``limits`` caps how many jobs from a queue may be in the process at once,
+    which keeps bulk work from occupying every thread.
+
+    On SIGTERM or SIGINT the dispatcher stops taking jobs. Prefetched jobs that
+    have not started go back to the front of their queue, and running jobs
+    finish before the process exits.
+    """
+
+    def __init__(
+        self,
+        queue_names: Sequence[str],
+        connection: Redis,
+        name: str = "flow-worker",
+        concurrency: int = 16,
+        prefetch: int = 0,
+        poll_interval: int = 5,
+        limits: Optional[Mapping[str, int]] = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if prefetch < 0:
+            raise ValueError("prefetch cannot be negative")
+
+        self._connection = connection
+        self._queues = [Queue(queue_name, connection=connection) for queue_name in queue_names]
+        # Replicas may share a hostname and pid, so names get a random part.
+        prefix = f"{name}-{uuid.uuid4().hex[:8]}"
+        self._workers: List[ThreadWorker] = [
+            ThreadWorker(self._queues, name=f"{prefix}-{index}", connection=connection)
+            for index in range(concurrency)
+        ]
+        # Running plus prefetched jobs; a queue without a limit may fill all of it.
+        self._capacity = concurrency + prefetch
+        self._slots = threading.BoundedSemaphore(self._capacity)
+        self._ready: queue.Queue[_Item] = queue.Queue()
+        self._stopping = threading.Event()
+        self._poll_interval = poll_interval
+        self._limits = dict(limits or {})
+        self._held: Dict[str, int] = {queue_name: 0 for queue_name in queue_names}
+        self._held_lock = threading.Lock()
+
+    @property
+    def workers(self) -> List[ThreadWorker]:
+        return list(self._workers)
+
+    def request_stop(self, signum: Optional[int] = None, frame: Optional[FrameType] = None) -> None:
+        if not self._stopping.is_set():
+            logger.info("Stop requested; draining %d worker threads", len(self._workers))
+        self._stopping.set()
+
+    def work(self) -> None:
+        """Run until :meth:`request_stop` is called, then drain and return."""
+
+        for worker in self._workers:
+            worker.register_birth()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.request_stop)
+            signal.signal(signal.SIGINT, self.request_stop)
+
+        threads = [
+            threading.Thread(target=self._execute, args=(worker,), name=worker.name, daemon=True)
+            for worker in self._workers
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._dispatch()
+        finally:
+            self._drain(threads)
+
+    def _dispatch(self) -> None:
+        lead = self._workers[0]
+        while not self._stopping.is_set():
+            if lead.should_run_maintenance_tasks:
+                lead.clean_registries()
+            if not self._slots.acquire(timeout=self._poll_interval):
+                continue
+            eligible = self._eligible_queues()
+            try:
+                popped = (
+                    Queue.dequeue_any(
+                        eligible, timeout=self._poll_interval, connection=self._connection
+                    )
+                    if eligible
+                    else None
+                )
+            except DequeueTimeout:
+                # RQ reports an empty blocking pop as an error rather than ``None``.
+                popped = None
+            except BaseException:
+                self._slots.release()
+                raise
+            if popped is None:
+                self._slots.release()
+                if not eligible:
+                    self._stopping.wait(self._poll_interval)
+                continue
+
+            job, origin = popped
+            if len(eligible) == 1 and len(self._queues) > 1:
+                # A single-queue pop parks the id in RQ's intermediate list, which
+                # RQ only clears for single-queue workers; clear it here instead.
+                self._connection.lrem(origin.intermediate_queue_key, 1, job.id)
+            self._hold(origin.name, 1)
+            self._ready.put(popped)
+
+    def _eligible_queues(self) -> List[Queue]:
+        with self._held_lock:
+            return [
+                candidate
+                for candidate in self._queues
+                if self._held[candidate.name] < self._limits.get(candidate.name, self._capacity)
+            ]
+
+    def _hold(self, queue_name: str, delta: int) -> None:
+        with self._held_lock:
+            self._held[queue_name] += delta
+
+    def _execute(self, worker: ThreadWorker) -> None:
+        while True:
+            try:
+                item = self._ready.get(timeout=self._poll_interval)
+            except queue.Empty:
+                # Idle workers would otherwise expire from RQ's worker registry.
+                worker.heartbeat()
+                continue
+            if item is None:
+                return
+            job, origin = item
+            try:
+                worker.execute_job(job, origin)
+            except Exception:  # noqa: BLE001 - RQ already recorded the failure
+                logger.exception("Worker %s failed while handling job %s", worker.name, job.id)
+            finally:
+                self._hold(origin.name, -1)
+                self._slots.release()
+
+    def _drain(self, threads: Sequence[threading.Thread]) -> None:
+        requeued = 0
+        while True:
+            try:
+                item = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                job, origin = item
+                self._requeue(job, origin)
+                self._hold(origin.name, -1)
+                requeued += 1
+        if requeued:
+            logger.info("Returned %d prefetched jobs to their queues", requeued)
+
+        for _ in threads:
+            self._ready.put(None)
+        for thread in threads:
+            thread.join()
+        for worker in self._workers:
+            worker.register_death()
+
+    def _requeue(self, job: Job, origin: Queue) -> None:
+        with self._connection.pipeline() as pipeline:
+            pipeline.lrem(origin.intermediate_queue_key, 1, job.id)
+            origin.push_job_id(job.id, pipeline=pipeline, at_front=True)
+            pipeline.execute()
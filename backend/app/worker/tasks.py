@@ -1,11 +1,120 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
 
-from app.services.rag_pipeline import RagPipeline
+from rq import get_current_job
+
+from app.core.config import get_settings
+from app.core.database import session_scope
+from app.schemas.conversation import MessageResponse
+from app.services.conversation_service import ConversationService
+from app.services.document_ingestion import DocumentIngestionService
+from app.services.document_manifest import FileRecord
+from app.services.ingestion_jobs import ProgressReporter, cancel_key
+from app.services.rag_pipeline import RagPipeline, completion_text
+from app.services.registry import run_coroutine
+from app.services.response_cache import SemanticResponseCache
+from app.services.task_queue import check_deadline
+from app.services.token_stream import TokenStreamWriter
+
+
+def _pipeline() -> RagPipeline:
+    settings = get_settings()
+    cache = None
+    if settings.response_cache_enabled:
+        cache = SemanticResponseCache(get_current_job().connection, settings)
+    return RagPipeline(cache=cache)
 
 
 def process_chat(payload: Dict[str, Any]) -> Dict[str, Any]:
-    pipeline = RagPipeline()
-    result = pipeline.generate(payload["message"], payload.get("conversation_id"))
-    return result
+    job = get_current_job()
+    check_deadline(job)
+    pipeline = _pipeline()
+    # Runs on the process's shared loop so identical concurrent questions coalesce.
+    return run_coroutine(
+        pipeline.agenerate(
+            payload["message"], payload.get("conversation_id"), job.meta.get("deadline")
+        )
+    )
+
+
+def answer_chat(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """``process_chat`` for detached submissions: the job stores the assistant message."""
+
+    result = process_chat(payload)
+    conversation_id = payload["conversation_id"]
+    stored = run_coroutine(_store_answer(conversation_id, completion_text(result["response"])))
+    return {
+        **result,
+        "conversation_id": conversation_id,
+        "user_message": payload.get("user_message"),
+        "message": stored,
+    }
+
+
+async def _store_answer(conversation_id: str, content: str) -> Dict[str, Any]:
+    async with session_scope() as session:
+        message = await ConversationService(session).add_message(
+            uuid.UUID(conversation_id), "assistant", content
+        )
+        await session.commit()
+        return MessageResponse.model_validate(message).model_dump(mode="json")
+
+
+def stream_chat(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Relay a streamed completion token by token to ``payload["stream_key"]``.
+
+    The job stores the answer itself, so it is kept even when the client
+    stopped reading the stream.
+    """
+
+    job = get_current_job()
+    writer = TokenStreamWriter(job.connection, payload["stream_key"])
+    try:
+        check_deadline(job)
+        pipeline = _pipeline()
+        context, usage, tokens = pipeline.stream(
+            payload["message"], payload.get("conversation_id"), job.meta.get("deadline")
+        )
+        writer.publish("context", [item.model_dump() for item in context])
+        parts: List[str] = []
+        for token in tokens:
+            parts.append(token)
+            writer.publish("token", {"content": token})
+    except Exception as exc:
+        writer.publish("error", {"detail": str(exc)})
+        raise
+
+    response = "".join(parts)
+    stored = run_coroutine(_store_answer(payload["conversation_id"], response))
+    writer.publish("done", {"response": response, "usage": usage, "message": stored})
+    return {"response": response, "context": context, "usage": usage}
+
+
+def ingest_documents(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Index ``payload["path"]``, remove ``payload["delete"]``, or rescan the documents folder."""
+
+    job = get_current_job()
+    reporter = ProgressReporter(job)
+    service = DocumentIngestionService()
+    if payload.get("delete"):
+        results = [service.delete_document(Path(payload["delete"]))]
+    elif payload.get("path"):
+        upload = FileRecord(**payload["upload"]) if payload.get("upload") else None
+        results = [
+            service.ingest_file(
+                Path(payload["path"]), reporter.update, reporter.should_stop, upload
+            )
+        ]
+    else:
+        results = service.ingest_existing(reporter.update, reporter.should_stop)
+    reporter.flush()
+    cancelled = reporter.should_stop()
+    job.connection.delete(cancel_key(job.id))
+    return {
+        "results": [result.model_dump(mode="json") for result in results],
+        "progress": job.meta.get("progress"),
+        "cancelled": cancelled,
+    }
@@ -0,0 +1,90 @@
+"""Recall@k versus latency of the IVF index compared with exact search.
+
+Vectors are drawn from a Gaussian mixture so that, like real chunk embeddings,
+they form clusters. For each ``nprobe`` the harness reports recall@k against
+``exact_search`` and the p50/p99 per-query latency of both paths.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.ann_recall --size 100000 --nlist 256 --nprobe 1 4 16 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.vector_search import IvfIndex, exact_search
+from app.services.vector_storage import normalize_rows
+
+
+def _clustered_vectors(
+    rng: np.random.Generator,
+    centers: np.ndarray,
+    size: int,
+    spread: float,
+) -> np.ndarray:
+    labels = rng.integers(0, len(centers), size)
+    noise = rng.standard_normal((size, centers.shape[1])).astype(np.float32) * spread
+    return normalize_rows(centers[labels] + noise).astype(np.float32)
+
+
+def _percentiles(timings: list[float]) -> tuple[float, float]:
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=0.8, help="Noise relative to centers.")
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    centers = rng.standard_normal((args.clusters, args.dimension)).astype(np.float32)
+    vectors = _clustered_vectors(rng, centers, args.size, args.spread)
+    queries = _clustered_vectors(rng, centers, args.queries, args.spread)
+
+    exact_results = []
+    exact_timings = []
+    for query in queries:
+        started = time.perf_counter()
+        indices, _ = exact_search(vectors, query, args.k)
+        exact_timings.append((time.perf_counter() - started) * 1000)
+        exact_results.append(set(indices.tolist()))
+    exact_p50, exact_p99 = _percentiles(exact_timings)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = IvfIndex(Path(tmp_dir), nlist=args.nlist, nprobe=1)
+        started = time.perf_counter()
+        index.sync(vectors)
+        build_seconds = time.perf_counter() - started
+        print(f"IVF build over {args.size} vectors, nlist={args.nlist}: {build_seconds:.1f}s")
+        print(f"{'path':>10} {'recall@' + str(args.k):>10} {'p50 ms':>10} {'p99 ms':>10}")
+        print(f"{'exact':>10} {1.0:>10.3f} {exact_p50:>10.2f} {exact_p99:>10.2f}")
+
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            hits = 0
+            timings = []
+            for query, expected in zip(queries, exact_results, strict=True):
+                started = time.perf_counter()
+                indices, _ = index.search(vectors, query, args.k)
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += len(expected & set(indices.tolist()))
+            recall = hits / (len(queries) * args.k)
+            p50, p99 = _percentiles(timings)
+            print(f"{'ivf/' + str(nprobe):>10} {recall:>10.3f} {p50:>10.2f} {p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Postings size and per-query latency of the BM25 index behind hybrid retrieval.
+
+Chunks are synthetic: words drawn from a Zipf distribution over a generated
+vocabulary, with a few identifiers planted as in product docs. The corpus is
+split into segments of ``--segment-rows`` as the store writes it. For each
+query mix the harness reports mean and p99 latency of a top-``--k`` BM25
+search, and for reference the same for reciprocal-rank fusion with a ranking
+of equal depth. A query's cost follows the postings it reads, so identifiers
+and rare words take well under a millisecond while words found in most chunks
+(the synthetic corpus's stop words) take proportionally longer.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.lexical_search --size 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from app.services.lexical_index import LexicalView, SegmentPostings
+from app.services.vector_search import lexical_search, reciprocal_rank_fusion
+
+IDENTIFIERS = ["FlowAgentSecret", "ERR_TOKEN_EXPIRED", "X-Flow-Tenant", "HTTPError404"]
+
+
+def _word(idx: int) -> str:
+    # Letters only, so no word splits into identifier parts.
+    letters = []
+    while True:
+        idx, letter = divmod(idx, 26)
+        letters.append(chr(ord("a") + letter))
+        if not idx:
+            return "x" + "".join(letters)
+
+
+def _corpus(rng: np.random.Generator, size: int, vocabulary: int, words: int) -> List[str]:
+    terms = np.array([_word(idx) for idx in range(vocabulary)])
+    ranks = np.minimum(rng.zipf(1.2, (size, words)), vocabulary) - 1
+    texts = [" ".join(terms[row]) for row in ranks]
+    for idx in rng.choice(size, size // 500, replace=False):
+        texts[idx] += " " + IDENTIFIERS[idx % len(IDENTIFIERS)]
+    return texts
+
+
+def _time(search: Callable[[str], object], queries: List[str]) -> str:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - started)
+    ms = np.array(timings) * 1000
+    return f"{ms.mean():>9.3f} {np.percentile(ms, 99):>9.3f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--segment-rows", type=int, default=50_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--words", type=int, default=120, help="Words per chunk.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    texts = _corpus(rng, args.size, args.vocabulary, args.words)
+    started = time.perf_counter()
+    view = LexicalView(
+        [
+            SegmentPostings.build(texts[start : start + args.segment_rows])
+            for start in range(0, args.size, args.segment_rows)
+        ]
+    )
+    built = time.perf_counter() - started
+    print(f"{args.size} chunks, {args.words} words each, built in {built:.1f}s")
+    print(f"postings: {view.nbytes / 2**20:.1f} MB ({view.nbytes / args.size:.0f} B/chunk)")
+
+    mixes = {
+        "identifier": [IDENTIFIERS[idx % len(IDENTIFIERS)] for idx in range(args.queries)],
+        "rare words": [
+            f"{_word(a)} {_word(b)}"
+            for a, b in rng.integers(1000, args.vocabulary, (args.queries, 2))
+        ],
+        "common words": [
+            " ".join(_word(idx) for idx in row) for row in rng.integers(0, 20, (args.queries, 3))
+        ],
+    }
+    vector_ranking = rng.choice(args.size, args.k, replace=False)
+    print(f"{'queries':>14} {'path':>8} {'mean ms':>9} {'p99 ms':>9}")
+    for name, queries in mixes.items():
+        bm25 = _time(lambda query: lexical_search(view, query, args.k), queries)
+        print(f"{name:>14} {'bm25':>8} {bm25}")
+
+        def _hybrid(query: str) -> object:
+            found, _ = lexical_search(view, query, args.k)
+            return reciprocal_rank_fusion([vector_ranking, found], args.k)
+
+        print(f"{name:>14} {'+rrf':>8} {_time(_hybrid, queries)}")
+
+
+if __name__ == "__main__":
+    main()
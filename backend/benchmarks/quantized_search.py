@@ -0,0 +1,102 @@
+"""Memory, QPS and recall@k of quantized flat search compared with float32.
+
+Vectors are clustered as in ``ann_recall``. For each path the harness reports
+the bytes the first pass scans per query (the float32 matrix or the codes),
+queries per second, and recall@k against exact float32 search. The quantized
+paths are measured twice: ranking by the codes alone, and rescoring the best
+``--candidates`` rows from the float32 matrix as ``VECTOR_QUANTIZATION`` does.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.quantized_search --size 200000 --candidates 16 64 256
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List, Set, Tuple
+
+import numpy as np
+
+from app.services.vector_quantization import QuantizedVectors, QuantizedView
+from app.services.vector_search import exact_search, rescored_search
+from app.services.vector_storage import normalize_rows
+
+Search = Callable[[np.ndarray], np.ndarray]
+
+
+def _clustered_vectors(
+    rng: np.random.Generator,
+    centers: np.ndarray,
+    size: int,
+    spread: float,
+) -> np.ndarray:
+    labels = rng.integers(0, len(centers), size)
+    noise = rng.standard_normal((size, centers.shape[1])).astype(np.float32) * spread
+    return normalize_rows(centers[labels] + noise).astype(np.float32)
+
+
+def _run(search: Search, queries: np.ndarray) -> Tuple[List[Set[int]], float]:
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        results.append(set(search(query).tolist()))
+    return results, len(queries) / (time.perf_counter() - started)
+
+
+def _row(label: str, nbytes: int, size: int, qps: float, recall: float) -> None:
+    print(f"{label:>18} {nbytes / 2**20:>11.1f} {nbytes / size:>9.0f} {qps:>9.1f} {recall:>9.3f}")
+
+
+def _recall(found: List[Set[int]], expected: List[Set[int]], k: int) -> float:
+    hits = sum(len(a & b) for a, b in zip(found, expected, strict=True))
+    return hits / (len(expected) * k)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=0.8, help="Noise relative to centers.")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    centers = rng.standard_normal((args.clusters, args.dimension)).astype(np.float32)
+    vectors = _clustered_vectors(rng, centers, args.size, args.spread)
+    queries = _clustered_vectors(rng, centers, args.queries, args.spread)
+    k = args.k
+
+    expected, qps = _run(lambda query: exact_search(vectors, query, k)[0], queries)
+    header = f"{'path':>18} {'MB scanned':>11} {'B/vector':>9} {'QPS':>9} {'recall@' + str(k):>9}"
+    print(f"{args.size} vectors, dimension {args.dimension}")
+    print(header)
+    _row("float32", vectors.nbytes, args.size, qps, 1.0)
+
+    for mode in ("float16", "int8"):
+        codes = QuantizedView([QuantizedVectors.encode(vectors, mode)])
+
+        def _codes_only(query: np.ndarray, codes: QuantizedView = codes) -> np.ndarray:
+            return exact_search(codes, query, k)[0]
+
+        found, qps = _run(_codes_only, queries)
+        _row(mode, codes.nbytes, args.size, qps, _recall(found, expected, k))
+
+        for candidates in args.candidates:
+
+            def _rescored(
+                query: np.ndarray, codes: QuantizedView = codes, candidates: int = candidates
+            ) -> np.ndarray:
+                return rescored_search(codes, vectors, query, k, candidates)[0]
+
+            found, qps = _run(_rescored, queries)
+            label = f"{mode}+rescore/{candidates}"
+            _row(label, codes.nbytes, args.size, qps, _recall(found, expected, k))
+
+
+if __name__ == "__main__":
+    main()
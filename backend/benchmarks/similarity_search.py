@@ -0,0 +1,137 @@
+"""Per-query latency of EmbeddingStore similarity search, against the original loop.
+
+Each size gets a real ``EmbeddingStore`` in a temporary directory, filled in
+segments of ``--segment-rows`` chunks as ingestion writes them. A fake embedder
+serves pre-generated random vectors, so model inference is excluded and the
+timings cover the store: ``vector`` is ``search_by_vector`` with a normalized
+query, ``query`` is ``similarity_search`` including the manifest refresh check.
+``legacy`` is the original implementation for reference: rebuild a float32
+matrix from Python lists, recompute every norm and fully argsort the scores.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.similarity_search --sizes 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+from langchain.schema import Document
+
+from app.core.config import Settings
+from app.services.embedding_store import EmbeddingStore
+
+
+class _FakeEmbeddings:
+    """Returns row ``i`` of a fixed matrix for the text ``"chunk i"`` or ``"query i"``."""
+
+    def __init__(self, chunks: np.ndarray, queries: np.ndarray):
+        self._chunks = chunks
+        self._queries = queries
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self._chunks[[int(text.split()[1]) for text in texts]]
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._queries[int(text.split()[1])]
+
+
+def _legacy_search(vectors: List[List[float]], query: np.ndarray, k: int) -> np.ndarray:
+    vector_matrix = np.array(vectors, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    document_norms = np.linalg.norm(vector_matrix, axis=1)
+    denom = document_norms * query_norm
+    denom[denom == 0] = 1e-12
+    similarities = vector_matrix @ query / denom
+    return np.argsort(similarities)[::-1][:k]
+
+
+def _measure(search: Callable[[int], object], queries: int) -> tuple[float, float]:
+    timings = []
+    for idx in range(queries):
+        started = time.perf_counter()
+        search(idx)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+def _build_store(
+    path: Path, embeddings: _FakeEmbeddings, size: int, segment_rows: int
+) -> EmbeddingStore:
+    settings = Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        vector_store_path=path,
+        # Compaction would rewrite segments in the background while timing.
+        segment_compaction_trigger=size // segment_rows + 2,
+    )
+    store = EmbeddingStore(settings=settings, embeddings=embeddings)  # type: ignore[arg-type]
+    for start in range(0, size, segment_rows):
+        store.add_chunks(
+            [
+                Document(page_content=f"chunk {idx}", metadata={"source": f"doc-{idx // 100}"})
+                for idx in range(start, min(start + segment_rows, size))
+            ]
+        )
+    return store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--segment-rows", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=100_000,
+        help="Skip the list-based path above this many chunks (it needs ~12 GB at 1M).",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"{'chunks':>10} {'path':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    for size in args.sizes:
+        raw = rng.standard_normal((size, args.dimension)).astype(np.float32)
+
+        if size <= args.legacy_limit:
+            vectors = raw.tolist()
+            legacy = _measure(
+                lambda idx, vectors=vectors: _legacy_search(vectors, queries[idx], args.k),
+                args.queries,
+            )
+            print(f"{size:>10} {'legacy':>8} {legacy[0]:>10.2f} {legacy[1]:>10.2f}")
+            del vectors
+        else:
+            print(f"{size:>10} {'legacy':>8} {'skipped':>10} {'skipped':>10}")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = _build_store(
+                Path(tmp_dir), _FakeEmbeddings(raw, queries), size, args.segment_rows
+            )
+            by_vector = _measure(
+                lambda idx, store=store: store.search_by_vector(normalized[idx], args.k),
+                args.queries,
+            )
+            print(f"{size:>10} {'vector':>8} {by_vector[0]:>10.2f} {by_vector[1]:>10.2f}")
+            by_query = _measure(
+                lambda idx, store=store: store.similarity_search(f"query {idx}", args.k),
+                args.queries,
+            )
+            print(f"{size:>10} {'query':>8} {by_query[0]:>10.2f} {by_query[1]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
 
-from app.schemas.chat import ChatRequest, ChatResponse
+from app.schemas.chat import ChatJobAccepted, ChatJobStatus, ChatRequest, ChatResponse
+from app.services.admission import AdmissionRejectedError
 from app.services.chat_service import ChatService
 
 
@@ -9,15 +10,60 @@ def test_chat_completion_returns_assistant_message(
     client: TestClient,
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    def _fake_process(self: ChatService, request: ChatRequest) -> ChatResponse:  # noqa: ANN001
+    async def _fake_process(self: ChatService, request: ChatRequest) -> ChatResponse:  # noqa: ANN001
         return ChatResponse(conversation_id="123", response=f"Echo: {request.message}")
 
-    monkeypatch.setattr(ChatService, "process", _fake_process, raising=False)
+    monkeypatch.setattr(ChatService, "aprocess", _fake_process, raising=False)
 
-    payload = ChatRequest(message="Hello")
+    payload = ChatRequest(message="Hello", nickname="tester")
 
-    response = client.post("/api/chat/completions", json=payload.dict())
+    response = client.post("/api/chat/completions", json=payload.model_dump())
 
     assert response.status_code == 200
     data = response.json()
     assert data["response"].startswith("Echo")
+
+
+def test_chat_job_is_accepted_then_polled(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def _fake_submit(self: ChatService, request: ChatRequest) -> ChatJobAccepted:
+        return ChatJobAccepted(job_id="job-1", conversation_id="123", status="queued")
+
+    async def _fake_status(
+        self: ChatService, job_id: str, include_history: bool = False
+    ) -> ChatJobStatus:
+        if job_id != "job-1":
+            raise ValueError(f"Job {job_id} not found")
+        result = ChatResponse(conversation_id="123", response="Echo")
+        return ChatJobStatus(job_id=job_id, status="finished", result=result)
+
+    monkeypatch.setattr(ChatService, "submit", _fake_submit)
+    monkeypatch.setattr(ChatService, "job_status", _fake_status)
+
+    payload = ChatRequest(message="Hello", nickname="tester")
+    accepted = client.post("/api/chat/jobs", json=payload.model_dump())
+
+    assert accepted.status_code == 202
+    assert accepted.headers["location"] == "/api/chat/jobs/job-1"
+
+    finished = client.get("/api/chat/jobs/job-1")
+    assert finished.json()["result"]["response"] == "Echo"
+    assert client.get("/api/chat/jobs/missing").status_code == 404
+
+
+def test_chat_completion_rejected_with_retry_after(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def _overloaded(self: ChatService, request: ChatRequest) -> ChatResponse:
+        raise AdmissionRejectedError(503, "The chat queue is too long to answer in time", 11.2)
+
+    monkeypatch.setattr(ChatService, "aprocess", _overloaded)
+
+    payload = ChatRequest(message="Hello", nickname="tester")
+    response = client.post("/api/chat/completions", json=payload.model_dump())
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "12"
@@ -0,0 +1,40 @@
+import json
+from typing import AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.schemas.chat import ChatRequest
+from app.services.chat_service import ChatService, StreamEvent
+
+
+def test_stream_completion_emits_server_sent_events(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def _events(request: ChatRequest) -> AsyncIterator[StreamEvent]:
+        yield "meta", {"conversation_id": "123"}
+        for token in request.message.split():
+            yield "token", {"content": token}
+        yield "done", {"conversation_id": "123", "message": None}
+
+    async def _fake_stream(self: ChatService, request: ChatRequest) -> AsyncIterator[StreamEvent]:
+        return _events(request)
+
+    monkeypatch.setattr(ChatService, "stream", _fake_stream)
+
+    payload = ChatRequest(message="Hello there", nickname="tester")
+    url = "/api/chat/completions/stream"
+    with client.stream("POST", url, json=payload.model_dump()) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        blocks = [block for block in response.read().decode().split("\n\n") if block]
+
+    events = [block.split("\n") for block in blocks]
+    assert [lines[0] for lines in events] == [
+        "event: meta",
+        "event: token",
+        "event: token",
+        "event: done",
+    ]
+    assert json.loads(events[1][1][len("data: ") :]) == {"content": "Hello"}
@@ -6,19 +6,25 @@ from app.core.database import session_scope
 from app.services.conversation_service import ConversationService
 
 
-def _seed_conversation(nickname: str) -> UUID:
-    with session_scope() as session:
+async def _seed(nickname: str, *contents: str) -> UUID:
+    async with session_scope() as session:
         service = ConversationService(session)
-        conversation = service.create(nickname=nickname)
-        service.add_message(conversation.id, "user", "Hello there")
-        service.add_message(conversation.id, "assistant", "Hi! How can I help?")
-        session.commit()
+        conversation = await service.create(nickname=nickname)
+        for index, content in enumerate(contents):
+            role = "assistant" if index % 2 else "user"
+            await service.add_message(conversation.id, role, content)
+            await session.commit()
         return conversation.id
 
 
+def _seed_conversation(client: TestClient, nickname: str) -> UUID:
+    # Seeds on the app's event loop, which owns the engine the requests use.
+    return client.portal.call(_seed, nickname, "Hello there", "Hi! How can I help?")
+
+
 def test_list_conversations_returns_user_conversations(client: TestClient) -> None:
     nickname = "alice"
-    conversation_id = _seed_conversation(nickname)
+    conversation_id = _seed_conversation(client, nickname)
 
     response = client.get("/api/conversations", params={"nickname": nickname})
 
@@ -31,7 +37,7 @@ def test_list_conversations_returns_user_conversations(client: TestClient) -> No
 
 def test_get_conversation_returns_messages(client: TestClient) -> None:
     nickname = "bob"
-    conversation_id = _seed_conversation(nickname)
+    conversation_id = _seed_conversation(client, nickname)
 
     response = client.get(f"/api/conversations/{conversation_id}", params={"nickname": nickname})
 
@@ -40,4 +46,51 @@ def test_get_conversation_returns_messages(client: TestClient) -> None:
     assert payload["id"] == str(conversation_id)
     assert len(payload["messages"]) == 2
     assert payload["messages"][0]["role"] == "user"
-    assert payload["messages"][1]["role"] == "assistant"
\ No newline at end of file
+    assert payload["messages"][1]["role"] == "assistant"
+
+
+def test_list_conversations_pages_with_cursor_and_previews(client: TestClient) -> None:
+    nickname = "carol"
+    seeded = {_seed_conversation(client, nickname) for _ in range(3)}
+
+    first = client.get("/api/conversations", params={"nickname": nickname, "limit": 2})
+    cursor = first.headers["x-next-cursor"]
+    second = client.get(
+        "/api/conversations", params={"nickname": nickname, "limit": 2, "cursor": cursor}
+    )
+
+    assert "x-next-cursor" not in second.headers
+    items = first.json() + second.json()
+    assert {item["id"] for item in items} == {str(conversation_id) for conversation_id in seeded}
+    assert items[0]["updated_at"] >= items[-1]["updated_at"]
+    assert items[0]["last_message_preview"] == "Hi! How can I help?"
+    assert items[0]["message_count"] == 2
+
+
+def test_list_conversations_rejects_malformed_cursor(client: TestClient) -> None:
+    response = client.get("/api/conversations", params={"nickname": "dave", "cursor": "nope"})
+
+    assert response.status_code == 400
+
+
+def test_get_conversation_pages_messages_by_cursor(client: TestClient) -> None:
+    nickname = "erin"
+    conversation_id = client.portal.call(_seed, nickname, *(f"message {i}" for i in range(5)))
+
+    url = f"/api/conversations/{conversation_id}"
+    latest = client.get(url, params={"nickname": nickname, "limit": 2})
+    cursor = latest.headers["x-next-cursor"]
+    earlier = client.get(url, params={"nickname": nickname, "limit": 2, "before": cursor})
+    newer = client.get(
+        url, params={"nickname": nickname, "since": earlier.json()["messages"][0]["id"]}
+    )
+
+    assert latest.json()["message_count"] == 5
+    assert [m["content"] for m in latest.json()["messages"]] == ["message 3", "message 4"]
+    assert [m["content"] for m in earlier.json()["messages"]] == ["message 1", "message 2"]
+    assert [m["content"] for m in newer.json()["messages"]] == [
+        "message 2",
+        "message 3",
+        "message 4",
+    ]
+    assert "x-next-cursor" not in newer.headers
@@ -1,8 +1,64 @@
+import pytest
 from fastapi.testclient import TestClient
 
+from app.schemas.document import IngestionJobAccepted, IngestionJobProgress, IngestionJobStatus
+from app.services.ingestion_jobs import IngestionJobs
+
+
+def test_ingest_existing_documents_returns_accepted(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def _fake_submit(self: IngestionJobs) -> IngestionJobAccepted:
+        return IngestionJobAccepted(job_id="ingest-1", status="queued")
+
+    def _fake_status(self: IngestionJobs, job_id: str) -> IngestionJobStatus:
+        if job_id != "ingest-1":
+            raise ValueError(f"Job {job_id} not found")
+        progress = IngestionJobProgress(files_total=4, files_parsed=1, eta_seconds=6.0)
+        return IngestionJobStatus(job_id=job_id, status="started", progress=progress)
+
+    monkeypatch.setattr(IngestionJobs, "submit_existing", _fake_submit)
+    monkeypatch.setattr(IngestionJobs, "status", _fake_status)
 
-def test_ingest_existing_documents_returns_accepted(client: TestClient) -> None:
     response = client.post("/api/documents/ingest")
+
     assert response.status_code == 202
-    body = response.json()
-    assert isinstance(body, list)
+    assert response.headers["location"] == "/api/documents/jobs/ingest-1"
+    job = client.get("/api/documents/jobs/ingest-1").json()
+    assert job["progress"]["files_parsed"] == 1
+    assert client.get("/api/documents/jobs/missing").status_code == 404
+
+
+def test_upload_rejects_unsupported_file_type(client: TestClient) -> None:
+    files = {"file": ("malware.exe", b"MZ", "application/octet-stream")}
+
+    response = client.post("/api/documents/upload", files=files)
+
+    assert response.status_code == 400
+
+
+def test_delete_document_queues_removal(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def _fake_delete(self: IngestionJobs, filename: str) -> IngestionJobAccepted:
+        if filename != "guide.md":
+            raise ValueError(f"Document {filename} not found")
+        return IngestionJobAccepted(job_id="delete-1", status="queued", document_id="guide")
+
+    monkeypatch.setattr(IngestionJobs, "submit_delete", _fake_delete)
+
+    response = client.delete("/api/documents/guide.md")
+
+    assert response.status_code == 202
+    assert response.headers["location"] == "/api/documents/jobs/delete-1"
+    assert client.delete("/api/documents/other.md").status_code == 404
+
+
+def test_replace_rejects_unsupported_file_name(client: TestClient) -> None:
+    files = {"file": ("guide.md", b"# Guide", "text/markdown")}
+
+    response = client.put("/api/documents/guide.exe", files=files)
+
+    assert response.status_code == 400
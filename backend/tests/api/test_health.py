@@ -5,3 +5,12 @@ def test_health_endpoint(client: TestClient) -> None:
     response = client.get("/api/health/ping")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_redis_pool_stats_endpoint(client: TestClient) -> None:
+    response = client.get("/api/health/redis")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["in_use"] == 0
+    assert stats["waits"] == 0
+    assert stats["idle"] <= stats["max_connections"]
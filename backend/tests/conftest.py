@@ -4,21 +4,24 @@ from pathlib import Path
 import pytest
 from fastapi.testclient import TestClient
 
-from app.main import app
+# Settings are read when the app is imported, so the test environment comes first.
+TEST_DOCUMENTS = Path("tests/test_documents")
+TEST_DB = Path("tests/test.db")
+os.environ.setdefault("DOCUMENTS_PATH", str(TEST_DOCUMENTS.resolve()))
+os.environ.setdefault("VECTOR_STORE_PATH", str((TEST_DOCUMENTS / "vector").resolve()))
+os.environ.setdefault("FLOW_AGENT", "test-agent")
+os.environ.setdefault("FLOW_TENANT", "test-tenant")
+os.environ.setdefault("FLOW_AGENT_SECRET", "secret")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DB.as_posix()}")
+os.environ.setdefault("DATABASE_ROUND_TRIPS", "true")
+
+from app.main import app  # noqa: E402
 
 
 def pytest_configure(config: pytest.Config) -> None:  # noqa: ARG001
-    test_documents = Path("tests/test_documents")
-    test_documents.mkdir(parents=True, exist_ok=True)
-    os.environ.setdefault("DOCUMENTS_PATH", str(test_documents.resolve()))
-    os.environ.setdefault("VECTOR_STORE_PATH", str((test_documents / "vector").resolve()))
-    os.environ.setdefault("FLOW_AGENT", "test-agent")
-    os.environ.setdefault("FLOW_TENANT", "test-tenant")
-    os.environ.setdefault("FLOW_AGENT_SECRET", "secret")
-    test_db = Path("tests/test.db")
-    if test_db.exists():
-        test_db.unlink()
-    os.environ.setdefault("DATABASE_URL", f"sqlite:///{test_db.as_posix()}")
+    TEST_DOCUMENTS.mkdir(parents=True, exist_ok=True)
+    if TEST_DB.exists():
+        TEST_DB.unlink()
 
 
 @pytest.fixture()
@@ -0,0 +1,21 @@
+import asyncio
+
+from app.core.config import Settings
+from app.core.redis import RedisRegistry
+
+
+def test_blocking_waits_have_their_own_pool() -> None:
+    settings = Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        redis_pool_size=3,
+        redis_wait_pool_size=7,
+    )
+    registry = RedisRegistry(settings)
+
+    assert registry.stats()["max_connections"] == 3
+    waits = registry.async_connection.connection_pool
+    assert waits is not registry.connection.connection_pool
+    assert waits.max_connections == 7
+    asyncio.run(registry.aclose())
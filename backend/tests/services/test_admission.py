@@ -0,0 +1,77 @@
+from typing import Any, List
+
+import pytest
+from rq import Queue
+
+from app.core.config import get_settings
+from app.services.admission import AdmissionController, AdmissionRejectedError
+
+
+class _FakePipeline:
+    """Answers the estimate's four reads in order."""
+
+    def __init__(self, replies: List[Any]) -> None:
+        self._replies = replies
+
+    def __getattr__(self, name: str) -> Any:
+        return lambda *args, **kwargs: self
+
+    def execute(self) -> List[Any]:
+        return self._replies
+
+
+class _FakeConnection:
+    def __init__(self, queued: int, running: int, workers: int, samples: List[bytes]) -> None:
+        self._replies = [queued, running, workers, samples]
+
+    def pipeline(self, transaction: bool = True) -> _FakePipeline:
+        return _FakePipeline(self._replies)
+
+
+class _FakeLimiter:
+    def __init__(self, wait: float = 0.0) -> None:
+        self.wait = wait
+        self.calls: List[str] = []
+
+    def acquire(self, nickname: str) -> float:
+        self.calls.append(nickname)
+        return self.wait
+
+
+def _controller(connection: _FakeConnection, limiter: _FakeLimiter) -> AdmissionController:
+    queue = Queue("chat", connection=connection)  # type: ignore[arg-type]
+    return AdmissionController(connection, queue, get_settings(), limiter)  # type: ignore[arg-type]
+
+
+def test_estimate_spreads_queued_jobs_over_workers() -> None:
+    connection = _FakeConnection(queued=7, running=4, workers=4, samples=[b"2.0", b"4.0"])
+
+    estimate = _controller(connection, _FakeLimiter()).estimate()
+
+    assert estimate.mean_job_seconds == 3.0
+    assert estimate.wait_seconds == 9.0
+
+
+def test_admit_rejects_when_queue_wait_exceeds_deadline() -> None:
+    deadline = get_settings().chat_deadline_seconds
+    connection = _FakeConnection(queued=99, running=1, workers=1, samples=[b"1.0"])
+    limiter = _FakeLimiter()
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        _controller(connection, limiter).admit("ana")
+
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after == 101 - deadline
+    # Overloaded requests do not spend the caller's rate-limit tokens.
+    assert limiter.calls == []
+
+
+def test_admit_applies_rate_limit_to_detached_jobs_only() -> None:
+    connection = _FakeConnection(queued=99, running=1, workers=0, samples=[])
+    limiter = _FakeLimiter(wait=2.4)
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        _controller(connection, limiter).admit("ana", interactive=False)
+
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after == 3
@@ -0,0 +1,109 @@
+import asyncio
+from typing import Any, Tuple
+
+import pytest
+
+from app.core.database import count_round_trips, dispose_engine, init_db, session_scope
+from app.schemas.chat import ChatRequest, ChatResponse
+from app.services.admission import AdmissionRejectedError
+from app.services.chat_service import ChatService
+from app.services.conversation_service import ConversationService
+from app.services.task_queue import TaskResult
+
+
+class _FakeQueue:
+    """Answers every chat job at once."""
+
+    def enqueue(self, *args: Any, **kwargs: Any) -> TaskResult:
+        return TaskResult(status="queued", payload=None, job_id="job-1")
+
+    async def await_result(self, job_id: str, timeout: int = 30) -> TaskResult:
+        response = {"choices": [{"message": {"content": "Hi there"}}]}
+        payload = {"response": response, "context": [], "usage": {}}
+        return TaskResult(status="finished", payload=payload, job_id=job_id)
+
+
+async def _turn(request: ChatRequest) -> Tuple[ChatResponse, int]:
+    async with session_scope() as session:
+        with count_round_trips() as round_trips:
+            service = ChatService(session, queue=_FakeQueue())  # type: ignore[arg-type]
+            response = await service.aprocess(request)
+    return response, round_trips.count
+
+
+def test_chat_turn_commits_the_question_then_the_answer() -> None:
+    async def _run() -> Tuple[int, int, Any]:
+        await init_db()
+        first, new_trips = await _turn(ChatRequest(message="Hello", nickname="turns"))
+        _, existing_trips = await _turn(
+            ChatRequest(message="Again", nickname="turns", conversation_id=first.conversation_id)
+        )
+        async with session_scope() as session:
+            service = ConversationService(session)
+            conversations, _ = await service.list_for_nickname("turns")
+        await dispose_engine()
+        return new_trips, existing_trips, conversations
+
+    new_trips, existing_trips, conversations = asyncio.run(_run())
+
+    # The question's inserts and commit, then the answer's insert, UPDATE and commit;
+    # an existing chat adds its lookup, and its question also updates the row.
+    assert new_trips == 6
+    assert existing_trips == 7
+    assert [(c.title, c.message_count, c.last_message_preview) for c in conversations] == [
+        ("Hello", 4, "Hi there")
+    ]
+
+
+class _TimedOutQueue(_FakeQueue):
+    async def await_result(self, job_id: str, timeout: int = 30) -> TaskResult:
+        raise TimeoutError("Timed out waiting for job")
+
+
+def test_question_is_kept_when_the_answer_times_out() -> None:
+    async def _run() -> Any:
+        await init_db()
+        async with session_scope() as session:
+            service = ChatService(session, queue=_TimedOutQueue())  # type: ignore[arg-type]
+            with pytest.raises(TimeoutError):
+                await service.aprocess(ChatRequest(message="Lost?", nickname="timeouts"))
+        async with session_scope() as session:
+            conversations = ConversationService(session)
+            (conversation,), _ = await conversations.list_for_nickname("timeouts")
+            messages = await conversations.list_messages(conversation.id)
+        await dispose_engine()
+        return messages
+
+    messages = asyncio.run(_run())
+
+    assert [(message.role, message.content) for message in messages] == [("user", "Lost?")]
+
+
+class _FullAdmission:
+    def admit(self, nickname: str, interactive: bool = True) -> None:
+        raise AdmissionRejectedError(503, "Chat queue is full", retry_after=5)
+
+
+def test_rejected_chat_writes_nothing() -> None:
+    async def _run() -> Tuple[int, Any]:
+        await init_db()
+        async with session_scope() as session:
+            with count_round_trips() as round_trips:
+                service = ChatService(
+                    session,
+                    queue=_FakeQueue(),  # type: ignore[arg-type]
+                    admission=_FullAdmission(),  # type: ignore[arg-type]
+                )
+                with pytest.raises(AdmissionRejectedError):
+                    await service.aprocess(ChatRequest(message="Busy?", nickname="rejected"))
+                with pytest.raises(AdmissionRejectedError):
+                    await service.stream(ChatRequest(message="Busy?", nickname="rejected"))
+        async with session_scope() as session:
+            conversations, _ = await ConversationService(session).list_for_nickname("rejected")
+        await dispose_engine()
+        return round_trips.count, conversations
+
+    trips, conversations = asyncio.run(_run())
+
+    assert trips == 0
+    assert conversations == []
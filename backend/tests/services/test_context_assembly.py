@@ -0,0 +1,124 @@
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+from app.core.config import Settings
+from app.services import context_assembly
+from app.services.context_assembly import (
+    ContextAssembler,
+    TokenCounter,
+    get_token_counter,
+    load_token_counter,
+    merge_overlapping,
+    mmr_select,
+)
+from app.services.vector_storage import normalize_rows
+
+TEXT = "".join(f"sentence {idx} about Flow agents and tenants. " for idx in range(60))
+
+
+def _chunk(start: int, end: int, score: float, offsets: bool = True) -> Document:
+    metadata = {"source": "guide.md", "chunk_id": f"c{start}", "score": score}
+    if offsets:
+        metadata["start_index"] = start
+    return Document(page_content=TEXT[start:end], metadata=metadata)
+
+
+def _settings(**overrides: object) -> Settings:
+    return Settings(
+        flow_agent="agent", flow_tenant="tenant", flow_agent_secret="secret", **overrides
+    )
+
+
+def test_merges_overlapping_and_adjacent_chunks_by_offset() -> None:
+    chunks = [_chunk(0, 800, 0.9), _chunk(600, 1400, 0.8), _chunk(1400, 1700, 0.7)]
+
+    merged = merge_overlapping(chunks, max_overlap=200)
+
+    assert len(merged) == 1
+    assert merged[0].page_content == TEXT[0:1700]
+    assert merged[0].metadata["chunk_ids"] == ["c0", "c600", "c1400"]
+    assert merged[0].metadata["score"] == 0.9
+
+
+def test_merges_overlap_by_text_when_offsets_are_missing() -> None:
+    chunks = [_chunk(600, 1400, 0.9, offsets=False), _chunk(0, 800, 0.8, offsets=False)]
+
+    merged = merge_overlapping(chunks, max_overlap=200)
+
+    assert [doc.page_content for doc in merged] == [TEXT[0:1400]]
+
+
+def test_keeps_distant_chunks_apart() -> None:
+    merged = merge_overlapping([_chunk(0, 300, 0.9), _chunk(900, 1200, 0.8)], max_overlap=200)
+
+    assert len(merged) == 2
+
+
+def test_mmr_skips_near_duplicates() -> None:
+    vectors = normalize_rows(
+        np.array([[1.0, 0.0, 0.0], [0.99, 0.01, 0.0], [0.7, 0.0, 0.7]], dtype=np.float32)
+    )
+    query = normalize_rows(np.array([[1.0, 0.0, 0.2]], dtype=np.float32))[0]
+
+    assert mmr_select(query, vectors, k=2, lambda_mult=0.5) == [0, 2]
+    assert mmr_select(query, vectors, k=2, lambda_mult=1.0) == [0, 1]
+
+
+def test_assembly_reports_savings_apart_from_budget_drops() -> None:
+    chunks = [_chunk(0, 800, 0.9), _chunk(600, 1400, 0.8)]
+    vectors = normalize_rows(np.array([[1.0, 0.0], [0.9, 0.1]], dtype=np.float32))
+    query = vectors[0]
+
+    assembled = ContextAssembler(_settings(context_mmr_lambda=1.0)).assemble(query, chunks, vectors)
+    assert assembled.chunk_ids == ["c0", "c600"]
+    assert assembled.tokens_saved > 0
+    assert assembled.tokens_dropped == 0
+
+    tight = ContextAssembler(_settings(context_token_budget=50)).assemble(query, chunks, vectors)
+    assert tight.context_tokens <= 50
+    assert len(tight.documents) == 1
+    # Trimming to the budget is reported apart from the overlap merging removed.
+    assert tight.tokens_saved == assembled.tokens_saved
+    assert tight.tokens_dropped == assembled.context_tokens - tight.context_tokens
+
+
+def test_hybrid_rank_scores_override_cosine_relevance() -> None:
+    lexical_hit = _chunk(900, 1200, 0.2)
+    lexical_hit.metadata["rank_score"] = 2 / 61
+    semantic_hit = _chunk(0, 300, 0.9)
+    semantic_hit.metadata["rank_score"] = 1 / 61
+    vectors = normalize_rows(np.array([[0.2, 1.0], [1.0, 0.0]], dtype=np.float32))
+
+    assembled = ContextAssembler(_settings(context_mmr_lambda=1.0, context_top_k=1)).assemble(
+        vectors[1], [lexical_hit, semantic_hit], vectors
+    )
+    assert assembled.chunk_ids == ["c900"]
+
+
+def test_only_warm_up_loads_the_tokenizer(monkeypatch: pytest.MonkeyPatch) -> None:
+    fetched = []
+
+    class _Encoding:
+        def encode(self, text: str, disallowed_special: object) -> list:
+            return text.split()
+
+    def _get_encoding(name: str) -> _Encoding:
+        fetched.append(name)
+        return _Encoding()
+
+    monkeypatch.setitem(sys.modules, "tiktoken", SimpleNamespace(get_encoding=_get_encoding))
+    monkeypatch.setattr(context_assembly, "_counters", {})
+
+    # A request before warm-up estimates instead of fetching the encoding.
+    assert get_token_counter("test-encoding").count("one two three") == 4
+    assert fetched == []
+
+    load_token_counter("test-encoding")
+    load_token_counter("test-encoding")
+    assert fetched == ["test-encoding"]
+    assert get_token_counter("test-encoding").count("one two three") == 3
+    assert TokenCounter(None).count("one two three") == 4
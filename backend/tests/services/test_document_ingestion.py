@@ -0,0 +1,139 @@
+import fcntl
+import os
+from pathlib import Path
+from typing import List, Sequence
+
+import pytest
+from langchain.schema import Document
+
+from app.core.config import Settings
+from app.services import document_ingestion
+from app.services.document_ingestion import DocumentIngestionService
+from app.services.document_loader import DocumentLoaderService
+from app.services.document_manifest import DocumentManifest, FileRecord
+
+
+class _RecordingStore:
+    def __init__(self) -> None:
+        self.sources: List[str] = []
+
+    def add_chunks(self, chunks: Sequence[Document], replaces: Sequence[Path] = ()) -> int:
+        for source in replaces:
+            self.delete_document(source)
+        self.sources.extend(chunk.metadata["source"] for chunk in chunks)
+        return len(chunks)
+
+    def delete_document(self, source: Path) -> int:
+        kept = [item for item in self.sources if item != str(source)]
+        removed = len(self.sources) - len(kept)
+        self.sources = kept
+        return removed
+
+
+def _service(tmp_path: Path) -> tuple[DocumentIngestionService, _RecordingStore, Path]:
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    settings = Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        documents_path=documents,
+        vector_store_path=tmp_path / "vector",
+    )
+    store = _RecordingStore()
+    service = DocumentIngestionService(
+        loader=DocumentLoaderService(settings),
+        store=store,  # type: ignore[arg-type]
+        settings=settings,
+    )
+    return service, store, documents
+
+
+def test_ingest_existing_only_indexes_new_or_changed_files(tmp_path: Path) -> None:
+    service, store, documents = _service(tmp_path)
+    (documents / "a.txt").write_text("alpha", encoding="utf-8")
+    (documents / "b.txt").write_text("beta", encoding="utf-8")
+
+    assert service.ingest_existing()[0].chunks_indexed == 2
+    assert service.ingest_existing()[0].chunks_indexed == 0
+
+    (documents / "b.txt").write_text("beta, revised", encoding="utf-8")
+    (documents / "c.txt").write_text("gamma", encoding="utf-8")
+    os.utime(documents / "a.txt")
+
+    assert service.ingest_existing()[0].chunks_indexed == 2
+    # The revised b.txt replaced its old chunk rather than adding to it.
+    assert sorted(Path(source).name for source in store.sources) == ["a.txt", "b.txt", "c.txt"]
+
+
+def test_ingest_existing_skips_byte_identical_copies(tmp_path: Path) -> None:
+    service, store, documents = _service(tmp_path)
+    (documents / "guide.md").write_text("same content", encoding="utf-8")
+    (documents / "guide-copy.md").write_text("same content", encoding="utf-8")
+
+    assert service.ingest_existing()[0].chunks_indexed == 1
+    assert len(store.sources) == 1
+
+
+def test_deleting_a_document_indexes_its_copy_in_its_place(tmp_path: Path) -> None:
+    service, store, documents = _service(tmp_path)
+    (documents / "a.md").write_text("shared", encoding="utf-8")
+    (documents / "b.md").write_text("shared", encoding="utf-8")
+    service.ingest_existing()
+
+    result = service.delete_document(documents / "a.md")
+
+    assert not (documents / "a.md").exists()
+    assert (result.chunks_removed, result.chunks_indexed) == (1, 1)
+    assert [Path(source).name for source in store.sources] == ["b.md"]
+    result = service.delete_document(documents / "b.md")
+    assert (result.chunks_removed, result.chunks_indexed) == (1, 0)
+    assert store.sources == []
+
+
+def test_upload_hash_is_reused_while_the_file_is_unchanged(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    service, store, documents = _service(tmp_path)
+    path = documents / "upload.md"
+    path.write_text("uploaded", encoding="utf-8")
+    stat = path.stat()
+    upload = FileRecord(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256="upload-digest")
+    hashed: List[Path] = []
+    monkeypatch.setattr(
+        document_ingestion, "hash_file", lambda file_path: hashed.append(file_path) or "fresh"
+    )
+
+    assert service.ingest_file(path, upload=upload).chunks_indexed == 1
+    assert hashed == []
+
+    path.write_text("rewritten after upload", encoding="utf-8")
+    service.ingest_file(path, upload=upload)
+    assert hashed == [path]
+
+
+def test_manifest_is_unlocked_while_files_are_indexed(tmp_path: Path) -> None:
+    service, store, documents = _service(tmp_path)
+    (documents / "a.txt").write_text("alpha", encoding="utf-8")
+    manifest_file = tmp_path / "vector" / "documents.json"
+    add_chunks = store.add_chunks
+
+    def _add_chunks_during_other_upload(
+        chunks: Sequence[Document], replaces: Sequence[Path] = ()
+    ) -> int:
+        with manifest_file.with_suffix(".lock").open("a") as handle:
+            # Raises BlockingIOError while the rescan holds the manifest lock.
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        with DocumentManifest(manifest_file).transaction() as manifest:
+            manifest.record(documents / "b.txt", FileRecord(size=4, mtime_ns=0, sha256="b"))
+        return add_chunks(chunks, replaces)
+
+    store.add_chunks = _add_chunks_during_other_upload  # type: ignore[method-assign]
+    assert service.ingest_existing()[0].chunks_indexed == 1
+
+    saved = DocumentManifest(manifest_file)
+    saved.refresh()
+    # The other job's record survives the rescan's commit.
+    assert saved.get(documents / "a.txt") is not None
+    assert saved.get(documents / "b.txt") is not None
@@ -0,0 +1,55 @@
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache, chunk_digest
+
+
+def test_cache_round_trips_and_skips_known_digests(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path, "model-a")
+    digests = [chunk_digest("alpha"), chunk_digest("beta")]
+    cache.put_many(digests, np.array([[1.0, 2.0], [3.0, 4.0]]))
+    cache.put_many([digests[0]], np.array([[9.0, 9.0]]))
+
+    reopened = EmbeddingCache(tmp_path, "model-a")
+    found = reopened.get_many([*digests, chunk_digest("gamma")])
+
+    assert len(reopened) == 2
+    assert set(found) == set(digests)
+    assert found[digests[0]].tolist() == [1.0, 2.0]
+
+
+def test_cache_is_scoped_to_the_embedding_model(tmp_path: Path) -> None:
+    EmbeddingCache(tmp_path, "model-a").put_many([chunk_digest("alpha")], np.ones((1, 2)))
+
+    other = EmbeddingCache(tmp_path, "model-b")
+
+    assert other.get_many([chunk_digest("alpha")]) == {}
+
+
+def test_readers_never_see_rows_without_their_vectors(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path, "model-a")
+    digests = [chunk_digest(str(idx)) for idx in range(400)]
+    wrong: List[str] = []
+    writing = True
+
+    def _read() -> None:
+        while writing:
+            for digest, vector in cache.get_many(digests).items():
+                if vector[0] != digests.index(digest):
+                    wrong.append(digest)
+
+    readers = [threading.Thread(target=_read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for start in range(0, len(digests), 10):
+        batch = np.arange(start, start + 10, dtype=np.float32)[:, None].repeat(2, axis=1)
+        cache.put_many(digests[start : start + 10], batch)
+    writing = False
+    for reader in readers:
+        reader.join()
+
+    assert wrong == []
+    assert len(cache.get_many(digests)) == len(digests)
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import httpx
+import pytest
+
+from app.core.config import Settings
+from app.services.flow_client import (
+    FlowClient,
+    build_http_client,
+    parse_retry_after,
+    retry_delay,
+)
+
+
+class _StubFlowServer(ThreadingHTTPServer):
+    """Local stand-in for the Flow API that counts TCP connections and replays statuses."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _StubFlowHandler)
+        self.connections = 0
+        self.requests = 0
+        self.statuses: List[int] = []
+        self.retry_after = "0"
+        self.delay = 0.0
+
+    def process_request(self, request, client_address) -> None:  # noqa: ANN001
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+class _StubFlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls.
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:  # noqa: N802
+        server: _StubFlowServer = self.server  # type: ignore[assignment]
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests += 1
+        time.sleep(server.delay)
+        status = server.statuses.pop(0) if server.statuses else 200
+        if payload.get("stream"):
+            content_type = "text/event-stream"
+            events = [{"choices": [{"delta": {"content": part}}]} for part in ("po", "ng")]
+            body = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+            body = (body + "data: [DONE]\n\n").encode()
+        else:
+            content_type = "application/json"
+            body = json.dumps({"choices": [{"message": {"content": "pong"}}]}).encode()
+        self.send_response(status)
+        if status == 429 or status >= 500:
+            self.send_header("Retry-After", server.retry_after)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture()
+def flow_server() -> Iterator[_StubFlowServer]:
+    server = _StubFlowServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _settings(server: _StubFlowServer) -> Settings:
+    return Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        flow_base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+        flow_http2=False,
+        flow_retry_backoff=0.01,
+        flow_retry_max_backoff=1.0,
+    )
+
+
+def test_persistent_client_reuses_one_connection(flow_server: _StubFlowServer) -> None:
+    settings = _settings(flow_server)
+    calls = 20
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        with build_http_client(settings) as fresh:
+            FlowClient(settings, http_client=fresh).chat_completion({"messages": []})
+    fresh_seconds = time.perf_counter() - started
+    assert flow_server.connections == calls
+
+    flow_server.connections = 0
+    with build_http_client(settings) as shared:
+        client = FlowClient(settings, http_client=shared)
+        started = time.perf_counter()
+        for _ in range(calls):
+            client.chat_completion({"messages": []})
+        pooled_seconds = time.perf_counter() - started
+
+    assert flow_server.connections == 1
+    assert pooled_seconds < fresh_seconds
+
+
+def test_transient_errors_are_retried(flow_server: _StubFlowServer) -> None:
+    settings = _settings(flow_server)
+    flow_server.statuses = [503, 429]
+
+    with build_http_client(settings) as http:
+        response = FlowClient(settings, http_client=http).chat_completion({"messages": []})
+
+    assert response["choices"][0]["message"]["content"] == "pong"
+    assert flow_server.requests == 3
+
+
+def test_stream_chat_completion_yields_deltas(flow_server: _StubFlowServer) -> None:
+    settings = _settings(flow_server)
+    flow_server.statuses = [502]
+
+    with build_http_client(settings) as http:
+        tokens = list(FlowClient(settings, http_client=http).stream_chat_completion({}))
+
+    assert tokens == ["po", "ng"]
+    assert flow_server.requests == 2
+
+
+def test_gives_up_when_retry_after_exceeds_backoff(flow_server: _StubFlowServer) -> None:
+    settings = _settings(flow_server)
+    flow_server.statuses = [429]
+    flow_server.retry_after = "120"
+
+    with build_http_client(settings) as http, pytest.raises(httpx.HTTPStatusError):
+        FlowClient(settings, http_client=http).chat_completion({"messages": []})
+
+    assert flow_server.requests == 1
+
+
+def test_retries_stop_at_the_deadline(flow_server: _StubFlowServer) -> None:
+    settings = _settings(flow_server)
+    flow_server.statuses = [503, 503, 503]
+    flow_server.retry_after = "1"
+
+    with build_http_client(settings) as http, pytest.raises(httpx.HTTPStatusError):
+        FlowClient(settings, http_client=http).chat_completion(
+            {"messages": []}, deadline=time.time() + 0.5
+        )
+
+    # Waiting out Retry-After would pass the deadline, so there is no retry.
+    assert flow_server.requests == 1
+
+
+def test_attempt_timeout_is_capped_by_the_deadline(flow_server: _StubFlowServer) -> None:
+    settings = _settings(flow_server)
+    flow_server.delay = 1.0
+
+    started = time.monotonic()
+    with build_http_client(settings) as http, pytest.raises(httpx.ReadTimeout):
+        FlowClient(settings, http_client=http).chat_completion(
+            {"messages": []}, deadline=time.time() + 0.2
+        )
+
+    assert time.monotonic() - started < 0.9
+
+
+def test_passed_deadline_sends_nothing(flow_server: _StubFlowServer) -> None:
+    settings = _settings(flow_server)
+
+    with build_http_client(settings) as http, pytest.raises(TimeoutError):
+        FlowClient(settings, http_client=http).chat_completion(
+            {"messages": []}, deadline=time.time() - 1
+        )
+
+    assert flow_server.requests == 0
+
+
+def test_retry_delay_gives_up_when_it_would_reach_the_deadline() -> None:
+    settings = Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        flow_retry_backoff=0.01,
+    )
+    response = httpx.Response(503, headers={"Retry-After": "2"})
+
+    assert retry_delay(settings, 0, response) == 2.0
+    assert retry_delay(settings, 0, response, remaining=5.0) == 2.0
+    assert retry_delay(settings, 0, response, remaining=1.0) is None
+
+
+def test_parse_retry_after_accepts_seconds_and_dates() -> None:
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,90 @@
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from langchain.schema import Document
+
+from app.core.config import Settings
+from app.services.ingestion_pipeline import IngestionPipeline
+
+
+class _BatchRecorder:
+    def __init__(self) -> None:
+        self.batches: List[List[str]] = []
+
+    def add_chunks(self, chunks: Sequence[Document], replaces: Sequence[Path] = ()) -> int:
+        self.batches.append([Path(chunk.metadata["source"]).name for chunk in chunks])
+        return len(chunks)
+
+
+def _files(tmp_path: Path, *chunk_counts: int) -> List[Path]:
+    paths = []
+    for index, count in enumerate(chunk_counts):
+        path = tmp_path / f"doc-{index}.txt"
+        # Paragraphs longer than half a chunk never share one.
+        path.write_text("\n\n".join("x" * 60 for _ in range(count)), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def _run(tmp_path: Path, workers: int, paths: List[Path]) -> Tuple[_BatchRecorder, list]:
+    settings = Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        chunk_size=100,
+        chunk_overlap=0,
+    )
+    sink = _BatchRecorder()
+    pipeline = IngestionPipeline(sink, settings, workers=workers, batch_size=3)
+    reported = []
+    for path, chunks in pipeline.run(paths):
+        # A file is reported only after its last chunk reached the store.
+        stored = [name for batch in sink.batches for name in batch]
+        assert stored.count(path.name) == chunks
+        reported.append((path.name, chunks))
+    return sink, reported
+
+
+def test_pipeline_stores_fixed_size_batches_in_file_order(tmp_path: Path) -> None:
+    paths = _files(tmp_path, 2, 4, 1)
+
+    sink, reported = _run(tmp_path, workers=2, paths=paths)
+
+    assert reported == [("doc-0.txt", 2), ("doc-1.txt", 4), ("doc-2.txt", 1)]
+    assert sink.batches == [
+        ["doc-0.txt", "doc-0.txt", "doc-1.txt"],
+        ["doc-1.txt", "doc-1.txt", "doc-1.txt"],
+        ["doc-2.txt"],
+    ]
+
+
+def test_single_file_is_parsed_without_a_process_pool(tmp_path: Path) -> None:
+    sink, reported = _run(tmp_path, workers=4, paths=_files(tmp_path, 1))
+
+    assert reported == [("doc-0.txt", 1)]
+    assert sink.batches == [["doc-0.txt"]]
+
+
+def test_stop_request_finishes_the_files_already_taken(tmp_path: Path) -> None:
+    settings = Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        chunk_size=100,
+        chunk_overlap=0,
+    )
+    sink = _BatchRecorder()
+    pipeline = IngestionPipeline(sink, settings, workers=1, batch_size=3)
+    snapshots: List[int] = []
+
+    reported = list(
+        pipeline.run(
+            _files(tmp_path, 2, 2, 2),
+            on_progress=lambda progress: snapshots.append(progress.chunks_embedded),
+            should_stop=lambda: True,
+        )
+    )
+
+    assert [(path.name, chunks) for path, chunks in reported] == [("doc-0.txt", 2)]
+    assert sink.batches == [["doc-0.txt", "doc-0.txt"]]
+    assert snapshots[-1] == 2
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import numpy as np
+
+from app.services.lexical_index import POSTINGS_FILE, LexicalView, SegmentPostings, tokenize
+from app.services.vector_search import lexical_search, reciprocal_rank_fusion
+from app.services.vector_storage import VectorStorage, normalize_rows
+
+CHUNKS = [
+    "Send the FlowAgentSecret header with every request.",
+    "The agent and its secret are configured per tenant.",
+    "Tokens expire after an hour; ERR_TOKEN_EXPIRED means log in again.",
+    "Tenants group agents, documents and conversations.",
+]
+
+
+def test_tokenize_keeps_identifiers_and_their_parts() -> None:
+    assert tokenize("FlowAgentSecret") == ["flowagentsecret", "flow", "agent", "secret"]
+    assert tokenize("ERR_TOKEN_EXPIRED: HTTPError404") == [
+        "err_token_expired",
+        "err",
+        "token",
+        "expired",
+        "httperror404",
+        "http",
+        "error",
+        "404",
+    ]
+    assert tokenize("x" * 100) == []
+
+
+def test_bm25_ranks_exact_identifiers_first_across_segments() -> None:
+    view = LexicalView([SegmentPostings.build(CHUNKS[:2]), SegmentPostings.build(CHUNKS[2:])])
+
+    found, scores = lexical_search(view, "what is FlowAgentSecret?", 4)
+    assert found.tolist() == [0, 1]
+    assert scores[0] > scores[1] > 0
+
+    found, _ = lexical_search(view, "err_token_expired", 4)
+    assert found.tolist() == [2]
+    assert lexical_search(view, "unrelated words", 4)[0].tolist() == []
+
+    live = np.array([False, True, True, True])
+    assert lexical_search(view, "FlowAgentSecret", 4, live)[0].tolist() == [1]
+
+
+def test_reciprocal_rank_fusion_rewards_rows_both_rankings_agree_on() -> None:
+    found, scores = reciprocal_rank_fusion([np.array([5, 1, 2]), np.array([2, 7])], 3, rrf_k=60)
+
+    # 1 and 7 tie at second place in their rankings; the first ranking wins.
+    assert found.tolist() == [2, 5, 1]
+    assert np.isclose(scores[0], 1 / 63 + 1 / 61)
+
+
+def test_storage_persists_postings_per_segment(tmp_path: Path) -> None:
+    vectors = normalize_rows(np.random.default_rng(3).standard_normal((4, 8))).astype(np.float32)
+    storage = VectorStorage(tmp_path, lexical=True)
+    storage.append(CHUNKS[:2], [{}] * 2, vectors[:2])
+    storage.append(CHUNKS[2:], [{}] * 2, vectors[2:])
+
+    assert len(list((tmp_path / "segments").glob(f"*/{POSTINGS_FILE}"))) == 2
+    snapshot = VectorStorage(tmp_path, lexical=True).snapshot()
+    assert snapshot.lexical is not None
+    assert len(snapshot.lexical) == 4
+    assert lexical_search(snapshot.lexical, "ERR_TOKEN_EXPIRED", 1)[0].tolist() == [2]
+    assert VectorStorage(tmp_path).snapshot().lexical is None
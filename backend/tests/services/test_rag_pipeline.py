@@ -0,0 +1,159 @@
+import asyncio
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+from app.services.rag_pipeline import RagPipeline
+from app.services.response_cache import context_fingerprint
+
+
+class _FakeStore:
+    version = 7
+
+    def __init__(self) -> None:
+        self.searches = 0
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return np.array([1.0, 0.0], dtype=np.float32)
+
+    def search_with_vectors(
+        self, query_vector: np.ndarray, k: int = 4, query: Optional[str] = None
+    ) -> tuple[List[Document], np.ndarray]:
+        self.searches += 1
+        # Slow enough for concurrent callers to overlap.
+        time.sleep(0.02)
+        document = Document(page_content="Flow docs", metadata={"source": "a.md", "chunk_id": "c1"})
+        return [document], query_vector[None, :]
+
+
+class _CountingClient:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def chat_completion(self, payload: Dict[str, Any], deadline: Any = None) -> Dict[str, Any]:
+        self.calls += 1
+        return {"choices": [{"message": {"content": "answer"}}]}
+
+    def stream_chat_completion(
+        self, payload: Dict[str, Any], deadline: Any = None
+    ) -> Iterator[str]:
+        self.calls += 1
+        yield from ("ans", "wer")
+
+
+class _SlowAsyncClient:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def chat_completion(
+        self, payload: Dict[str, Any], deadline: Any = None
+    ) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {"choices": [{"message": {"content": "answer"}}]}
+
+
+class _MemoryCache:
+    """Exact-match stand-in for the Redis-backed semantic cache."""
+
+    def __init__(self) -> None:
+        self.entries: Dict[tuple, Dict[str, Any]] = {}
+
+    def get(
+        self, query_vector: np.ndarray, chunk_ids: Sequence[str], version: int
+    ) -> Optional[Dict[str, Any]]:
+        return self.entries.get((context_fingerprint(chunk_ids), version))
+
+    def put(
+        self,
+        query_vector: np.ndarray,
+        chunk_ids: Sequence[str],
+        version: int,
+        response: Dict[str, Any],
+    ) -> None:
+        self.entries[(context_fingerprint(chunk_ids), version)] = response
+
+
+def _pipeline() -> tuple[RagPipeline, _CountingClient]:
+    client = _CountingClient()
+    pipeline = RagPipeline(
+        store=_FakeStore(),  # type: ignore[arg-type]
+        client=client,  # type: ignore[arg-type]
+        cache=_MemoryCache(),  # type: ignore[arg-type]
+    )
+    return pipeline, client
+
+
+def test_repeated_question_is_answered_from_cache() -> None:
+    pipeline, client = _pipeline()
+
+    first = pipeline.generate("How do I log in?")
+    second = pipeline.generate("How do I log in?")
+
+    assert client.calls == 1
+    assert second["response"] == first["response"]
+    assert second["context"][0].document_id == "a.md"
+
+
+def test_streamed_answer_is_cached_after_completion() -> None:
+    pipeline, client = _pipeline()
+
+    _, usage, tokens = pipeline.stream("How do I log in?")
+    assert "".join(tokens) == "answer"
+    assert usage["context_tokens"] > 0
+    _, _, cached = pipeline.stream("How do I log in?")
+
+    assert list(cached) == ["answer"]
+    assert client.calls == 1
+
+
+def test_context_fingerprint_ignores_order() -> None:
+    assert context_fingerprint(["b", "a"]) == context_fingerprint(["a", "b"])
+    assert context_fingerprint(["a"]) != context_fingerprint(["a", "b"])
+
+
+def test_concurrent_identical_questions_share_one_flow_call() -> None:
+    async_client = _SlowAsyncClient()
+    pipeline = RagPipeline(
+        store=_FakeStore(),  # type: ignore[arg-type]
+        client=_CountingClient(),  # type: ignore[arg-type]
+        async_client=async_client,  # type: ignore[arg-type]
+    )
+
+    async def _ask() -> List[Dict[str, Any]]:
+        return await asyncio.gather(
+            pipeline.agenerate("How do I log in?"),
+            pipeline.agenerate("  how do I   LOG in? "),
+            pipeline.agenerate("What is a tenant?"),
+            pipeline.agenerate("How do I log in?", conversation_id="other-chat"),
+        )
+
+    first, second, other, elsewhere = asyncio.run(_ask())
+
+    # Another conversation's history could change the answer, so it is asked separately.
+    assert async_client.calls == 3
+    assert first["response"] == second["response"] == other["response"] == elsewhere["response"]
+
+
+def test_conversations_share_retrieval_but_not_the_answer() -> None:
+    store = _FakeStore()
+    async_client = _SlowAsyncClient()
+    pipeline = RagPipeline(
+        store=store,  # type: ignore[arg-type]
+        client=_CountingClient(),  # type: ignore[arg-type]
+        async_client=async_client,  # type: ignore[arg-type]
+    )
+
+    async def _ask() -> List[Dict[str, Any]]:
+        return await asyncio.gather(
+            pipeline.agenerate("Where are the API keys?", conversation_id="chat-a"),
+            pipeline.agenerate("where are the API keys?", conversation_id="chat-b"),
+        )
+
+    first, second = asyncio.run(_ask())
+
+    assert store.searches == 1
+    assert async_client.calls == 2
+    assert first["context"] == second["context"]
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, List
+
+import pytest
+
+from app.services import registry
+
+built: List[str] = []
+
+
+class _Model:
+    def __init__(self, model_name: str):
+        # Slow enough that unsynchronized callers would each build one.
+        time.sleep(0.05)
+        built.append(model_name)
+
+
+class _Store:
+    def __init__(self, embeddings: Any):
+        built.append("store")
+        self.embeddings = embeddings
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    built.clear()
+    monkeypatch.setattr(registry, "SentenceTransformerEmbeddings", _Model)
+    monkeypatch.setattr(registry, "EmbeddingStore", _Store)
+    registry._embedding_model.cache_clear()
+    registry._embedding_store.cache_clear()
+    yield
+    registry._embedding_model.cache_clear()
+    registry._embedding_store.cache_clear()
+
+
+def test_concurrent_callers_share_one_model_and_store() -> None:
+    with ThreadPoolExecutor(8) as pool:
+        stores = list(pool.map(lambda _: registry.get_embedding_store(), range(8)))
+
+    assert all(store is stores[0] for store in stores)
+    assert stores[0].embeddings is registry.get_embedding_model()
+    assert built == [registry.EMBEDDING_MODEL_NAME, "store"]
+
+
+def test_warm_up_loads_the_tokenizer_and_the_store(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(registry, "load_token_counter", lambda name: built.append(name))
+
+    registry.warm_up()
+
+    assert built == [
+        registry.get_settings().context_tokenizer,
+        registry.EMBEDDING_MODEL_NAME,
+        "store",
+    ]
+
+
+def test_run_coroutine_uses_one_background_loop_for_every_thread() -> None:
+    async def _loop() -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    loops = []
+    threads = [
+        threading.Thread(target=lambda: loops.append(registry.run_coroutine(_loop())))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loops) == 4
+    assert all(loop is loops[0] for loop in loops)
+    assert loops[0].is_running()
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_failure_reaches_every_waiter_and_clears_the_key() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def _boom() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def _run() -> list:
+        return await asyncio.gather(
+            flight.do("q", _boom), flight.do("q", _boom), return_exceptions=True
+        )
+
+    results = asyncio.run(_run())
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(flight) == 0
+
+
+def test_cancelled_caller_does_not_cancel_shared_work() -> None:
+    flight = SingleFlight()
+
+    async def _work() -> str:
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def _run() -> str:
+        leader = asyncio.ensure_future(flight.do("q", _work))
+        follower = asyncio.ensure_future(flight.do("q", _work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(_run()) == "done"
+    assert flight.coalesced == 1
@@ -0,0 +1,107 @@
+import asyncio
+import sys
+import time
+from typing import Any, List, Tuple
+
+import pytest
+from fakeredis import FakeRedis, FakeServer
+from fakeredis.aioredis import FakeRedis as FakeAsyncRedis
+from rq import Queue, SimpleWorker, get_current_job
+from rq.job import Job, JobStatus
+
+from app.services.task_queue import (
+    MIN_POP_SECONDS,
+    TaskQueue,
+    check_deadline,
+    notify_job_failed,
+    notify_job_finished,
+)
+
+
+def double(value: int) -> int:
+    check_deadline(get_current_job())
+    return value * 2
+
+
+def _queue() -> Tuple[TaskQueue, FakeRedis]:
+    server = FakeServer()
+    connection = FakeRedis(server=server)
+    queue = Queue("chat", connection=connection)
+    return TaskQueue(queue=queue, async_connection=FakeAsyncRedis(server=server)), connection
+
+
+def _job(queue: TaskQueue, job_id: str) -> Job:
+    job = queue.queue.fetch_job(job_id)
+    assert job is not None
+    return job
+
+
+def test_result_pushed_by_the_success_callback_is_popped() -> None:
+    queue, connection = _queue()
+    job = queue.enqueue(double, 21)
+    # Still queued, so only the pushed outcome can answer the wait.
+    notify_job_finished(_job(queue, job.job_id), connection, 42)
+
+    result = queue.wait_for_result(job.job_id, timeout=5)
+
+    assert (result.status, result.payload) == (JobStatus.FINISHED.value, 42)
+
+
+def test_await_result_pops_on_the_async_connection() -> None:
+    queue, connection = _queue()
+    job = queue.enqueue(double, 4)
+    notify_job_finished(_job(queue, job.job_id), connection, 8)
+
+    result = asyncio.run(queue.await_result(job.job_id, timeout=5))
+
+    assert result.payload == 8
+
+
+def test_failure_callback_raises_the_job_traceback() -> None:
+    queue, connection = _queue()
+    job = queue.enqueue(double, 1)
+    try:
+        raise ValueError("no answer")
+    except ValueError:
+        notify_job_failed(_job(queue, job.job_id), connection, *sys.exc_info())
+
+    with pytest.raises(RuntimeError, match="ValueError: no answer"):
+        queue.wait_for_result(job.job_id, timeout=5)
+
+
+def test_worker_reports_a_finished_job() -> None:
+    queue, connection = _queue()
+    job = queue.enqueue(double, 21)
+    SimpleWorker([queue.queue], connection=connection).work(burst=True)
+
+    assert queue.wait_for_result(job.job_id, timeout=5).payload == 42
+
+
+def test_job_started_after_its_deadline_fails() -> None:
+    queue, connection = _queue()
+    job = queue.enqueue(double, 1, deadline=time.time() - 1)
+    SimpleWorker([queue.queue], connection=connection).work(burst=True)
+
+    with pytest.raises(RuntimeError, match="JobDeadlineExceededError"):
+        queue.wait_for_result(job.job_id, timeout=5)
+
+
+def test_wait_gives_up_at_its_deadline_and_cancels_the_job(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    queue, connection = _queue()
+    job = queue.enqueue(double, 1)
+    timeouts: List[float] = []
+    blpop = connection.blpop
+
+    def _recording_blpop(keys: List[str], timeout: float) -> Any:
+        timeouts.append(timeout)
+        return blpop(keys, timeout=timeout)
+
+    monkeypatch.setattr(connection, "blpop", _recording_blpop)
+    with pytest.raises(TimeoutError):
+        queue.wait_for_result(job.job_id, timeout=0.05, check_interval=0.0001)
+
+    # Redis reads a timeout under a millisecond as 0, which blocks forever.
+    assert timeouts and min(timeouts) >= MIN_POP_SECONDS
+    assert queue.fetch(job.job_id).status == JobStatus.CANCELED
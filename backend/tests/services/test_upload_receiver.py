@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import pytest
+
+from app.core.config import Settings
+from app.services.document_manifest import FileRecord
+from app.services.upload_receiver import StoredUpload, UploadReceiver, UploadRejectedError
+
+BOUNDARY = "test-boundary"
+
+
+def _body(filename: str, content: bytes) -> bytes:
+    return (
+        (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        + content
+        + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+
+
+def _receiver(tmp_path: Path) -> Tuple[UploadReceiver, Path]:
+    settings = Settings(
+        flow_agent="agent",
+        flow_tenant="tenant",
+        flow_agent_secret="secret",
+        documents_path=tmp_path / "documents",
+        vector_store_path=tmp_path / "vector",
+        max_upload_megabytes=1,
+    )
+    return UploadReceiver(settings), settings.documents_path
+
+
+def _receive(
+    receiver: UploadReceiver,
+    body: bytes,
+    sent: List[int],
+    extra_headers: Optional[Dict[str, str]] = None,
+) -> StoredUpload:
+    async def _stream() -> AsyncIterator[bytes]:
+        for start in range(0, len(body), 64 * 1024):
+            sent.append(start)
+            yield body[start : start + 64 * 1024]
+
+    headers: Dict[str, str] = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    headers.update(extra_headers or {})
+    return asyncio.run(receiver.receive(headers, _stream()))
+
+
+def test_upload_is_hashed_while_streamed_and_renamed_into_place(tmp_path: Path) -> None:
+    receiver, documents = _receiver(tmp_path)
+    content = b"guide " * 40_000
+
+    stored = _receive(receiver, _body("../guide.txt", content), [])
+
+    assert stored.path == documents / "guide.txt"
+    assert stored.path.read_bytes() == content
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+    assert stored.mtime_ns == stored.path.stat().st_mtime_ns
+    assert [path.name for path in documents.iterdir()] == ["guide.txt"]
+
+
+def test_oversized_upload_is_refused_before_it_is_fully_read(tmp_path: Path) -> None:
+    receiver, documents = _receiver(tmp_path)
+    body = _body("big.txt", b"x" * (3 * 1024 * 1024))
+    sent: List[int] = []
+
+    with pytest.raises(UploadRejectedError) as rejected:
+        _receive(receiver, body, sent)
+
+    assert rejected.value.status_code == 413
+    assert len(sent) < len(body) // (64 * 1024)
+    assert list(documents.iterdir()) == []
+
+
+def test_malformed_content_length_is_a_bad_request(tmp_path: Path) -> None:
+    receiver, documents = _receiver(tmp_path)
+    sent: List[int] = []
+
+    with pytest.raises(UploadRejectedError) as rejected:
+        _receive(receiver, _body("guide.txt", b"guide"), sent, {"content-length": "12abc"})
+
+    assert rejected.value.status_code == 400
+    assert sent == []
+    assert not documents.exists() or list(documents.iterdir()) == []
+
+
+def test_identical_content_short_circuits_to_the_indexed_file(tmp_path: Path) -> None:
+    receiver, documents = _receiver(tmp_path)
+    first = _receive(receiver, _body("manual.md", b"same bytes"), [])
+    with receiver._manifest.transaction() as manifest:
+        manifest.record(first.path, FileRecord(size=10, mtime_ns=0, sha256=first.sha256))
+
+    again = _receive(receiver, _body("manual-copy.md", b"same bytes"), [])
+
+    assert again.duplicate
+    assert again.path == first.path
+    assert [path.name for path in documents.iterdir()] == ["manual.md"]
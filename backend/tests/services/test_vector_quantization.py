@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.vector_quantization import QuantizedVectors, QuantizedView
+from app.services.vector_search import exact_search, rescored_search
+from app.services.vector_storage import VectorStorage, normalize_rows
+
+
+def _vectors(size: int) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    return normalize_rows(rng.standard_normal((size, 32))).astype(np.float32)
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_rescoring_recovers_the_exact_neighbours(mode: str) -> None:
+    vectors = _vectors(2000)
+    codes = QuantizedView(
+        [
+            QuantizedVectors.encode(vectors[:1500], mode),
+            QuantizedVectors.encode(vectors[1500:], mode),
+        ]
+    )
+    live = np.ones(len(vectors), dtype=bool)
+    live[::7] = False
+
+    assert np.allclose(codes @ vectors[3], vectors @ vectors[3], atol=0.05)
+    for query in vectors[:20]:
+        expected, expected_scores = exact_search(vectors, query, 4, live)
+        found, scores = rescored_search(codes, vectors, query, 4, 32, live)
+        assert found.tolist() == expected.tolist()
+        assert np.allclose(scores, expected_scores)
+
+
+def test_storage_builds_codes_once_per_segment(tmp_path: Path) -> None:
+    vectors = _vectors(10)
+    storage = VectorStorage(tmp_path, quantization="int8")
+    storage.append([f"chunk-{idx}" for idx in range(10)], [{}] * 10, vectors)
+
+    codes_files = list((tmp_path / "segments").glob("*/codes-int8.*"))
+    assert sorted(path.suffix for path in codes_files) == [".bin", ".npy"]
+    snapshot = VectorStorage(tmp_path, quantization="int8").snapshot()
+    assert snapshot.codes is not None
+    assert len(snapshot.codes) == 10
+    assert snapshot.codes.nbytes < snapshot.vectors[:].nbytes / 2
+    with pytest.raises(ValueError):
+        VectorStorage(tmp_path, quantization="int4")
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import numpy as np
+
+from app.services.vector_search import IvfIndex, exact_search, top_k_indices
+from app.services.vector_storage import normalize_rows
+
+
+def _clustered(rng: np.random.Generator, size: int) -> np.ndarray:
+    centers = np.eye(8, dtype=np.float32)[:4] * 5
+    noise = rng.standard_normal((size, 8)).astype(np.float32) * 0.3
+    return normalize_rows(centers[rng.integers(0, 4, size)] + noise).astype(np.float32)
+
+
+def test_top_k_indices_orders_best_first() -> None:
+    scores = np.array([0.1, 0.9, 0.3, 0.7, 0.5])
+
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 4]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 4, 2, 0]
+
+
+def test_ivf_index_matches_exact_search_and_persists(tmp_path: Path) -> None:
+    rng = np.random.default_rng(3)
+    vectors = _clustered(rng, 400)
+    index = IvfIndex(tmp_path, nlist=4, nprobe=4)
+
+    index.sync(vectors[:200])
+    assert index.is_trained
+    index.sync(vectors)
+    assert len(index) == 400
+
+    reopened = IvfIndex(tmp_path, nlist=4, nprobe=4)
+    query = vectors[123]
+    expected, _ = exact_search(vectors, query, 5)
+    found, scores = reopened.search(vectors, query, 5)
+
+    assert found.tolist() == expected.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_ivf_index_waits_for_enough_training_data(tmp_path: Path) -> None:
+    index = IvfIndex(tmp_path, nlist=4, nprobe=1)
+
+    index.sync(_clustered(np.random.default_rng(0), 20))
+
+    assert not index.is_trained
+    assert len(index) == 0
+
+
+def test_ivf_index_masks_deleted_rows_and_follows_compaction(tmp_path: Path) -> None:
+    vectors = _clustered(np.random.default_rng(5), 400)
+    index = IvfIndex(tmp_path, nlist=4, nprobe=4)
+    index.sync(vectors)
+    query = vectors[10]
+    live = np.ones(len(vectors), dtype=bool)
+    live[10] = False
+
+    found, _ = index.search(vectors, query, 5, live)
+    assert 10 not in found.tolist()
+    assert found.tolist() == exact_search(vectors, query, 5, live)[0].tolist()
+
+    index.remap(live, epoch=1)
+    compacted = vectors[live]
+    reopened = IvfIndex(tmp_path, nlist=4, nprobe=4)
+    reopened.sync(compacted, epoch=1)
+
+    assert (len(reopened), reopened.epoch) == (399, 1)
+    found, _ = reopened.search(compacted, query, 5, epoch=1)
+    assert found.tolist() == exact_search(compacted, query, 5)[0].tolist()
@@ -0,0 +1,117 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from app.services.vector_storage import VectorStorage, migrate_json_store, normalize_rows
+
+
+def test_append_and_reopen_round_trips_rows(tmp_path: Path) -> None:
+    storage = VectorStorage(tmp_path)
+    storage.append(
+        ["first chunk", "segundo trecho"],
+        [{"source": "a.txt"}, {"source": "b.md"}],
+        np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]),
+    )
+    storage.append(["third"], [{"source": "c.pdf", "page": 2}], np.array([[0.0, 0.0, 1.0]]))
+
+    reopened = VectorStorage(tmp_path)
+
+    assert len(reopened) == 3
+    assert reopened.dimension == 3
+    assert reopened.segment_sizes == [2, 1]
+    assert reopened.vectors[2].tolist() == [0.0, 0.0, 1.0]
+    assert reopened.text(1) == "segundo trecho"
+    assert reopened.metadata(2) == {"source": "c.pdf", "page": 2}
+
+
+def test_uncommitted_segments_are_ignored_and_removed(tmp_path: Path) -> None:
+    storage = VectorStorage(tmp_path)
+    storage.append(["kept"], [{}], np.ones((1, 2)))
+    # Simulate a crash after a segment was written but before the manifest.
+    orphan = tmp_path / "segments" / "seg-00000002"
+    orphan.mkdir()
+    (orphan / "chunks.bin").write_bytes(b"garbage")
+
+    reopened = VectorStorage(tmp_path)
+    reopened.append(["next"], [{}], np.zeros((1, 2)))
+    reopened.compact(target_rows=100)
+
+    assert [reopened.text(idx) for idx in range(len(reopened))] == ["kept", "next"]
+    assert sorted(path.name for path in (tmp_path / "segments").iterdir()) == ["seg-00000003"]
+
+
+def test_compact_merges_small_segments_in_order(tmp_path: Path) -> None:
+    storage = VectorStorage(tmp_path)
+    for idx in range(5):
+        storage.append([f"chunk-{idx}"], [{"n": idx}], np.array([[float(idx + 1), 1.0]]))
+    vectors_before = storage.vectors[:]
+
+    assert storage.needs_compaction(target_rows=3, trigger=4)
+    assert storage.compact(target_rows=3) == 3
+
+    reopened = VectorStorage(tmp_path)
+    assert reopened.segment_sizes == [3, 2]
+    assert [reopened.metadata(idx)["n"] for idx in range(5)] == [0, 1, 2, 3, 4]
+    assert reopened.text(3) == "chunk-3"
+    assert np.array_equal(reopened.vectors[:], vectors_before)
+    assert np.allclose(reopened.vectors @ np.array([1.0, 0.0]), vectors_before[:, 0])
+
+
+def test_migrate_json_store_converts_legacy_file(tmp_path: Path) -> None:
+    legacy = {
+        "documents": ["alpha", "beta"],
+        "metadatas": [{"source": "x"}, {"source": "y"}],
+        "vectors": [[0.5, 0.5], [1.0, 0.0]],
+    }
+    (tmp_path / "store.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    assert migrate_json_store(tmp_path) == 2
+    assert not (tmp_path / "store.json").exists()
+    assert migrate_json_store(tmp_path) == 0
+
+    storage = VectorStorage(tmp_path)
+    assert storage.text(0) == "alpha"
+    assert storage.metadata(1) == {"source": "y"}
+    assert np.allclose(storage.vectors, normalize_rows(np.array(legacy["vectors"])))
+
+
+def test_rows_are_stored_unit_normalized(tmp_path: Path) -> None:
+    storage = VectorStorage(tmp_path)
+    storage.append(["a", "b"], [{}, {}], np.array([[3.0, 4.0], [0.0, 0.0]]))
+
+    assert np.allclose(storage.vectors, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_delete_and_replace_tombstone_rows_until_compaction(tmp_path: Path) -> None:
+    storage = VectorStorage(tmp_path)
+    storage.append(
+        ["a-1", "b-1", "a-2"],
+        [{"source": "a.txt"}, {"source": "b.txt"}, {"source": "a.txt"}],
+        np.eye(3),
+    )
+    storage.append(["c-1"], [{"source": "c.txt"}], np.ones((1, 3)))
+
+    assert storage.append(["a-new"], [{"source": "a.txt"}], np.eye(3)[:1], replaces=["a.txt"]) == 2
+    assert storage.delete(["c.txt", "missing.txt"]) == 1
+    assert storage.delete(["c.txt"]) == 0
+
+    reopened = VectorStorage(tmp_path)
+    assert len(reopened) == 5
+    assert reopened.live_count == 2
+    assert reopened.live is not None
+    assert reopened.live.tolist() == [False, True, False, False, True]
+
+    renumbered: list = []
+    assert reopened.needs_compaction(target_rows=1, trigger=10, max_dead_fraction=0.5)
+    reopened.compact(
+        target_rows=1,
+        max_dead_fraction=0.5,
+        on_renumber=lambda kept, epoch: renumbered.append((kept.tolist(), epoch)),
+    )
+
+    assert renumbered == [([False, True, False, False, True], 1)]
+    compacted = VectorStorage(tmp_path)
+    assert (len(compacted), compacted.epoch, compacted.live) == (2, 1, None)
+    assert [compacted.text(idx) for idx in range(2)] == ["b-1", "a-new"]
+    assert compacted.delete(["b.txt"]) == 1
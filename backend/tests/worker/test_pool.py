@@ -0,0 +1,119 @@
+import threading
+import time
+from typing import Callable, Iterator, List
+
+import pytest
+from fakeredis import FakeRedis
+from rq import Queue
+from rq.job import JobStatus
+
+from app.worker.pool import ThreadPoolWorker
+
+started: List[str] = []
+release = threading.Event()
+
+
+def record(name: str) -> str:
+    started.append(name)
+    return name
+
+
+def hold(name: str) -> str:
+    started.append(name)
+    assert release.wait(10), "test never released the job"
+    return name
+
+
+@pytest.fixture(autouse=True)
+def _reset() -> Iterator[None]:
+    started.clear()
+    release.clear()
+    yield
+    # A failed test must not leave a job thread blocked.
+    release.set()
+
+
+def _wait_for(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def _start(pool: ThreadPoolWorker) -> threading.Thread:
+    thread = threading.Thread(target=pool.work, daemon=True)
+    thread.start()
+    return thread
+
+
+def _stop(pool: ThreadPoolWorker, thread: threading.Thread) -> None:
+    pool.request_stop()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_earlier_queues_are_served_first() -> None:
+    connection = FakeRedis()
+    chat, bulk = Queue("chat", connection=connection), Queue("bulk", connection=connection)
+    bulk.enqueue(record, "bulk-1")
+    bulk.enqueue(record, "bulk-2")
+    chat.enqueue(record, "chat")
+
+    pool = ThreadPoolWorker(["chat", "bulk"], connection=connection, concurrency=1, poll_interval=1)
+    thread = _start(pool)
+    _wait_for(lambda: len(started) == 3)
+    _stop(pool, thread)
+
+    assert started == ["chat", "bulk-1", "bulk-2"]
+
+
+def test_queue_limit_keeps_a_thread_free_for_other_queues() -> None:
+    connection = FakeRedis()
+    chat, bulk = Queue("chat", connection=connection), Queue("bulk", connection=connection)
+    bulk.enqueue(hold, "bulk-1")
+    bulk.enqueue(hold, "bulk-2")
+
+    pool = ThreadPoolWorker(
+        ["chat", "bulk"], connection=connection, concurrency=2, poll_interval=1, limits={"bulk": 1}
+    )
+    thread = _start(pool)
+    _wait_for(lambda: started == ["bulk-1"])
+    time.sleep(0.2)
+    # The second thread is idle, but bulk already holds its one allowed job.
+    assert started == ["bulk-1"]
+    assert bulk.count == 1
+
+    chat.enqueue(record, "chat")
+    _wait_for(lambda: "chat" in started)
+    release.set()
+    _wait_for(lambda: len(started) == 3)
+    _stop(pool, thread)
+
+    assert started == ["bulk-1", "chat", "bulk-2"]
+
+
+def test_stop_requeues_prefetched_jobs_and_finishes_running_ones() -> None:
+    connection = FakeRedis()
+    chat = Queue("chat", connection=connection)
+    running = chat.enqueue(hold, "running")
+    prefetched = chat.enqueue(record, "prefetched")
+    waiting = chat.enqueue(record, "waiting")
+
+    pool = ThreadPoolWorker(
+        ["chat"], connection=connection, concurrency=1, prefetch=1, poll_interval=1
+    )
+    thread = _start(pool)
+    _wait_for(lambda: started == ["running"] and chat.count == 1)
+    pool.request_stop()
+    thread.join(1.5)
+    # work() waits for the running job rather than abandoning it.
+    assert thread.is_alive()
+
+    release.set()
+    thread.join(10)
+    assert not thread.is_alive()
+
+    assert started == ["running"]
+    assert running.get_status(refresh=True) == JobStatus.FINISHED
+    assert chat.job_ids == [prefetched.id, waiting.id]
+    assert not connection.lrange(chat.intermediate_queue_key, 0, -1)
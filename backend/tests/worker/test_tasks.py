@@ -0,0 +1,54 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from typing import Any, Iterator, List, Tuple
+
+import pytest
+from fakeredis import FakeRedis
+
+from app.core.database import dispose_engine, init_db, session_scope
+from app.models.conversation import Message
+from app.services.conversation_service import ConversationService
+from app.worker import tasks
+
+
+class _StreamingPipeline:
+    def stream(
+        self, prompt: str, conversation_id: Any = None, deadline: Any = None
+    ) -> Tuple[List[Any], Any, Iterator[str]]:
+        return [], {}, iter(["Hi", " there"])
+
+
+async def _ask(nickname: str) -> str:
+    await init_db()
+    async with session_scope() as session:
+        conversations = ConversationService(session)
+        conversation = conversations.new(nickname)
+        question = Message(conversation_id=conversation.id, role="user", content="Hello")
+        conversations.append(conversation, [question])
+        await session.commit()
+        return str(conversation.id)
+
+
+async def _messages(conversation_id: str) -> List[Tuple[str, str]]:
+    async with session_scope() as session:
+        messages = await ConversationService(session).list_messages(uuid.UUID(conversation_id))
+    await dispose_engine()
+    return [(message.role, message.content) for message in messages]
+
+
+def test_streamed_answer_is_stored_without_a_reader(monkeypatch: pytest.MonkeyPatch) -> None:
+    conversation_id = asyncio.run(_ask("unread-stream"))
+    connection = FakeRedis()
+    job = SimpleNamespace(id="job-1", meta={}, connection=connection)
+    monkeypatch.setattr(tasks, "get_current_job", lambda: job)
+    monkeypatch.setattr(tasks, "_pipeline", _StreamingPipeline)
+
+    tasks.stream_chat(
+        {"message": "Hello", "conversation_id": conversation_id, "stream_key": "stream-1"}
+    )
+
+    # Nobody read the stream, yet the answer is in the history.
+    assert asyncio.run(_messages(conversation_id)) == [("user", "Hello"), ("assistant", "Hi there")]
+    *_, (_, done) = connection.xrange("stream-1")
+    assert done[b"event"] == b"done"
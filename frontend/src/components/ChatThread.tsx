@@ -4,6 +4,7 @@ import {
   AlertIcon,
   AlertTitle,
   Box,
+  Button,
   HStack,
   Skeleton,
   Stack,
@@ -17,6 +18,8 @@ interface ChatThreadProps {
   messages: ChatMessage[];
   isLoading: boolean;
   error?: string;
+  hasEarlier?: boolean;
+  onLoadEarlier?: () => void;
 }
 
 const renderSources = (sources: ChatMessage['sources']) => {
@@ -35,9 +38,20 @@ const renderSources = (sources: ChatMessage['sources']) => {
   );
 };
 
-export const ChatThread = ({ messages, isLoading, error }: ChatThreadProps) => {
+export const ChatThread = ({
+  messages,
+  isLoading,
+  error,
+  hasEarlier = false,
+  onLoadEarlier,
+}: ChatThreadProps) => {
   return (
     <Stack spacing={4} flex="1" overflowY="auto" pr={4}>
+      {hasEarlier && onLoadEarlier ? (
+        <Button variant="link" size="sm" alignSelf="center" onClick={onLoadEarlier} isDisabled={isLoading}>
+          Load earlier messages
+        </Button>
+      ) : null}
       {error ? (
         <Alert status="error" borderRadius="md">
           <AlertIcon />
@@ -10,6 +10,9 @@ interface ConversationSidebarProps {
   onNewChat: () => void;
   isLoading: boolean;
   isDisabled: boolean;
+  hasMore?: boolean;
+  isLoadingMore?: boolean;
+  onLoadMore?: () => void;
   nickname?: string | null;
   errorMessage?: string;
 }
@@ -26,6 +29,9 @@ export const ConversationSidebar = ({
   onNewChat,
   isLoading,
   isDisabled,
+  hasMore = false,
+  isLoadingMore = false,
+  onLoadMore,
   nickname,
   errorMessage,
 }: ConversationSidebarProps) => {
@@ -89,6 +95,17 @@ export const ConversationSidebar = ({
                 </Button>
               );
             })}
+            {hasMore && onLoadMore ? (
+              <Button
+                variant="link"
+                size="sm"
+                color="gray.400"
+                onClick={onLoadMore}
+                isLoading={isLoadingMore}
+              >
+                Load older chats
+              </Button>
+            ) : null}
           </VStack>
         )}
       </Box>
@@ -12,6 +12,12 @@ import {
 import { ChangeEvent, useRef, useState } from "react";
 
 import { api } from "../lib/api";
+import type { IngestionJobAccepted, IngestionJobStatus } from "../types";
+
+const POLL_INTERVAL_MS = 1000;
+const FINAL_STATUSES = new Set(["finished", "failed", "canceled", "stopped"]);
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
 
 interface DocumentUploaderProps {
   isDisabled?: boolean;
@@ -19,6 +25,7 @@ interface DocumentUploaderProps {
 
 export const DocumentUploader = ({ isDisabled = false }: DocumentUploaderProps) => {
   const [isUploading, setIsUploading] = useState(false);
+  const [indexed, setIndexed] = useState<number | null>(null);
   const inputRef = useRef<HTMLInputElement | null>(null);
   const toast = useToast();
 
@@ -36,10 +43,32 @@ export const DocumentUploader = ({ isDisabled = false }: DocumentUploaderProps)
 
     try {
       setIsUploading(true);
-      await api.post("/documents/upload", formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
-      toast({ title: `${file.name} uploaded`, status: "success", duration: 3000 });
+      const { data: accepted } = await api.post<IngestionJobAccepted>(
+        "/documents/upload",
+        formData,
+        { headers: { "Content-Type": "multipart/form-data" } },
+      );
+      if (!accepted.job_id) {
+        toast({ title: `${file.name} is already indexed`, status: "info", duration: 3000 });
+        return;
+      }
+      // The file is stored; indexing runs in the background, so follow the job.
+      let job: IngestionJobStatus;
+      for (;;) {
+        ({ data: job } = await api.get<IngestionJobStatus>(`/documents/jobs/${accepted.job_id}`));
+        const progress = job.progress;
+        if (progress && progress.bytes_total) {
+          setIndexed((100 * progress.bytes_parsed) / progress.bytes_total);
+        }
+        if (FINAL_STATUSES.has(job.status)) {
+          break;
+        }
+        await sleep(POLL_INTERVAL_MS);
+      }
+      if (job.status !== "finished") {
+        throw new Error(job.error ?? `Indexing ${job.status}`);
+      }
+      toast({ title: `${file.name} uploaded and indexed`, status: "success", duration: 3000 });
     } catch (error) {
       console.error(error);
       toast({
@@ -49,6 +78,7 @@ export const DocumentUploader = ({ isDisabled = false }: DocumentUploaderProps)
       });
     } finally {
       setIsUploading(false);
+      setIndexed(null);
       event.target.value = "";
     }
   };
@@ -69,7 +99,9 @@ export const DocumentUploader = ({ isDisabled = false }: DocumentUploaderProps)
             isDisabled={isDisabled}
           />
         </FormControl>
-        {isUploading ? <Progress size="xs" isIndeterminate /> : null}
+        {isUploading ? (
+          <Progress size="xs" value={indexed ?? undefined} isIndeterminate={indexed === null} />
+        ) : null}
         <Button onClick={() => inputRef.current?.click()} isDisabled={isUploading || isDisabled}>
           Upload document
         </Button>
@@ -2,11 +2,11 @@ import { useCallback, useEffect, useMemo, useState } from 'react';
 import { useMutation, useQueryClient } from '@tanstack/react-query';
 import { nanoid } from 'nanoid';
 
-import { api } from '../lib/api';
+import { api, streamChatCompletion } from '../lib/api';
 import type {
   ChatCompletionRequest,
-  ChatCompletionResponse,
   ChatMessage,
+  ChatStreamDone,
   ConversationDetail,
   ConversationMessage,
 } from '../types';
@@ -26,6 +26,8 @@ export const useChat = (currentNickname?: string | null) => {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [historyError, setHistoryError] = useState<string | null>(null);
   const [isHistoryLoading, setIsHistoryLoading] = useState(false);
+  // Id of the oldest loaded message while older ones remain on the server.
+  const [earlierCursor, setEarlierCursor] = useState<string | null>(null);
 
   const nickname = useMemo(() => {
     if (currentNickname) {
@@ -42,6 +44,7 @@ export const useChat = (currentNickname?: string | null) => {
       setConversationId(undefined);
       setMessages([]);
       setHistoryError(null);
+      setEarlierCursor(null);
     }
   }, [nickname]);
 
@@ -58,6 +61,7 @@ export const useChat = (currentNickname?: string | null) => {
           params: { nickname },
         });
         setMessages(response.data.messages.map(toChatMessage));
+        setEarlierCursor((response.headers['x-next-cursor'] as string | undefined) ?? null);
       } catch (error) {
         console.error('Failed to load conversation', error);
         setHistoryError('Failed to load conversation history. Please try again.');
@@ -68,15 +72,62 @@ export const useChat = (currentNickname?: string | null) => {
     [nickname],
   );
 
+  const loadEarlier = useCallback(async () => {
+    if (!nickname || !conversationId || !earlierCursor) {
+      return;
+    }
+    setIsHistoryLoading(true);
+    try {
+      const response = await api.get<ConversationDetail>(`/conversations/${conversationId}`, {
+        params: { nickname, before: earlierCursor },
+      });
+      setMessages((previous) => [...response.data.messages.map(toChatMessage), ...previous]);
+      setEarlierCursor((response.headers['x-next-cursor'] as string | undefined) ?? null);
+    } catch (error) {
+      console.error('Failed to load earlier messages', error);
+      setHistoryError('Failed to load earlier messages. Please try again.');
+    } finally {
+      setIsHistoryLoading(false);
+    }
+  }, [conversationId, earlierCursor, nickname]);
+
   const mutation = useMutation<
-    ChatCompletionResponse,
+    ChatStreamDone & { replyId: string },
     Error,
     ChatCompletionRequest,
     { messageId: string }
   >({
     mutationFn: async (payload: ChatCompletionRequest) => {
-      const response = await api.post<ChatCompletionResponse>('/chat/completions', payload);
-      return response.data;
+      // The assistant reply is rendered as soon as its first token arrives.
+      const replyId = nanoid();
+      let started = false;
+      try {
+        const done = await streamChatCompletion(payload, {
+          onMeta: setConversationId,
+          onToken: (content) => {
+            if (!started) {
+              started = true;
+              const reply: ChatMessage = {
+                id: replyId,
+                role: 'assistant',
+                content,
+                createdAt: new Date().toISOString(),
+              };
+              setMessages((previous) => [...previous, reply]);
+              return;
+            }
+            setMessages((previous) =>
+              previous.map((message) =>
+                message.id === replyId ? { ...message, content: message.content + content } : message,
+              ),
+            );
+          },
+        });
+        return { ...done, replyId };
+      } catch (error) {
+        setMessages((previous) => previous.filter((message) => message.id !== replyId));
+        throw error;
+      }
     },
     onMutate: async (payload: ChatCompletionRequest) => {
       const tempId = nanoid();
@@ -89,9 +140,15 @@ export const useChat = (currentNickname?: string | null) => {
       setMessages((previous) => [...previous, optimisticMessage]);
       return { messageId: tempId };
     },
-    onSuccess: async (data: ChatCompletionResponse) => {
+    onSuccess: async (data) => {
       setConversationId(data.conversation_id);
-      setMessages(data.messages.map(toChatMessage));
+      const persisted = toChatMessage(data.message);
+      setMessages((previous) => {
+        const streamed = previous.some((message) => message.id === data.replyId);
+        return streamed
+          ? previous.map((message) => (message.id === data.replyId ? persisted : message))
+          : [...previous, persisted];
+      });
       setHistoryError(null);
       if (nickname) {
         await queryClient.invalidateQueries({ queryKey: ['conversations', nickname] });
@@ -125,6 +182,7 @@ export const useChat = (currentNickname?: string | null) => {
     setConversationId(undefined);
     setMessages([]);
     setHistoryError(null);
+    setEarlierCursor(null);
   }, []);
 
   const errorMessage = mutation.error?.message ?? historyError ?? undefined;
@@ -134,6 +192,8 @@ export const useChat = (currentNickname?: string | null) => {
     messages,
     sendMessage,
     selectConversation: loadConversation,
+    loadEarlier,
+    hasEarlier: earlierCursor !== null,
     startNewConversation,
     reset: startNewConversation,
     isLoading: mutation.isPending || isHistoryLoading,
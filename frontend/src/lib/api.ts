@@ -1,8 +1,76 @@
 import axios from "axios";
 
+import type { ChatCompletionRequest, ChatStreamDone } from "../types";
+
 export const api = axios.create({
   baseURL: import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000/api",
   headers: {
     "Content-Type": "application/json",
   },
 });
+
+export interface ChatStreamHandlers {
+  onMeta?: (conversationId: string) => void;
+  onToken?: (content: string) => void;
+}
+
+const parseEvent = (block: string): { event: string; data: unknown } => {
+  let event = "message";
+  const data: string[] = [];
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event:")) {
+      event = line.slice("event:".length).trim();
+    } else if (line.startsWith("data:")) {
+      data.push(line.slice("data:".length).trim());
+    }
+  }
+  return { event, data: data.length ? JSON.parse(data.join("\n")) : null };
+};
+
+/**
+ * Posts a chat message to the streaming endpoint and reports tokens as they arrive.
+ * Resolves with the persisted assistant message once the stream completes.
+ */
+export const streamChatCompletion = async (
+  payload: ChatCompletionRequest,
+  handlers: ChatStreamHandlers = {},
+): Promise<ChatStreamDone> => {
+  const response = await fetch(`${api.defaults.baseURL}/chat/completions/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify(payload),
+  });
+  if (response.status === 429 || response.status === 503) {
+    const retryAfter = response.headers.get("Retry-After") ?? "a few";
+    throw new Error(`The assistant is busy, please try again in ${retryAfter} seconds`);
+  }
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += value;
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const { event, data } = parseEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      if (event === "meta") {
+        handlers.onMeta?.((data as { conversation_id: string }).conversation_id);
+      } else if (event === "token") {
+        handlers.onToken?.((data as { content: string }).content);
+      } else if (event === "done") {
+        return data as ChatStreamDone;
+      } else if (event === "error") {
+        throw new Error((data as { detail: string }).detail);
+      }
+      boundary = buffer.indexOf("\n\n");
+    }
+  }
+  throw new Error("Chat stream ended before the response completed");
+};
@@ -1,6 +1,6 @@
 import { AddIcon } from '@chakra-ui/icons';
 import { Box, Button, Container, Flex, Heading, HStack, Stack, Text } from '@chakra-ui/react';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery } from '@tanstack/react-query';
 import { useState } from 'react';
 
 import { ConversationSidebar } from '../components/ConversationSidebar';
@@ -24,6 +24,8 @@ const App = () => {
     messages,
     sendMessage,
     selectConversation,
+    loadEarlier,
+    hasEarlier,
     startNewConversation,
     isSending,
     isHistoryLoading,
@@ -33,21 +35,29 @@ const App = () => {
   const {
     data: conversationData,
     isFetching: isFetchingConversations,
+    isFetchingNextPage,
     isError: isConversationsError,
     error: conversationsError,
-  } = useQuery<ConversationSummary[], Error>({
+    hasNextPage,
+    fetchNextPage,
+  } = useInfiniteQuery({
     queryKey: ['conversations', nickname],
-    queryFn: async () => {
+    queryFn: async ({ pageParam }: { pageParam: string | null }) => {
       const response = await api.get<ConversationSummary[]>('/conversations', {
-        params: { nickname },
+        params: { nickname, cursor: pageParam ?? undefined },
       });
-      return response.data;
+      const nextCursor = (response.headers['x-next-cursor'] as string | undefined) ?? null;
+      return { items: response.data, nextCursor };
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
     enabled: isAuthenticated,
     staleTime: 30_000,
   });
 
-  const conversations = isAuthenticated ? (conversationData ?? []) : [];
+  const conversations = isAuthenticated
+    ? (conversationData?.pages.flatMap((page) => page.items) ?? [])
+    : [];
   const conversationErrorMessage = isConversationsError
     ? (conversationsError?.message ?? 'Unable to load conversations.')
     : undefined;
@@ -61,7 +71,10 @@ const App = () => {
           activeConversationId={conversationId}
           onSelect={selectConversation}
           onNewChat={startNewConversation}
-          isLoading={isFetchingConversations}
+          isLoading={isFetchingConversations && !isFetchingNextPage}
+          hasMore={Boolean(hasNextPage)}
+          isLoadingMore={isFetchingNextPage}
+          onLoadMore={() => void fetchNextPage()}
           isDisabled={!isAuthenticated}
           nickname={nickname}
           errorMessage={conversationErrorMessage}
@@ -94,7 +107,13 @@ const App = () => {
               <NicknameGate onNicknameChange={setNickname} />
               <DocumentUploader isDisabled={!isAuthenticated} />
               <Box bg="white" borderRadius="xl" boxShadow="md" p={6} flex="1" display="flex">
-                <ChatThread messages={messages} error={error} isLoading={combinedLoading} />
+                <ChatThread
+                  messages={messages}
+                  error={error}
+                  isLoading={combinedLoading}
+                  hasEarlier={hasEarlier}
+                  onLoadEarlier={() => void loadEarlier()}
+                />
               </Box>
             </Stack>
           </Container>
@@ -22,10 +22,17 @@ export interface ChatCompletionResponse {
   messages: ConversationMessage[];
 }
 
+export interface ChatStreamDone {
+  conversation_id: string;
+  message: ConversationMessage;
+  time_to_first_token_ms: number | null;
+}
+
 export interface ChatCompletionRequest {
   message: string;
   conversation_id?: string;
   nickname: string;
+  include_history?: boolean;
 }
 
 export interface ConversationMessage {
@@ -42,8 +49,40 @@ export interface ConversationSummary {
   created_at: string;
   updated_at: string;
   last_message_preview?: string | null;
+  message_count?: number;
 }
 
 export interface ConversationDetail extends ConversationSummary {
   messages: ConversationMessage[];
 }
+
+export interface IngestionJobProgress {
+  files_total: number;
+  files_parsed: number;
+  chunks_embedded: number;
+  bytes_total: number;
+  bytes_parsed: number;
+  eta_seconds: number | null;
+}
+
+export interface IngestionJobAccepted {
+  job_id: string | null;
+  status: string;
+  document_path?: string | null;
+  document_id?: string | null;
+  sha256?: string | null;
+}
+
+export interface IngestionJobStatus {
+  job_id: string;
+  status: string;
+  cancel_requested: boolean;
+  progress: IngestionJobProgress | null;
+  results: {
+    document_path: string;
+    document_id: string;
+    chunks_indexed: number;
+    chunks_removed: number;
+  }[];
+  error: string | null;
+}